@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+# @Author: BugNotFound
+# @Date: 2026-10-17
+# @Description: 点击下发时刻误差测试 - 对比 time.sleep 与 DeadlineScheduler（粗睡眠 + 自旋）在目标时刻下发点击的误差
+#
+# 用法:
+#   python benchmarks/deadline_jitter.py --count 200
+#
+# 点击发往只记录时间的输入后端，不需要游戏和 Windows。
+
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from deadline import DeadlineScheduler
+from input_dispatch import RecordingBackend
+
+
+def measure(dispatch, count: int, min_delay: float, max_delay: float):
+    """在随机的未来时刻下发 count 次点击，返回点击到达输入后端的时刻相对目标的误差（毫秒）"""
+    sink = RecordingBackend()
+    targets = []
+    for _ in range(count):
+        target = time.perf_counter() + random.uniform(min_delay, max_delay)
+        targets.append(target)
+        dispatch(target, sink)
+    return (np.array([event.time for event in sink.events]) - np.array(targets)) * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="点击下发时刻误差测试")
+    parser.add_argument("--count", type=int, default=200)
+    parser.add_argument("--min-delay", type=float, default=0.005)
+    parser.add_argument("--max-delay", type=float, default=0.05)
+    parser.add_argument("--spin", type=float, default=0.002, help="末段自旋秒数")
+    args = parser.parse_args()
+
+    def plain_sleep(target, sink):
+        remaining = target - time.perf_counter()
+        if remaining > 0:
+            time.sleep(remaining)
+        sink.click(100, 100)
+
+    scheduler = DeadlineScheduler(spin_threshold=args.spin)
+
+    def scheduled(target, sink):
+        scheduler.dispatch(target, sink.click, 100, 100, label="bench")
+
+    print(f"{'方式':<12}{'均值':>8}{'p50':>8}{'p99':>8}{'最大':>8}  (ms)")
+    for name, dispatch in (("time.sleep", plain_sleep), ("deadline", scheduled)):
+        errors = measure(dispatch, args.count, args.min_delay, args.max_delay)
+        print(f"{name:<12}{errors.mean():>8.3f}{np.percentile(errors, 50):>8.3f}"
+              f"{np.percentile(errors, 99):>8.3f}{errors.max():>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+# @Author: BugNotFound
+# @Date: 2026-10-17
+# @Description: 端到端反应延迟测试 - 用商店界面模拟器驱动完整的 ScriptThread，统计购买点击落点相对真实归零时刻的偏差
+#
+# 用法:
+#   python benchmarks/e2e_latency.py --rounds 10 --countdown 8
+#   python benchmarks/e2e_latency.py --engine rec_only_cpu --no-pipeline --output e2e.json
+#   python benchmarks/e2e_latency.py --virtual 1.0 --rounds 200 --countdown 600   # 虚拟时间，等待不真实耗时
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from clock import REAL_CLOCK, VirtualClock
+from game_simulator import GameSimulator, SimulatorConfig, SimulatorSource
+from window_capture import WindowCapture
+from log_model import LogBuffer
+from digit_recognizer import DigitTemplateRecognizer
+from ocr_engine import OnnxRecognitionOCR, PaddlePipelineOCR, RecognitionOnlyOCR
+from main_gui import ScriptThread, ROI_REGION_NAMES
+from region_selector import RegionSelector
+
+
+class RoundsScriptThread(ScriptThread):
+    """每轮成交后重新开启 continue_after_complete
+
+    实盘脚本成交一次（三角币变化）就结束，这里让同一个脚本继续监控后续轮次，一次运行测量多轮
+    """
+
+    def buy_cycle(self, *args, **kwargs) -> bool:
+        super().buy_cycle(*args, **kwargs)
+        self.config['continue_after_complete'] = True
+        return True
+
+
+def build_ocr(engine: str, threads: int):
+    device = 'gpu:0' if engine.endswith("gpu") else 'cpu'
+    if engine.startswith("rec_only"):
+        return RecognitionOnlyOCR(model_dir=os.path.join(ROOT, "models/PP-OCRv5_server_rec_infer"), device=device)
+    if engine.startswith("onnx"):
+        return OnnxRecognitionOCR(model_path=os.path.join(ROOT, "models/PP-OCRv5_server_rec_onnx/inference.onnx"),
+                                  threads=threads)
+    return PaddlePipelineOCR(det_model_dir=os.path.join(ROOT, "models/PP-OCRv5_server_det_infer"),
+                             rec_model_dir=os.path.join(ROOT, "models/PP-OCRv5_server_rec_infer"), device=device)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="端到端反应延迟测试")
+    parser.add_argument("--engine", default="rec_only_gpu",
+                        choices=["rec_only_gpu", "rec_only_cpu", "paddle_gpu", "paddle_cpu", "onnx_cpu"])
+    parser.add_argument("--threads", type=int, default=4, help="onnx 后端的推理线程数")
+    parser.add_argument("--regions", default=os.path.join(ROOT, "regions_2k.json"))
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--countdown", type=float, default=10.0, help="每轮倒计时秒数")
+    parser.add_argument("--buy-click-delay", type=float, default=1.0,
+                        help="显示跳到 1 秒后再等待的秒数；模拟器在显示归零时开放购买，因此 1.0 对应正好归零")
+    parser.add_argument("--input-latency", type=float, default=0.008)
+    parser.add_argument("--dialog-delay", type=float, default=0.12)
+    parser.add_argument("--font", help="能显示中文的字体文件，默认在常见位置查找")
+    parser.add_argument("--no-pipeline", action="store_true", help="在决策线程中串行截图识别")
+    parser.add_argument("--no-templates", action="store_true", help="倒计时不使用字形模板")
+    parser.add_argument("--virtual", type=float, metavar="COMPUTE_SCALE",
+                        help="使用虚拟时钟，参数为真实计算时间计入虚拟时间的倍数（0 表示计算不耗时）；自动关闭流水线")
+    parser.add_argument("--verbose", action="store_true")
+    parser.add_argument("--output", help="结果 JSON 路径")
+    args = parser.parse_args()
+
+    # 虚拟时钟下等待不阻塞，只能由单个线程驱动
+    clock = REAL_CLOCK if args.virtual is None else VirtualClock(compute_scale=args.virtual)
+    use_pipeline = not args.no_pipeline and args.virtual is None
+
+    selector = RegionSelector.from_file(args.regions)
+    simulator = GameSimulator(selector.get_all_regions(), SimulatorConfig(
+        countdown=args.countdown, rounds=args.rounds, input_latency=args.input_latency,
+        dialog_delay=args.dialog_delay, font_path=args.font), clock=clock)
+    roi_regions = {name: selector.get_region(name) for name in ROI_REGION_NAMES}
+    win_cap = WindowCapture(source=SimulatorSource(simulator), roi_regions=roi_regions, threaded=False, clock=clock)
+
+    ocr = build_ocr(args.engine, args.threads)
+    # 模拟器字体与游戏不同，模板只在本次运行中自举，不读写缓存
+    digit_recognizer = None if args.no_templates else DigitTemplateRecognizer(cache_path=None)
+    config = {
+        'buy_click_delay': args.buy_click_delay,
+        'buy_to_verify_delay': 0.0,
+        'buy_interval': 0.05,
+        'verify_interval': 0.05,
+        'ocr_interval': 0.95,
+        'continue_after_complete': True,
+        'click_refresh_at_3s': True,
+        'predict_deadline': True,
+        'verify_skin': "金色砖皮",
+        'pipeline': use_pipeline,
+        'trace_export': False,
+        'record_session': False,
+    }
+    log = LogBuffer(echo=(lambda s: print(f"[{clock.now():.3f}] {s}")) if args.verbose else None)
+    script = RoundsScriptThread(selector, win_cap, ocr, config, digit_recognizer, input_sink=simulator, clock=clock,
+                                log=log)
+
+    simulator.reset()
+    worker = threading.Thread(target=script.run, daemon=True)
+    worker.start()
+    # 最后一轮结束（成交或过了可购买窗口）后再留出购买流程的时间
+    cfg = simulator.config
+    # 脚本卡住（例如一直识别失败）时按总时长上限结束
+    give_up = clock.now() + cfg.rounds * (cfg.countdown + cfg.next_round_delay + 10.0) + 30.0
+    while worker.is_alive() and clock.now() < give_up:
+        if (simulator.round_index == cfg.rounds - 1
+                and clock.now() > simulator.zero_time + cfg.sale_window + 3.0):
+            break
+        time.sleep(0.01 if args.virtual is not None else 0.1)
+    script.stop()
+    worker.join(timeout=5.0)
+    win_cap.stop()
+
+    report = simulator.report()
+    report["engine"] = args.engine
+    report["pipeline"] = use_pipeline
+    report["virtual"] = args.virtual
+    report["latency"] = script.tracer.summary()
+    for r in report["rounds"]:
+        first = "-" if r["first_valid_buy_ms"] is None else f"{r['first_valid_buy_ms']:+.1f}ms"
+        purchase = "-" if r["purchase_ms"] is None else f"{r['purchase_ms']:+.1f}ms"
+        print(f"第 {r['round'] + 1} 轮: 购买点击 {r['buy_clicks']} 次（过早 {r['early_clicks']} 次），"
+              f"首次有效点击 {first}，成交 {purchase}")
+    print(f"成交 {report['purchases']}/{cfg.rounds} 轮，首次有效点击偏差: {report['first_valid_buy_ms']}")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"✓ 结果已保存到: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
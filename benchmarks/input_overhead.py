@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+# @Author: BugNotFound
+# @Date: 2026-10-17
+# @Description: 输入下发开销测试 - 各输入后端每次点击从决策到输入入队的耗时
+#
+# 用法:
+#   python benchmarks/input_overhead.py --backends recording
+#   python benchmarks/input_overhead.py --backends sendinput pydirectinput --x 1 --y 1
+#
+# sendinput / pydirectinput 会真实点击 (x, y)，默认是屏幕左上角，测试前确认该位置点击无副作用。
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from input_dispatch import InputDispatcher, create_input_backend
+
+
+def measure(kind: str, count: int, x: int, y: int, gap: float):
+    """下发 count 次点击，返回每次决策到入队的耗时（毫秒）"""
+    dispatcher = InputDispatcher(create_input_backend(kind))
+    latencies = []
+    for _ in range(count):
+        dispatcher.click(x, y, interval=0)
+        latencies.append(dispatcher.last_latency)
+        time.sleep(gap)
+    return np.array(latencies) * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="输入下发开销测试")
+    parser.add_argument("--backends", nargs="+", default=["recording"],
+                        choices=["sendinput", "pydirectinput", "recording"])
+    parser.add_argument("--count", type=int, default=100)
+    parser.add_argument("--x", type=int, default=1)
+    parser.add_argument("--y", type=int, default=1)
+    parser.add_argument("--gap", type=float, default=0.02, help="两次点击之间的间隔秒数")
+    args = parser.parse_args()
+
+    print(f"{'后端':<16}{'均值':>8}{'p50':>8}{'p99':>8}{'最大':>8}  (ms)")
+    for kind in args.backends:
+        try:
+            latencies = measure(kind, args.count, args.x, args.y, args.gap)
+        except Exception as e:
+            print(f"✗ {kind}: {e}")
+            continue
+        print(f"{kind:<16}{latencies.mean():>8.3f}{np.percentile(latencies, 50):>8.3f}"
+              f"{np.percentile(latencies, 99):>8.3f}{latencies.max():>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
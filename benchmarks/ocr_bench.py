@@ -0,0 +1,381 @@
+# -*- coding: utf-8 -*-
+# @Author: BugNotFound
+# @Date: 2026-10-17
+# @Description: OCR 引擎基准测试 - 在标注语料上比较各识别引擎的准确率、延迟分布、批量吞吐、峰值内存与冷启动时间
+#
+# 用法:
+#   python benchmarks/ocr_bench.py                              # 跑所有引擎，输出表格
+#   python benchmarks/ocr_bench.py --engines template rec_only_cpu --output bench.json
+#   python benchmarks/ocr_bench.py harvest recordings/session1  # 从录屏帧中裁出 ROI，生成待校对的标注
+#   python benchmarks/ocr_bench.py synth --font C:/Windows/Fonts/msyh.ttc  # 用界面模拟器重新渲染合成语料
+#
+# 仓库附带一份由 synth 渲染的合成语料（benchmarks/corpus/synthetic），默认运行即有样本可测；
+# 有引擎不可用（缺依赖、缺模型）或在语料中找不到适用的样本时以非零退出码结束。
+#
+# 只依赖 numpy / opencv（以及被测引擎自身），不导入 dxcam 与 win32 模块，可在 Linux 上无界面运行。
+
+import argparse
+import csv
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+CORPUS_DIR = os.path.join(ROOT, "benchmarks", "corpus")
+KINDS = ("time", "money", "verify_check")
+# 模板引擎没有缓存时，每隔多少个 time 样本取一个用于自举，其余样本留作测试
+BOOTSTRAP_STEP = 2
+
+# 引擎名称 -> 适用的语料类别
+ENGINE_KINDS = {
+    "paddle_pipeline_gpu": ("time", "money"),
+    "paddle_pipeline_cpu": ("time", "money"),
+    "rec_only_gpu": ("time", "money"),
+    "rec_only_cpu": ("time", "money"),
+    "onnx_cpu": ("time", "money"),
+    "onnx_cpu_pool": ("time", "money"),
+    "template": ("time",),
+    "color": ("verify_check",),
+}
+
+
+def load_corpus(corpus_dir: str) -> List[Tuple[str, str, np.ndarray]]:
+    """读取标注语料
+
+    labels.csv 每行为 file,kind,label：file 相对于语料目录，kind 为 time / money / verify_check，
+    label 为期望文本（verify_check 为 1 表示确认窗口已弹出，0 表示未弹出）。
+
+    Returns:
+        [(类别, 标注, 图像)]
+    """
+    samples = []
+    with open(os.path.join(corpus_dir, "labels.csv"), 'r', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            img = cv2.imread(os.path.join(corpus_dir, row["file"]), cv2.IMREAD_COLOR)
+            if img is None:
+                print(f"警告: 无法读取 {row['file']}，已跳过", file=sys.stderr)
+                continue
+            samples.append((row["kind"], row["label"], img))
+    return samples
+
+
+def normalize(kind: str, text: str) -> str:
+    """比较前的规范化：money 只比较数字，其余去掉空白"""
+    if kind == "money":
+        return ''.join(re.findall(r'\d', text))
+    return re.sub(r'\s+', '', text)
+
+
+# ---------- 引擎适配 ----------
+
+def batch_of(ocr) -> Callable[[List[np.ndarray]], List[str]]:
+    """把 OcrBackend.recognize_batch 包装为按列表输入输出的批量识别函数"""
+    def batch(rois):
+        results = ocr.recognize_batch(dict(enumerate(rois)))
+        return [results[i].text for i in range(len(rois))]
+    return batch
+
+
+def build_engine(name: str, samples) -> Tuple[Callable[[np.ndarray], str], Optional[Callable[[List[np.ndarray]], List[str]]], str, List[int]]:
+    """构造引擎
+
+    Returns:
+        (单张识别函数, 批量识别函数或 None, 备注, 构造时用掉的样本下标)，用掉的样本不参与评分
+    """
+    note = ""
+    device = 'gpu:0' if name.endswith("gpu") else 'cpu'
+    if name.startswith("paddle_pipeline"):
+        from ocr_engine import PaddlePipelineOCR
+        ocr = PaddlePipelineOCR(det_model_dir=os.path.join(ROOT, "models/PP-OCRv5_server_det_infer"),
+                                rec_model_dir=os.path.join(ROOT, "models/PP-OCRv5_server_rec_infer"), device=device)
+
+        return (lambda roi: ocr.recognize(roi).text), batch_of(ocr), note, []
+
+    if name == "onnx_cpu":
+        from ocr_engine import OnnxRecognitionOCR
+        ocr = OnnxRecognitionOCR(model_path=os.path.join(ROOT, "models/PP-OCRv5_server_rec_onnx/inference.onnx"),
+                                 threads=int(os.environ.get("OCR_THREADS", "4")))
+        return (lambda roi: ocr.recognize(roi).text), batch_of(ocr), f"threads={ocr.threads}", []
+
+    if name == "onnx_cpu_pool":
+        # 工作进程按默认的相对路径加载模型，需在仓库根目录运行；峰值内存不含工作进程
+        from ocr_workers import ProcessPoolOCR
+        ocr = ProcessPoolOCR("onnx", threads=int(os.environ.get("OCR_THREADS", "2")),
+                             workers=int(os.environ.get("OCR_WORKERS", "2")))
+        return (lambda roi: ocr.recognize(roi).text), batch_of(ocr), f"workers={ocr.workers}", []
+
+    if name.startswith("rec_only"):
+        from ocr_engine import RecognitionOnlyOCR
+        ocr = RecognitionOnlyOCR(model_dir=os.path.join(ROOT, "models/PP-OCRv5_server_rec_infer"), device=device)
+        return (lambda roi: ocr.recognize(roi).text), batch_of(ocr), note, []
+
+    if name == "template":
+        from digit_recognizer import DigitTemplateRecognizer
+        recognizer = DigitTemplateRecognizer(cache_path=os.path.join(ROOT, "models/digit_templates.npz"))
+        used = []
+        if not recognizer.ready:
+            # 没有缓存的模板时用一部分标注自举，这部分样本不再参与评分，准确率只在其余样本上统计
+            recognizer.cache_path = None
+            time_indices = [i for i, (kind, _, _) in enumerate(samples) if kind == "time"]
+            used = time_indices[::BOOTSTRAP_STEP]
+            for i in used:
+                recognizer.learn(samples[i][2], samples[i][1])
+            note = f"模板由 {len(used)} 个语料样本自举"
+        return (lambda roi: recognizer.recognize(roi) or ""), None, note, used
+
+    if name == "color":
+        from color_detector import ColorStateDetector
+        detector = ColorStateDetector()
+
+        def single(roi):
+            h, w = roi.shape[:2]
+            return "1" if detector.detect(detector.center_patch(roi, (0, 0, w, h)))[0] else "0"
+        return single, None, note, []
+
+    raise ValueError(f"未知引擎: {name}")
+
+
+def peak_rss_mb() -> Optional[float]:
+    """当前进程的峰值常驻内存（MB），平台不支持时返回 None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KB，macOS 为字节
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def run_engine(name: str, corpus_dir: str, repeat: int, batch_size: int) -> List[Dict]:
+    """在当前进程中测试单个引擎（由父进程以子进程方式调用，保证峰值内存和冷启动互不影响）"""
+    samples = [s for s in load_corpus(corpus_dir) if s[0] in ENGINE_KINDS[name]]
+    if not samples:
+        return []
+
+    t0 = time.perf_counter()
+    single, batch, note, used = build_engine(name, samples)
+    single(samples[0][2])
+    cold_start = time.perf_counter() - t0
+    used = set(used)
+    samples = [s for i, s in enumerate(samples) if i not in used]
+
+    rows = []
+    for kind in ENGINE_KINDS[name]:
+        subset = [(label, img) for k, label, img in samples if k == kind]
+        if not subset:
+            continue
+        latencies = []
+        correct = 0
+        for _ in range(repeat):
+            for label, img in subset:
+                start = time.perf_counter()
+                text = single(img)
+                latencies.append(time.perf_counter() - start)
+                correct += normalize(kind, text) == normalize(kind, label)
+
+        throughput = None
+        if batch is not None:
+            imgs = [img for _, img in subset]
+            start = time.perf_counter()
+            for i in range(0, len(imgs), batch_size):
+                batch(imgs[i:i + batch_size])
+            throughput = len(imgs) / (time.perf_counter() - start)
+
+        ms = np.array(latencies) * 1000.0
+        rows.append({
+            "engine": name,
+            "kind": kind,
+            "samples": len(subset),
+            "accuracy": correct / (len(subset) * repeat),
+            "mean_ms": float(ms.mean()),
+            "p50_ms": float(np.percentile(ms, 50)),
+            "p95_ms": float(np.percentile(ms, 95)),
+            "p99_ms": float(np.percentile(ms, 99)),
+            "max_ms": float(ms.max()),
+            "single_throughput": float(1000.0 / ms.mean()),
+            "batch_throughput": throughput,
+            "cold_start_s": cold_start,
+            "peak_rss_mb": peak_rss_mb(),
+            "note": note,
+        })
+    return rows
+
+
+def run_all(engines: List[str], corpus_dir: str, repeat: int, batch_size: int) -> List[Dict]:
+    """每个引擎在独立子进程中测试；引擎不可用（缺依赖、缺模型）时记录错误并继续"""
+    rows = []
+    for name in engines:
+        cmd = [sys.executable, os.path.abspath(__file__), "--worker", name, "--corpus", corpus_dir,
+               "--repeat", str(repeat), "--batch-size", str(batch_size)]
+        proc = subprocess.run(cmd, capture_output=True, text=True, encoding='utf-8')
+        if proc.returncode != 0:
+            error = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else f"退出码 {proc.returncode}"
+            rows.append({"engine": name, "error": error})
+            print(f"✗ {name}: {error}", file=sys.stderr)
+            continue
+        engine_rows = json.loads(proc.stdout.strip().splitlines()[-1])
+        if not engine_rows:
+            kinds = "/".join(ENGINE_KINDS[name])
+            rows.append({"engine": name, "error": f"语料中没有 {kinds} 样本"})
+            print(f"✗ {name}: 语料中没有 {kinds} 样本", file=sys.stderr)
+            continue
+        rows.extend(engine_rows)
+    return rows
+
+
+def format_table(rows: List[Dict]) -> str:
+    columns = ["engine", "kind", "samples", "accuracy", "p50_ms", "p95_ms", "p99_ms",
+               "single_throughput", "batch_throughput", "cold_start_s", "peak_rss_mb"]
+    lines = ["\t".join(columns)]
+    for row in rows:
+        if "error" in row:
+            lines.append(f"{row['engine']}\tERROR: {row['error']}")
+            continue
+        values = []
+        for col in columns:
+            value = row.get(col)
+            values.append(f"{value:.3f}" if isinstance(value, float) else str(value))
+        lines.append("\t".join(values))
+    return "\n".join(lines)
+
+
+def harvest(frames_dir: str, corpus_dir: str, regions_file: str, step: int):
+    """从录屏帧裁出 time / money / verify_check，写入语料目录并生成待人工校对的标注
+
+    文字类标注先用 PaddleOCR 预填（不可用时留空），verify_check 一律留空，需人工填写 0/1。
+    """
+    with open(regions_file, 'r', encoding='utf-8') as f:
+        regions = {name: tuple(coords) for name, coords in json.load(f).items()}
+    try:
+        single, _, _ = build_engine("rec_only_cpu", [])
+    except Exception as e:
+        print(f"警告: 无法加载 OCR，标注留空: {e}", file=sys.stderr)
+        single = None
+
+    labels_path = os.path.join(corpus_dir, "labels.csv")
+    new_file = not os.path.exists(labels_path)
+    names = sorted(n for n in os.listdir(frames_dir) if n.lower().endswith((".png", ".jpg", ".bmp")))
+    with open(labels_path, 'a', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        if new_file:
+            writer.writerow(["file", "kind", "label"])
+        for name in names[::step]:
+            frame = cv2.imread(os.path.join(frames_dir, name), cv2.IMREAD_COLOR)
+            if frame is None:
+                continue
+            stem = os.path.splitext(name)[0]
+            for kind in KINDS:
+                if kind not in regions:
+                    continue
+                left, top, right, bottom = regions[kind]
+                crop = frame[top:bottom, left:right]
+                rel = os.path.join(kind, f"{stem}.png")
+                os.makedirs(os.path.join(corpus_dir, kind), exist_ok=True)
+                cv2.imwrite(os.path.join(corpus_dir, rel), crop)
+                label = single(crop) if single is not None and kind != "verify_check" else ""
+                writer.writerow([rel.replace(os.sep, "/"), kind, label])
+    print(f"✓ 已从 {len(names[::step])} 帧裁剪样本，请校对 {labels_path}")
+
+
+def synth(corpus_dir: str, regions_file: str, font: str, count: int, seed: int):
+    """用界面模拟器渲染带标注的合成语料，写入语料目录的 synthetic 子目录并替换 labels.csv 中的合成样本
+
+    time 覆盖不同的分、秒位数，money 覆盖不同的位数，verify_check 弹出 / 未弹出各占一半。
+    """
+    from clock import VirtualClock
+    from game_simulator import GameSimulator, SimulatorConfig
+
+    with open(regions_file, 'r', encoding='utf-8') as f:
+        regions = {name: tuple(coords) for name, coords in json.load(f).items()}
+    clock = VirtualClock()
+    simulator = GameSimulator(regions, SimulatorConfig(font_path=font), clock=clock)
+    rng = np.random.default_rng(seed)
+
+    # 重新渲染时替换旧的合成样本，保留人工标注的样本
+    labels_path = os.path.join(corpus_dir, "labels.csv")
+    kept = []
+    if os.path.exists(labels_path):
+        with open(labels_path, 'r', encoding='utf-8') as f:
+            kept = [row for row in csv.DictReader(f) if not row["file"].startswith("synthetic/")]
+    with open(labels_path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["file", "kind", "label"])
+        for row in kept:
+            writer.writerow([row["file"], row["kind"], row["label"]])
+        for i in range(count):
+            # 剩余秒数在 1 秒到 1 小时之间按对数均匀分布，个位数与两位数的分、秒都能覆盖
+            remaining = int(np.exp(rng.uniform(0, np.log(3600))))
+            now = clock.now()
+            simulator.zero_time = now + remaining - 0.5
+            simulator.money = int(10 ** rng.uniform(3, 9))
+            simulator.dialog_open = i % 2 == 1
+            frame = simulator.render(now)
+            labels = {
+                "time": simulator.countdown_text(now),
+                "money": f"{simulator.money:,}",
+                "verify_check": "1" if simulator.dialog_open else "0",
+            }
+            for kind in KINDS:
+                left, top, right, bottom = regions[kind]
+                rel = f"synthetic/{kind}/{i:03d}.png"
+                os.makedirs(os.path.join(corpus_dir, "synthetic", kind), exist_ok=True)
+                cv2.imwrite(os.path.join(corpus_dir, rel), frame[top:bottom, left:right])
+                writer.writerow([rel, kind, labels[kind]])
+            clock.sleep(1.0)
+    print(f"✓ 已渲染 {count} 组合成样本，标注写入 {labels_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OCR 引擎基准测试")
+    sub = parser.add_subparsers(dest="command")
+    harvest_parser = sub.add_parser("harvest", help="从录屏帧生成语料")
+    harvest_parser.add_argument("frames_dir")
+    harvest_parser.add_argument("--regions", default=os.path.join(ROOT, "regions_2k.json"))
+    harvest_parser.add_argument("--step", type=int, default=1, help="每隔多少帧取一帧")
+    harvest_parser.add_argument("--corpus", default=CORPUS_DIR)
+    synth_parser = sub.add_parser("synth", help="用界面模拟器渲染合成语料")
+    synth_parser.add_argument("--font", help="能显示中文的字体文件，默认在常见位置查找")
+    synth_parser.add_argument("--count", type=int, default=40, help="渲染的组数（每组 time / money / verify_check 各一张）")
+    synth_parser.add_argument("--seed", type=int, default=0)
+    synth_parser.add_argument("--regions", default=os.path.join(ROOT, "regions_2k.json"))
+    synth_parser.add_argument("--corpus", default=CORPUS_DIR)
+
+    parser.add_argument("--engines", nargs="+", default=list(ENGINE_KINDS.keys()))
+    parser.add_argument("--corpus", default=CORPUS_DIR)
+    parser.add_argument("--repeat", type=int, default=3, help="每个样本重复识别的次数")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--output", help="结果 JSON 路径")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.command == "harvest":
+        harvest(args.frames_dir, args.corpus, args.regions, args.step)
+        return
+    if args.command == "synth":
+        synth(args.corpus, args.regions, args.font, args.count, args.seed)
+        return
+    if args.worker:
+        print(json.dumps(run_engine(args.worker, args.corpus, args.repeat, args.batch_size), ensure_ascii=False))
+        return
+
+    rows = run_all(args.engines, args.corpus, args.repeat, args.batch_size)
+    print(format_table(rows))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(rows, f, indent=2, ensure_ascii=False)
+        print(f"✓ 结果已保存到: {args.output}")
+    if any("error" in row for row in rows):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+# @Author: BugNotFound
+# @Date: 2026-10-17
+# @Description: 可注入的时钟 - 实盘使用单调时钟，离线模拟使用虚拟时间，等待不再真实耗时
+
+import threading
+import time
+from typing import Optional
+
+
+class Clock:
+    """时钟接口
+
+    所有需要读时间或等待的模块都通过它访问时间，时间戳只在同一个时钟内可比较。
+    """
+
+    # sleep 是否正好等待指定时长（否则受系统定时器精度影响，需要精确等待时由调用方末段自旋）
+    exact_sleep = False
+
+    def now(self) -> float:
+        """当前时刻（秒）"""
+        raise NotImplementedError
+
+    def sleep(self, seconds: float):
+        """等待指定秒数"""
+        raise NotImplementedError
+
+    def wait(self, cond: threading.Condition, timeout: Optional[float]) -> bool:
+        """在已持有的条件变量上等待通知，最多 timeout 秒
+
+        Returns:
+            是否在超时前被通知
+        """
+        raise NotImplementedError
+
+
+class RealClock(Clock):
+    """单调时钟（time.perf_counter）"""
+
+    def now(self) -> float:
+        return time.perf_counter()
+
+    def sleep(self, seconds: float):
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def wait(self, cond: threading.Condition, timeout: Optional[float]) -> bool:
+        return cond.wait(timeout)
+
+
+class VirtualClock(Clock):
+    """虚拟时钟
+
+    sleep / wait 立即返回并把时间拨快相应秒数，几分钟的倒计时可以在几毫秒内走完。
+    compute_scale 决定两次等待之间真实流逝的计算时间按多少倍计入虚拟时间：
+    0 表示计算不耗时（纯逻辑回归），1 表示按实际耗时计入（保留 OCR 等计算对反应延迟的影响）。
+
+    等待不会真正阻塞，只适用于单个线程驱动的模拟：ScriptThread 关闭流水线、WindowCapture 不启用后台取帧。
+    """
+
+    exact_sleep = True
+
+    def __init__(self, start: float = 0.0, compute_scale: float = 0.0):
+        """
+        Args:
+            start: 初始时刻
+            compute_scale: 真实计算时间计入虚拟时间的倍数
+        """
+        self.compute_scale = compute_scale
+        self._now = start
+        self._anchor = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def _current(self, real_now: float) -> float:
+        return self._now + self.compute_scale * (real_now - self._anchor)
+
+    def now(self) -> float:
+        with self._lock:
+            return self._current(time.perf_counter())
+
+    def advance(self, seconds: float):
+        """把时间拨快 seconds 秒"""
+        with self._lock:
+            real_now = time.perf_counter()
+            self._now = self._current(real_now) + max(0.0, seconds)
+            self._anchor = real_now
+
+    def sleep(self, seconds: float):
+        self.advance(seconds)
+
+    def wait(self, cond: threading.Condition, timeout: Optional[float]) -> bool:
+        if timeout is None:
+            raise ValueError("虚拟时钟不支持无限期等待")
+        self.advance(timeout)
+        return False
+
+
+# 默认的全局实盘时钟
+REAL_CLOCK = RealClock()
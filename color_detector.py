@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+# @Author: BugNotFound
+# @Date: 2026-10-17
+# @Description: 颜色状态检测 - NumPy 向量化的 sRGB -> Lab 转换与 CIEDE2000 色差，用于判断确认窗口是否弹出
+
+from typing import Tuple
+
+import numpy as np
+
+# 各皮肤下确认按钮中心的颜色 (R, G, B)
+VERIFY_COLOR_PRESETS = {
+    "金色砖皮": (175, 109, 65),
+}
+
+# sRGB (D65) -> XYZ，与 colormath 使用的矩阵一致
+_RGB_TO_XYZ = np.array([
+    [0.412424, 0.357579, 0.180464],
+    [0.212656, 0.715158, 0.0721856],
+    [0.0193324, 0.119193, 0.950444],
+])
+_D65_WHITE = np.array([0.95047, 1.0, 1.08883])
+_CIE_E = 216.0 / 24389.0
+
+
+def bgr_to_lab(pixels: np.ndarray, scale: float = 1.0 / 255.0) -> np.ndarray:
+    """把 BGR 像素批量转换为 Lab（D65）
+
+    Args:
+        pixels: 形状为 (..., 3) 的 BGR 数组
+        scale: 像素值乘以该系数后作为 0~1 的 sRGB 分量
+
+    Returns:
+        形状为 (..., 3) 的 Lab 数组
+    """
+    rgb = pixels[..., ::-1].astype(np.float64) * scale
+    linear = np.where(rgb <= 0.04045, rgb / 12.92, ((rgb + 0.055) / 1.055) ** 2.4)
+    xyz = linear @ _RGB_TO_XYZ.T / _D65_WHITE
+    f = np.where(xyz > _CIE_E, np.cbrt(xyz), 7.787 * xyz + 16.0 / 116.0)
+    return np.stack([116.0 * f[..., 1] - 16.0,
+                     500.0 * (f[..., 0] - f[..., 1]),
+                     200.0 * (f[..., 1] - f[..., 2])], axis=-1)
+
+
+def delta_e_cie2000(lab1: np.ndarray, lab2: np.ndarray) -> np.ndarray:
+    """CIEDE2000 色差（Kl = Kc = Kh = 1），支持广播"""
+    L1, a1, b1 = lab1[..., 0], lab1[..., 1], lab1[..., 2]
+    L2, a2, b2 = lab2[..., 0], lab2[..., 1], lab2[..., 2]
+
+    avg_Lp = (L1 + L2) / 2.0
+    avg_C = (np.hypot(a1, b1) + np.hypot(a2, b2)) / 2.0
+    G = 0.5 * (1 - np.sqrt(avg_C ** 7 / (avg_C ** 7 + 25.0 ** 7)))
+    a1p = (1 + G) * a1
+    a2p = (1 + G) * a2
+    C1p = np.hypot(a1p, b1)
+    C2p = np.hypot(a2p, b2)
+    avg_Cp = (C1p + C2p) / 2.0
+
+    h1p = np.degrees(np.arctan2(b1, a1p)) % 360.0
+    h2p = np.degrees(np.arctan2(b2, a2p)) % 360.0
+    avg_Hp = np.where(np.abs(h1p - h2p) > 180, (h1p + h2p + 360) / 2.0, (h1p + h2p) / 2.0)
+    T = (1 - 0.17 * np.cos(np.radians(avg_Hp - 30)) + 0.24 * np.cos(np.radians(2 * avg_Hp))
+         + 0.32 * np.cos(np.radians(3 * avg_Hp + 6)) - 0.2 * np.cos(np.radians(4 * avg_Hp - 63)))
+
+    delta_hp = h2p - h1p
+    delta_hp = np.where(delta_hp > 180, delta_hp - 360, np.where(delta_hp < -180, delta_hp + 360, delta_hp))
+    delta_Lp = L2 - L1
+    delta_Cp = C2p - C1p
+    delta_Hp = 2 * np.sqrt(C1p * C2p) * np.sin(np.radians(delta_hp) / 2.0)
+
+    S_L = 1 + (0.015 * (avg_Lp - 50) ** 2) / np.sqrt(20 + (avg_Lp - 50) ** 2)
+    S_C = 1 + 0.045 * avg_Cp
+    S_H = 1 + 0.015 * avg_Cp * T
+    delta_ro = 30 * np.exp(-(((avg_Hp - 275) / 25) ** 2))
+    R_C = np.sqrt(avg_Cp ** 7 / (avg_Cp ** 7 + 25.0 ** 7))
+    R_T = -2 * R_C * np.sin(2 * np.radians(delta_ro))
+
+    return np.sqrt((delta_Lp / S_L) ** 2 + (delta_Cp / S_C) ** 2 + (delta_Hp / S_H) ** 2
+                   + R_T * (delta_Cp / S_C) * (delta_Hp / S_H))
+
+
+class ColorStateDetector:
+    """颜色状态检测器
+
+    目标颜色在构造时一次性换算为 Lab；检测时把区域中心的一小块像素整体转换，
+    以逐像素色差的中位数作为判断依据，不受单个噪点或按钮边缘的影响。
+    """
+
+    def __init__(self, target_rgb: Tuple[int, int, int] = VERIFY_COLOR_PRESETS["金色砖皮"], threshold: float = 80.0,
+                 patch_radius: int = 5, legacy_scale: bool = True):
+        """
+        Args:
+            target_rgb: 目标颜色 (R, G, B)
+            threshold: 色差中位数低于该值时判定为目标状态
+            patch_radius: 取样块半径，取样块为 (2r+1)×(2r+1)
+            legacy_scale: 沿用旧版 colormath 调用的色差尺度（0~255 的像素值直接作为 0~1 分量传入），
+                使原有的阈值 80 保持有效；设为 False 使用标准 Lab，需要重新标定阈值
+        """
+        self.target_rgb = tuple(target_rgb)
+        self.threshold = threshold
+        self.patch_radius = patch_radius
+        self.scale = 1.0 if legacy_scale else 1.0 / 255.0
+        self.target_lab = bgr_to_lab(np.array(self.target_rgb[::-1], dtype=np.float64), self.scale)
+
+    def center_patch(self, frame: np.ndarray, region: Tuple[int, int, int, int]) -> np.ndarray:
+        """取区域中心的取样块（region 为帧内坐标）"""
+        left, top, right, bottom = region
+        cx, cy = (left + right) // 2, (top + bottom) // 2
+        rx = min(self.patch_radius, (right - left) // 2)
+        ry = min(self.patch_radius, (bottom - top) // 2)
+        return frame[cy - ry:cy + ry + 1, cx - rx:cx + rx + 1]
+
+    def measure(self, patch: np.ndarray) -> Tuple[float, Tuple[int, int, int]]:
+        """计算取样块与目标颜色的色差
+
+        Returns:
+            (色差中位数, 取样块颜色中位数 (R, G, B))
+        """
+        pixels = patch.reshape(-1, 3)
+        delta_e = delta_e_cie2000(bgr_to_lab(pixels, self.scale), self.target_lab)
+        b, g, r = np.median(pixels, axis=0).astype(int)
+        return float(np.median(delta_e)), (int(r), int(g), int(b))
+
+    def detect(self, patch: np.ndarray) -> Tuple[bool, float, Tuple[int, int, int]]:
+        """判断取样块是否处于目标状态
+
+        Returns:
+            (是否匹配, 色差中位数, 取样块颜色 (R, G, B))
+        """
+        delta_e, color = self.measure(patch)
+        return delta_e < self.threshold, delta_e, color
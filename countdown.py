@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+# @Author: BugNotFound
+# @Date: 2026-10-17
+# @Description: 倒计时时钟模型 - 由 OCR 读数及其截图时间推算倒计时归零的绝对时刻；秒跳沿检测
+
+import math
+import threading
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+class CountdownEstimator:
+    """倒计时时钟估计器
+
+    记 T0 为倒计时跳到 0 秒的时刻（与截图时刻同一时钟的时间轴），游戏时钟与本机时钟同速，
+    则显示值 k 的持续区间为 [T0 - k, T0 - k + 1)。
+    在时刻 t 读到 S 秒，说明 T0 ∈ (t + S - 1, t + S]；每个读数都是 T0 的一个区间约束，
+    取交集后区间宽度就是相位的不确定度。以约 1 秒为周期的采样相位各不相同，区间会快速收窄；
+    观测到秒跳沿时可直接得到几十毫秒宽的约束。
+    新观测与当前区间无交集（倒计时被刷新、读错）时以该观测重新开始。
+    """
+
+    def __init__(self, tolerance: float = 0.02):
+        """
+        Args:
+            tolerance: 每个观测区间两端放宽的秒数，吸收截图时间戳的误差
+        """
+        self.tolerance = tolerance
+        self.reset()
+
+    def reset(self):
+        """丢弃全部观测"""
+        self.lower = -math.inf
+        self.upper = math.inf
+        self.samples = 0
+
+    def _constrain(self, lower: float, upper: float) -> bool:
+        lower -= self.tolerance
+        upper += self.tolerance
+        new_lower = max(self.lower, lower)
+        new_upper = min(self.upper, upper)
+        if new_lower > new_upper:
+            self.lower, self.upper = lower, upper
+            self.samples = 1
+            return False
+        self.lower, self.upper = new_lower, new_upper
+        self.samples += 1
+        return True
+
+    def observe(self, remaining: int, capture_time: float) -> bool:
+        """加入一个读数
+
+        Args:
+            remaining: 读到的剩余秒数（分钟已折算）
+            capture_time: 该帧的截图时刻
+
+        Returns:
+            是否与已有观测一致（不一致时已重新开始）
+        """
+        return self._constrain(capture_time + remaining - 1, capture_time + remaining)
+
+    def observe_edge(self, new_value: int, time_before: float, time_after: float) -> bool:
+        """加入一次秒跳观测：显示在 (time_before, time_after] 之间跳到 new_value"""
+        return self._constrain(time_before + new_value, time_after + new_value)
+
+    @property
+    def valid(self) -> bool:
+        return self.samples > 0
+
+    @property
+    def zero_time(self) -> float:
+        """T0 的估计值（区间中点）"""
+        return (self.lower + self.upper) / 2
+
+    @property
+    def uncertainty(self) -> float:
+        """T0 估计的最大误差（区间半宽）"""
+        return (self.upper - self.lower) / 2 if self.valid else math.inf
+
+    def flip_time(self, value: int) -> float:
+        """显示跳到 value 秒的预测时刻"""
+        return self.zero_time - value
+
+    def remaining(self, now: float) -> float:
+        """now 时刻距离归零的预测剩余秒数"""
+        return self.zero_time - now
+
+
+class TickEdgeDetector:
+    """倒计时秒跳沿检测
+
+    逐帧比较倒计时区域（或其中秒数字所在的子区域）与上一帧的平均绝对差，
+    超过噪声水平即认为数字发生了跳变，跳变时刻落在 (上一帧截图时刻, 本帧截图时刻] 之间。
+    只做像素差分，不需要 OCR，精度取决于送入的帧率。
+    流水线模式下 update 在截图线程调用、reset 在决策线程调用，两者经同一把锁串行。
+    """
+
+    def __init__(self, sub_rect: Optional[Tuple[int, int, int, int]] = None, threshold: float = 1.0,
+                 noise_factor: float = 4.0, min_interval: float = 0.3):
+        """
+        Args:
+            sub_rect: 秒数字在倒计时区域内的相对坐标 (left, top, right, bottom)，None 表示整个区域。
+                倒计时文字只在秒跳时变化，整个区域同样可用，且不受位数变化（10 -> 9）导致的位移影响
+            threshold: 判定为跳变的最小平均灰度差。整个倒计时区域中只有一位数字变化时平均差约 1.5~3，
+                阈值不能高于这一量级；画面噪声由 noise_factor 自适应抬高阈值
+            noise_factor: 判定阈值相对于噪声水平（非跳变帧差的滑动平均）的倍数
+            min_interval: 两次跳变的最短间隔（秒），渲染跨多帧完成的跳变只记一次
+        """
+        self.sub_rect = sub_rect
+        self.threshold = threshold
+        self.noise_factor = noise_factor
+        self.min_interval = min_interval
+        self.edges = 0
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """丢弃参考帧"""
+        with self._lock:
+            self._prev: Optional[np.ndarray] = None
+            self._prev_time = 0.0
+            self.noise = 0.0
+            self.last_edge: Optional[Tuple[float, float]] = None
+
+    def edge_since(self, after: float) -> Optional[Tuple[float, float]]:
+        """最近一次跳变沿，仅当它发生在 after（上一次读数的截图时刻）之后时返回，否则返回 None"""
+        with self._lock:
+            edge = self.last_edge
+        if edge is None or edge[1] <= after:
+            return None
+        return edge
+
+    def update(self, roi: np.ndarray, timestamp: float) -> Optional[Tuple[float, float]]:
+        """送入一帧倒计时区域
+
+        Args:
+            roi: 倒计时区域截图
+            timestamp: 该帧的截图时刻
+
+        Returns:
+            检测到跳变时返回 (跳变前一帧时刻, 本帧时刻)，否则返回 None
+        """
+        if self.sub_rect is not None:
+            left, top, right, bottom = self.sub_rect
+            roi = roi[top:bottom, left:right]
+        gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY) if roi.ndim == 3 else roi
+        with self._lock:
+            if self._prev is None or self._prev.shape != gray.shape:
+                self._prev = gray.copy()
+                self._prev_time = timestamp
+                return None
+
+            diff = float(cv2.absdiff(gray, self._prev).mean())
+            edge = None
+            if diff > max(self.threshold, self.noise_factor * self.noise):
+                if self.last_edge is None or timestamp - self.last_edge[1] >= self.min_interval:
+                    edge = (self._prev_time, timestamp)
+                    self.last_edge = edge
+                    self.edges += 1
+            else:
+                self.noise = 0.9 * self.noise + 0.1 * diff
+            np.copyto(self._prev, gray)
+            self._prev_time = timestamp
+            return edge
+
+
+class CountdownTracker:
+    """单个倒计时的跟踪状态
+
+    把时钟模型、秒跳沿检测和读数筛选放在一起，每个被监控的商品各持有一份。
+    """
+
+    def __init__(self, tolerance: float = 0.02):
+        """
+        Args:
+            tolerance: 传给 CountdownEstimator 的观测区间放宽秒数
+        """
+        self.estimator = CountdownEstimator(tolerance=tolerance)
+        self.edge_detector = TickEdgeDetector()
+        self.last_remaining: Optional[int] = None
+        self.last_observed_time = 0.0
+
+    def reset(self):
+        """倒计时被刷新（或已购买）后重新开始跟踪"""
+        self.estimator.reset()
+        self.edge_detector.reset()
+        self.last_remaining = None
+        self.last_observed_time = 0.0
+
+    def observe(self, remaining: int, capture_time: float, edge: Optional[Tuple[float, float]] = None):
+        """用一次读数（及截至该帧检测到的秒跳沿）更新时钟模型
+
+        只采信读数恰好减 1、且发生在上次读数之后的跳变沿，排除刷新闪烁等非秒跳的画面变化；
+        跳变发生在上一帧与本帧之间，跳变后的值就是本帧读数。
+        """
+        self.estimator.observe(remaining, capture_time)
+        if (edge is not None and self.last_remaining is not None and remaining == self.last_remaining - 1
+                and edge[1] > self.last_observed_time):
+            self.estimator.observe_edge(remaining, *edge)
+        self.last_remaining = remaining
+        self.last_observed_time = capture_time
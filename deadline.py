@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+# @Author: BugNotFound
+# @Date: 2026-10-17
+# @Description: 精确截止时刻调度 - 粗睡眠 + 末段自旋等到绝对时刻再下发动作，等待期间提高系统定时器精度，并记录每次下发的误差
+
+import sys
+import threading
+from collections import deque, namedtuple
+from contextlib import contextmanager, nullcontext
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+from clock import Clock, REAL_CLOCK
+
+# 一次下发的记录：标签、目标时刻、实际下发时刻（均为时钟时间）
+DispatchRecord = namedtuple("DispatchRecord", ["label", "target", "achieved"])
+
+
+class _TimerResolution:
+    """Windows 系统定时器精度（timeBeginPeriod），引用计数，最后一个使用者退出时恢复
+
+    默认精度约 15.6ms，time.sleep 的唤醒误差与之同量级；调到 1ms 后粗睡眠的误差也降到 1~2ms。
+    其他平台的睡眠精度本身足够，这里不做任何事。
+    """
+
+    def __init__(self, period_ms: int = 1):
+        self.period_ms = period_ms
+        self._count = 0
+        self._lock = threading.Lock()
+        self._winmm = None
+        if sys.platform == "win32":
+            import ctypes
+            self._winmm = ctypes.WinDLL("winmm")
+
+    def acquire(self):
+        with self._lock:
+            self._count += 1
+            if self._count == 1 and self._winmm is not None:
+                self._winmm.timeBeginPeriod(self.period_ms)
+
+    def release(self):
+        with self._lock:
+            self._count -= 1
+            if self._count == 0 and self._winmm is not None:
+                self._winmm.timeEndPeriod(self.period_ms)
+
+
+_timer_resolution = _TimerResolution()
+
+
+class DeadlineScheduler:
+    """截止时刻调度器
+
+    目标为时钟上的绝对时刻：先 sleep 到目标前 spin_threshold 秒，再自旋读时钟直到目标，
+    自旋只占用末段约 2ms 的一个核心。等待期间提高系统定时器精度，等待结束即恢复。
+    虚拟时钟的 sleep 本身精确，不需要自旋。
+    """
+
+    def __init__(self, clock: Optional[Clock] = None, spin_threshold: float = 0.002, history: int = 1024,
+                 tracer=None):
+        """
+        Args:
+            clock: 目标时刻所在的时钟，None 表示实盘时钟
+            spin_threshold: 末段自旋的秒数，需大于提高精度后的睡眠唤醒误差
+            history: 保留的下发记录条数
+            tracer: 延迟追踪（LatencyTracer），每次下发前的等待记为 sleep 阶段、下发误差记为 deadline 阶段
+        """
+        self.clock = clock or REAL_CLOCK
+        self.spin_threshold = spin_threshold
+        self.tracer = tracer
+        self.records = deque(maxlen=history)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def armed(self):
+        """提高系统定时器精度（可嵌套）"""
+        _timer_resolution.acquire()
+        try:
+            yield
+        finally:
+            _timer_resolution.release()
+
+    def wait_until(self, target: float) -> float:
+        """等到 target 时刻
+
+        Returns:
+            实际到达的时刻（不早于 target）
+        """
+        now = self.clock.now()
+        if now >= target:
+            return now
+        with self.armed():
+            coarse = target - now - self.spin_threshold
+            if coarse > 0:
+                self.clock.sleep(coarse)
+            if self.clock.exact_sleep:
+                remaining = target - self.clock.now()
+                if remaining > 0:
+                    self.clock.sleep(remaining)
+            else:
+                while self.clock.now() < target:
+                    pass
+        return self.clock.now()
+
+    def sleep(self, seconds: float) -> float:
+        """精确等待一段时间，返回实际到达的时刻"""
+        return self.wait_until(self.clock.now() + seconds)
+
+    def dispatch(self, target: float, action: Callable, *args, label: str = "", **kwargs):
+        """等到 target 时刻执行 action(*args, **kwargs)，记录下发误差并返回 action 的结果"""
+        with self.tracer.span("sleep") if self.tracer is not None else nullcontext():
+            achieved = self.wait_until(target)
+        with self._lock:
+            self.records.append(DispatchRecord(label, target, achieved))
+        if self.tracer is not None:
+            self.tracer.record("deadline", target, achieved)
+        return action(*args, **kwargs)
+
+    def summary(self) -> Dict[str, float]:
+        """下发误差统计（毫秒）：均值、p50、p99、最大值"""
+        with self._lock:
+            errors = np.array([r.achieved - r.target for r in self.records]) * 1000.0
+        if errors.size == 0:
+            return {}
+        return {
+            "count": int(errors.size),
+            "mean": float(errors.mean()),
+            "p50": float(np.percentile(errors, 50)),
+            "p99": float(np.percentile(errors, 99)),
+            "max": float(errors.max()),
+        }
@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+# @Author: BugNotFound
+# @Date: 2026-10-17
+# @Description: 倒计时模板识别 - 用字形模板匹配读取 "N分N秒"，不经过 PaddleOCR
+
+import os
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+COUNTDOWN_PATTERN = re.compile(r'^(\d+)分(\d+)秒$')
+GLYPH_LABELS = "0123456789分秒"
+
+
+class DigitTemplateRecognizer:
+    """倒计时字形模板识别器
+
+    倒计时固定为 "N分N秒" 且使用同一种游戏字体，因此可以把 ROI 二值化后按列投影切分字形，
+    再与模板做归一化互相关（一次矩阵乘法完成所有字形与所有模板的匹配）。
+    模板不需要手工制作：用 PaddleOCR 在真实截图上的结果调用 learn() 自举。
+    learn() 只更新内存中的模板，可以在识别线程上持锁调用；由调用方在空闲时（如会话结束）调用 flush() 写入缓存。
+    置信度不足时 recognize() 返回 None，由调用方回退到 PaddleOCR。
+    """
+
+    def __init__(self, cache_path: Optional[str] = "models/digit_templates.npz", glyph_height: int = 20,
+                 glyph_width: int = 24, min_score: float = 0.8, max_samples: int = 20,
+                 log: Callable[[str], None] = print):
+        """
+        Args:
+            cache_path: 模板缓存文件路径，None 表示不落盘
+            glyph_height: 字形归一化高度
+            glyph_width: 字形画布宽度（字形按高度缩放后居中放置）
+            min_score: 每个字形的最低匹配分数（归一化互相关，-1~1）
+            max_samples: 每个模板最多累积的样本数，之后不再更新
+            log: 加载缓存时的提示输出
+        """
+        self.cache_path = cache_path
+        self.glyph_height = glyph_height
+        self.glyph_width = glyph_width
+        self.min_score = min_score
+        self.max_samples = max_samples
+        self.log = log
+        # 有尚未写入缓存的模板变化
+        self.dirty = False
+
+        # 模板以样本累加和保存，匹配矩阵在模板变化时重建
+        self._sums: Dict[str, np.ndarray] = {}
+        self._counts: Dict[str, int] = {}
+        # 同一字形内部的最大列间隙（如 "秒" 的左右两部分），小于等于该值的间隙会被合并
+        self.merge_gap = 0
+        self._labels: List[str] = []
+        self._matrix: Optional[np.ndarray] = None
+
+        if cache_path and os.path.exists(cache_path):
+            self.load(cache_path)
+
+    @property
+    def ready(self) -> bool:
+        """所有字形都已有模板"""
+        return all(label in self._counts for label in GLYPH_LABELS)
+
+    # ---------- 预处理 ----------
+
+    def _binarize(self, roi: np.ndarray) -> np.ndarray:
+        """灰度化 + Otsu 二值化，前景（文字）为 True"""
+        gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY) if roi.ndim == 3 else roi
+        _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        mask = binary > 0
+        # 文字像素应占少数，否则说明是深色文字浅色背景
+        if mask.mean() > 0.5:
+            mask = ~mask
+        return mask
+
+    def _column_runs(self, mask: np.ndarray) -> List[Tuple[int, int]]:
+        """按列投影切出连续的前景列段 [start, end)"""
+        cols = mask.any(axis=0)
+        if not cols.any():
+            return []
+        padded = np.concatenate(([False], cols, [False]))
+        edges = np.flatnonzero(padded[1:] != padded[:-1])
+        return list(zip(edges[::2], edges[1::2]))
+
+    def _merge_runs(self, runs: List[Tuple[int, int]], merge_gap: int) -> List[Tuple[int, int]]:
+        """合并间隙不超过 merge_gap 的相邻列段"""
+        merged: List[Tuple[int, int]] = []
+        for start, end in runs:
+            if merged and start - merged[-1][1] <= merge_gap:
+                merged[-1] = (merged[-1][0], end)
+            else:
+                merged.append((start, end))
+        return merged
+
+    def _normalize_glyph(self, mask: np.ndarray, start: int, end: int) -> np.ndarray:
+        """裁出单个字形，按高度缩放后居中放到固定画布，返回零均值单位范数向量"""
+        glyph = mask[:, start:end]
+        rows = np.flatnonzero(glyph.any(axis=1))
+        glyph = glyph[rows[0]:rows[-1] + 1].astype(np.float32)
+        h, w = glyph.shape
+        new_w = max(1, min(self.glyph_width, round(w * self.glyph_height / h)))
+        glyph = cv2.resize(glyph, (new_w, self.glyph_height), interpolation=cv2.INTER_AREA)
+        canvas = np.zeros((self.glyph_height, self.glyph_width), dtype=np.float32)
+        x0 = (self.glyph_width - new_w) // 2
+        canvas[:, x0:x0 + new_w] = glyph
+        vec = canvas.ravel()
+        vec -= vec.mean()
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm > 0 else vec
+
+    def _segment(self, roi: np.ndarray, merge_gap: int) -> Tuple[np.ndarray, List[Tuple[int, int]]]:
+        """切分并归一化所有字形，返回 (字形矩阵 n×D, 原始列段)"""
+        mask = self._binarize(roi)
+        runs = self._column_runs(mask)
+        merged = self._merge_runs(runs, merge_gap)
+        if not merged:
+            return np.empty((0, self.glyph_height * self.glyph_width), dtype=np.float32), runs
+        return np.stack([self._normalize_glyph(mask, s, e) for s, e in merged]), runs
+
+    # ---------- 识别 ----------
+
+    def _rebuild_matrix(self):
+        labels = [label for label in GLYPH_LABELS if label in self._counts]
+        if not labels:
+            self._labels, self._matrix = [], None
+            return
+        vecs = []
+        for label in labels:
+            vec = self._sums[label] / self._counts[label]
+            vec = vec - vec.mean()
+            norm = np.linalg.norm(vec)
+            vecs.append(vec / norm if norm > 0 else vec)
+        self._labels = labels
+        self._matrix = np.stack(vecs).astype(np.float32)
+
+    def match(self, roi: np.ndarray) -> Tuple[str, float]:
+        """匹配 ROI 中的所有字形
+
+        Returns:
+            (识别文本, 置信度)，置信度取所有字形中最低的匹配分数；无法匹配时为 ("", 0.0)
+        """
+        if self._matrix is None or roi is None or roi.size == 0:
+            return "", 0.0
+        glyphs, _ = self._segment(roi, self.merge_gap)
+        if len(glyphs) == 0:
+            return "", 0.0
+        scores = glyphs @ self._matrix.T
+        best = scores.argmax(axis=1)
+        text = ''.join(self._labels[i] for i in best)
+        return text, float(scores[np.arange(len(best)), best].min())
+
+    def recognize(self, roi: np.ndarray) -> Optional[str]:
+        """识别倒计时，置信度不足或格式不符时返回 None"""
+        if not self.ready:
+            return None
+        text, score = self.match(roi)
+        if score < self.min_score or not COUNTDOWN_PATTERN.match(text):
+            return None
+        return text
+
+    # ---------- 模板自举 ----------
+
+    def learn(self, roi: np.ndarray, text: str) -> bool:
+        """用 PaddleOCR 的识别结果给 ROI 中的字形打标签并累积到模板
+
+        Args:
+            roi: 倒计时区域截图
+            text: PaddleOCR 对该截图的识别结果
+
+        Returns:
+            是否成功学习（格式不符或字形数量对不上时跳过）
+        """
+        text = re.sub(r'\s+', '', text)
+        if not COUNTDOWN_PATTERN.match(text) or roi is None or roi.size == 0:
+            return False
+        mask = self._binarize(roi)
+        runs = self._column_runs(mask)
+        if len(runs) < len(text):
+            return False
+        # 列段多于字符数时，合并最小的间隙，直到数量一致
+        merge_gap = self.merge_gap
+        if len(runs) > len(text):
+            gaps = sorted(runs[i + 1][0] - runs[i][1] for i in range(len(runs) - 1))
+            merge_gap = max(merge_gap, gaps[len(runs) - len(text) - 1])
+        merged = self._merge_runs(runs, merge_gap)
+        if len(merged) != len(text):
+            return False
+        self.merge_gap = merge_gap
+
+        changed = False
+        for label, (start, end) in zip(text, merged):
+            if self._counts.get(label, 0) >= self.max_samples:
+                continue
+            vec = self._normalize_glyph(mask, start, end)
+            self._sums[label] = self._sums.get(label, 0) + vec
+            self._counts[label] = self._counts.get(label, 0) + 1
+            changed = True
+        if changed:
+            self._rebuild_matrix()
+            self.dirty = True
+        return True
+
+    def flush(self) -> bool:
+        """有未保存的模板变化时写入缓存文件
+
+        Returns:
+            是否写入了缓存
+        """
+        if not self.dirty or not self.cache_path:
+            return False
+        self.save(self.cache_path)
+        return True
+
+    def save(self, path: str):
+        """保存模板到磁盘"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        labels = [label for label in GLYPH_LABELS if label in self._counts]
+        np.savez_compressed(
+            path,
+            labels=np.array(labels),
+            sums=np.stack([self._sums[label] for label in labels]) if labels else np.empty((0,)),
+            counts=np.array([self._counts[label] for label in labels], dtype=np.int32),
+            merge_gap=np.int32(self.merge_gap),
+            shape=np.array([self.glyph_height, self.glyph_width], dtype=np.int32),
+        )
+        self.dirty = False
+
+    def load(self, path: str):
+        """从磁盘加载模板，字形尺寸不一致时忽略缓存"""
+        data = np.load(path)
+        if tuple(data["shape"]) != (self.glyph_height, self.glyph_width):
+            self.log(f"警告: 模板缓存尺寸不一致，已忽略: {path}")
+            return
+        labels = [str(label) for label in data["labels"]]
+        self._sums = {label: data["sums"][i].astype(np.float32) for i, label in enumerate(labels)}
+        self._counts = {label: int(data["counts"][i]) for i, label in enumerate(labels)}
+        self.merge_gap = int(data["merge_gap"])
+        self._rebuild_matrix()
+        self.log(f"✓ 已从文件加载 {len(labels)} 个倒计时字形模板")
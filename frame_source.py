@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+# @Author: BugNotFound
+# @Date: 2026-10-17
+# @Description: 帧来源抽象 - 除 dxcam 实时截图外，支持图片目录、视频文件、内存生成器按原始时序回放
+
+import os
+import re
+from typing import Callable, Iterable, Iterator, Optional, Tuple, Union
+
+import cv2
+import numpy as np
+
+from clock import Clock, REAL_CLOCK
+
+
+class FrameSource:
+    """帧来源基类
+
+    WindowCapture 只通过这组接口取帧，子类负责具体的画面来源。
+    帧统一为 BGR 格式的 numpy 数组；没有新画面时返回上一帧，尚无画面时返回 None。
+    """
+
+    def start(self):
+        """开始产生帧"""
+
+    def get_latest_frame(self) -> Optional[np.ndarray]:
+        """获取最新一帧"""
+        raise NotImplementedError
+
+    def latest_timestamp(self) -> Optional[float]:
+        """get_latest_frame 最近返回的帧的上屏时刻（时钟时间）
+
+        None 表示来源不知道，由 WindowCapture 以取到该帧的时刻代替
+        """
+        return None
+
+    def stop(self):
+        """停止并释放资源"""
+
+
+# 回放条目：(相对时间戳秒, 帧或返回帧的函数)，函数形式用于跳帧时避免无谓的解码
+PlaybackItem = Tuple[float, Union[np.ndarray, Callable[[], np.ndarray]]]
+
+
+class PlaybackSource(FrameSource):
+    """按时间戳回放的帧来源
+
+    realtime=True 时按原始时序播放：每次取帧返回时间戳不晚于已播放时长的最后一帧，
+    中间来不及取的帧会被跳过，与 dxcam 的 get_latest_frame 语义一致。
+    realtime=False 时每次取帧前进一帧，适合尽可能快地跑基准测试。
+    """
+
+    def __init__(self, realtime: bool = True, loop: bool = False, clock: Optional[Clock] = None):
+        """
+        Args:
+            realtime: 是否按原始时序播放
+            loop: 播放结束后是否从头循环
+            clock: 按时序播放时使用的时钟，None 表示实盘时钟
+        """
+        self.realtime = realtime
+        self.loop = loop
+        self.clock = clock or REAL_CLOCK
+        self.finished = False
+        self._iter: Optional[Iterator[PlaybackItem]] = None
+        self._pending: Optional[PlaybackItem] = None
+        self._frame: Optional[np.ndarray] = None
+        self._start_time = 0.0
+        self._time_offset = 0.0
+        self._frame_time: Optional[float] = None
+
+    def _items(self) -> Iterable[PlaybackItem]:
+        """子类实现：按时间顺序产生回放条目"""
+        raise NotImplementedError
+
+    def start(self):
+        self._iter = iter(self._items())
+        self._pending = next(self._iter, None)
+        self._frame = None
+        self.finished = self._pending is None
+        self._start_time = self.clock.now()
+        self._time_offset = self._pending[0] if self._pending else 0.0
+
+    def _advance(self):
+        """消费当前待播条目，读取下一条"""
+        ts, frame = self._pending
+        self._frame = frame() if callable(frame) else frame
+        self._pending = next(self._iter, None)
+        if self._pending is None and self.loop:
+            last_frame = self._frame
+            self.start()
+            self._frame = last_frame
+        elif self._pending is None:
+            self.finished = True
+
+    def get_latest_frame(self) -> Optional[np.ndarray]:
+        if self._iter is None:
+            self.start()
+        if not self.realtime:
+            if self._pending is not None:
+                self._advance()
+            return self._frame
+
+        elapsed = self.clock.now() - self._start_time
+        # 只解码最终要返回的那一帧
+        chosen = None
+        while self._pending is not None and self._pending[0] - self._time_offset <= elapsed:
+            chosen = self._pending
+            self._pending = next(self._iter, None)
+        if chosen is not None:
+            frame = chosen[1]
+            self._frame = frame() if callable(frame) else frame
+            self._frame_time = self._start_time + chosen[0] - self._time_offset
+        if self._pending is None:
+            if self.loop and chosen is not None:
+                last_frame = self._frame
+                self.start()
+                self._frame = last_frame
+            else:
+                self.finished = True
+        return self._frame
+
+    def latest_timestamp(self) -> Optional[float]:
+        # 按原始时序播放时帧的上屏时刻为其时间戳对应的时钟时间；逐帧播放没有时序可言
+        return self._frame_time if self.realtime else None
+
+    def stop(self):
+        self._iter = None
+        self._pending = None
+
+
+class ImageFolderSource(PlaybackSource):
+    """图片目录回放
+
+    文件按名称排序。若未指定 fps 且所有文件名都以数字结尾（如 frame_001234.png），
+    该数字视为毫秒时间戳；否则按 fps（默认 30）等间隔回放。
+    """
+
+    EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp")
+
+    def __init__(self, folder: str, fps: Optional[float] = None, realtime: bool = True, loop: bool = False,
+                 clock: Optional[Clock] = None):
+        """
+        Args:
+            folder: 图片目录
+            fps: 回放帧率，None 表示优先使用文件名中的毫秒时间戳
+            realtime: 是否按原始时序播放
+            loop: 播放结束后是否从头循环
+            clock: 按时序播放时使用的时钟
+        """
+        super().__init__(realtime=realtime, loop=loop, clock=clock)
+        names = sorted(n for n in os.listdir(folder) if n.lower().endswith(self.EXTENSIONS))
+        if not names:
+            raise ValueError(f"目录中没有可回放的图片: {folder}")
+        self.paths = [os.path.join(folder, n) for n in names]
+
+        stamps = [re.search(r'(\d+)$', os.path.splitext(n)[0]) for n in names]
+        if fps is None and all(stamps):
+            self.timestamps = [int(m.group(1)) / 1000.0 for m in stamps]
+        else:
+            interval = 1.0 / (fps or 30.0)
+            self.timestamps = [i * interval for i in range(len(names))]
+
+    def _items(self) -> Iterable[PlaybackItem]:
+        for ts, path in zip(self.timestamps, self.paths):
+            yield ts, (lambda p=path: cv2.imread(p, cv2.IMREAD_COLOR))
+
+
+class VideoFileSource(PlaybackSource):
+    """视频文件回放，时间戳取自解码器的播放位置"""
+
+    def __init__(self, path: str, realtime: bool = True, loop: bool = False, clock: Optional[Clock] = None):
+        """
+        Args:
+            path: 视频文件路径
+            realtime: 是否按原始时序播放
+            loop: 播放结束后是否从头循环
+            clock: 按时序播放时使用的时钟
+        """
+        super().__init__(realtime=realtime, loop=loop, clock=clock)
+        if not os.path.exists(path):
+            raise ValueError(f"视频文件不存在: {path}")
+        self.path = path
+        self._cap: Optional[cv2.VideoCapture] = None
+
+    def _items(self) -> Iterable[PlaybackItem]:
+        if self._cap is not None:
+            self._cap.release()
+        self._cap = cv2.VideoCapture(self.path)
+        if not self._cap.isOpened():
+            raise RuntimeError(f"无法打开视频文件: {self.path}")
+        fps = self._cap.get(cv2.CAP_PROP_FPS) or 30.0
+        index = 0
+        while True:
+            ok, frame = self._cap.read()
+            if not ok:
+                break
+            ts = self._cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+            # 部分容器不提供时间戳，按帧率推算
+            yield (ts if ts > 0 or index == 0 else index / fps), frame
+            index += 1
+
+    def stop(self):
+        super().stop()
+        if self._cap is not None:
+            self._cap.release()
+            self._cap = None
+
+
+class GeneratorSource(PlaybackSource):
+    """内存生成器回放
+
+    factory 每次调用返回一个新的可迭代对象，元素可以是 (时间戳秒, 帧)，
+    也可以是单独的帧（此时按 fps 等间隔）。循环播放时会重新调用 factory。
+    """
+
+    def __init__(self, factory: Callable[[], Iterable], fps: float = 30.0, realtime: bool = True, loop: bool = False,
+                 clock: Optional[Clock] = None):
+        """
+        Args:
+            factory: 返回帧序列的无参函数
+            fps: 元素不带时间戳时使用的帧率
+            realtime: 是否按原始时序播放
+            loop: 播放结束后是否从头循环
+            clock: 按时序播放时使用的时钟
+        """
+        super().__init__(realtime=realtime, loop=loop, clock=clock)
+        self.factory = factory
+        self.fps = fps
+
+    def _items(self) -> Iterable[PlaybackItem]:
+        for index, item in enumerate(self.factory()):
+            if isinstance(item, tuple):
+                yield item
+            else:
+                yield index / self.fps, item
+
+
+def open_frame_source(path: str, **kwargs) -> PlaybackSource:
+    """根据路径创建回放来源：会话录制目录按录制时序回放，其他目录按图片序列回放，其余按视频文件回放"""
+    if os.path.isdir(path):
+        if any(name.startswith("chunk_") and name.endswith(".bin") for name in os.listdir(path)):
+            # 会话录制依赖本模块，延迟导入
+            from session_recorder import RecordingSource
+            return RecordingSource(path, **kwargs)
+        return ImageFolderSource(path, **kwargs)
+    return VideoFileSource(path, **kwargs)
@@ -0,0 +1,372 @@
+# -*- coding: utf-8 -*-
+# @Author: BugNotFound
+# @Date: 2026-10-17
+# @Description: 商店界面模拟器 - 渲染倒计时、三角币与确认窗口，接收模拟点击，统计点击落点相对真实归零时刻的偏差
+
+import math
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from clock import Clock, REAL_CLOCK
+from color_detector import ColorStateDetector
+from frame_source import FrameSource
+
+# 确认窗口未弹出时 verify_check 区域的颜色 (R, G, B)，与确认按钮颜色的色差约 111，远高于默认阈值 80
+IDLE_DIALOG_RGB = (12, 14, 18)
+BACKGROUND_RGB = (24, 26, 30)
+TEXT_RGB = (235, 235, 235)
+# 未指定字体时依次尝试的中文字体（Windows / macOS / Linux 常见位置）
+CJK_FONT_CANDIDATES = (
+    "C:/Windows/Fonts/msyh.ttc",
+    "C:/Windows/Fonts/simhei.ttf",
+    "/System/Library/Fonts/PingFang.ttc",
+    "/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/noto-cjk/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/truetype/wqy/wqy-microhei.ttc",
+    "/usr/share/fonts/truetype/droid/DroidSansFallbackFull.ttf",
+    "/usr/share/fonts/google-droid/DroidSansFallbackFull.ttf",
+)
+
+
+def renders_cjk(font: ImageFont.FreeTypeFont) -> bool:
+    """字体能否显示倒计时中的“分”“秒”：缺字时两者都画成同一个缺字方框，或什么都不画"""
+    masks = [font.getmask(ch) for ch in "分秒"]
+    if any(mask.getbbox() is None for mask in masks):
+        return False
+    return bytes(masks[0]) != bytes(masks[1])
+
+
+def load_cjk_font(font_path: Optional[str], size: int) -> ImageFont.FreeTypeFont:
+    """加载能显示中文的字体
+
+    Args:
+        font_path: 字体文件，None 表示依次尝试 CJK_FONT_CANDIDATES
+        size: 字号
+
+    Raises:
+        FileNotFoundError: 指定的字体不存在或不能显示中文，或未指定时找不到任何可用的中文字体
+    """
+    candidates = [font_path] if font_path else [path for path in CJK_FONT_CANDIDATES if os.path.exists(path)]
+    for path in candidates:
+        try:
+            font = ImageFont.truetype(path, size)
+        except OSError:
+            continue
+        if renders_cjk(font):
+            return font
+    if font_path:
+        raise FileNotFoundError(f"字体 {font_path} 不存在或不能显示“分”“秒”")
+    raise FileNotFoundError("找不到能显示“分”“秒”的中文字体，请用 font_path（命令行 --font）指定，"
+                            "如 Droid Sans Fallback 或 Noto Sans CJK")
+
+
+class SimulatorConfig:
+    """模拟器参数（时间单位均为秒）"""
+
+    def __init__(self, countdown: float = 20.0, rounds: int = 5, price: int = 1000, money: int = 1000000,
+                 input_latency: float = 0.008, dialog_delay: float = 0.12, confirm_delay: float = 0.10,
+                 refresh_delay: float = 0.30, sale_window: float = 0.5, next_round_delay: float = 3.0,
+                 frame_size: Tuple[int, int] = (2560, 1440), dialog_rgb: Tuple[int, int, int] = (175, 109, 65),
+                 font_path: Optional[str] = None, hit_margin: int = 8, fps: float = 144.0,
+                 verify_delta_e: float = 80.0):
+        """
+        Args:
+            countdown: 每轮倒计时时长
+            rounds: 模拟的上架轮数，全部结束后倒计时区域保持空白
+            price: 每次购买扣除的三角币
+            money: 初始三角币
+            input_latency: 输入从下发到游戏处理的延迟
+            dialog_delay: 点击购买后确认窗口弹出的延迟
+            confirm_delay: 点击确认后扣款并关闭窗口的延迟
+            refresh_delay: 点击刷新后界面更新的延迟
+            sale_window: 归零后商品可购买的时长，超过后视为被他人买走
+            next_round_delay: 本轮结束后刷新出下一轮倒计时的间隔
+            frame_size: 画面尺寸 (宽, 高)
+            dialog_rgb: 确认窗口弹出时 verify_check 区域的颜色 (R, G, B)
+            font_path: 渲染中文的字体文件，None 表示在 CJK_FONT_CANDIDATES 中查找
+            hit_margin: 点击判定时区域向外扩展的像素数（点击位置带随机偏移）
+            fps: 画面刷新率，内容不变时也按该频率产生新帧
+            verify_delta_e: ScriptThread 确认窗口检测的色差阈值，构造模拟器时据此校验两种颜色可以区分
+        """
+        self.countdown = countdown
+        self.rounds = rounds
+        self.price = price
+        self.money = money
+        self.input_latency = input_latency
+        self.dialog_delay = dialog_delay
+        self.confirm_delay = confirm_delay
+        self.refresh_delay = refresh_delay
+        self.sale_window = sale_window
+        self.next_round_delay = next_round_delay
+        self.frame_size = frame_size
+        self.dialog_rgb = dialog_rgb
+        self.font_path = font_path
+        self.hit_margin = hit_margin
+        self.fps = fps
+        self.verify_delta_e = verify_delta_e
+
+
+class ClickEvent:
+    """一次点击在模拟器中的落点"""
+
+    def __init__(self, sent: float, landed: float, x: int, y: int, target: Optional[str], round_index: int,
+                 zero_time: float):
+        self.sent = sent
+        self.landed = landed
+        self.x = x
+        self.y = y
+        self.target = target
+        self.round_index = round_index
+        # 相对本轮真实归零时刻的偏差，负数表示过早
+        self.offset = landed - zero_time
+
+    def __repr__(self):
+        return f"ClickEvent({self.target}, round={self.round_index}, offset={self.offset * 1000:+.1f}ms)"
+
+
+class GameSimulator:
+    """商店界面模拟器
+
+    状态随时间推进：倒计时归零后商品可在 sale_window 内购买；点击购买弹出确认窗口，
+    点击确认扣款。同时提供与 pydirectinput 相同签名的 click / press，可直接作为 ScriptThread 的输入后端。
+    所有输入按 input_latency 延后生效，画面在取帧时按当前时刻重新计算。
+    """
+
+    def __init__(self, regions: Dict[str, Tuple[int, int, int, int]], config: Optional[SimulatorConfig] = None,
+                 clock: Optional[Clock] = None):
+        """
+        Args:
+            regions: 区域名称到屏幕坐标的映射（与 RegionSelector 相同），至少包含
+                time / money / verify_check / buy / verify / refresh
+            config: 模拟器参数
+            clock: 模拟器的时钟，需与 ScriptThread 使用同一个
+
+        Raises:
+            FileNotFoundError: 没有能显示中文的字体（默认字体渲染不出“分”“秒”，倒计时无法识别）
+            ValueError: 确认窗口的两种颜色无法区分
+        """
+        self.regions = {name: tuple(r) for name, r in regions.items()}
+        self.config = config or SimulatorConfig()
+        self.clock = clock or REAL_CLOCK
+        self._check_dialog_colors()
+        self.font = load_cjk_font(self.config.font_path, self._font_size())
+        self.clicks: List[ClickEvent] = []
+        self.purchases: List[Tuple[int, float]] = []
+        self._lock = threading.RLock()
+        self._pending: List[Tuple[float, str, tuple]] = []
+        self._frame: Optional[np.ndarray] = None
+        self._frame_key = None
+        self._frame_index = -1
+        # 最近一次 render 返回的帧的上屏时刻
+        self.frame_time: Optional[float] = None
+        self.reset()
+
+    def _check_dialog_colors(self):
+        """确认窗口两种状态的颜色必须被 ColorStateDetector 正确区分，
+        否则关闭的窗口也被判为弹出，ScriptThread 会一直点击确认
+
+        Raises:
+            ValueError: 颜色在当前阈值下无法区分
+        """
+        detector = ColorStateDetector(target_rgb=self.config.dialog_rgb, threshold=self.config.verify_delta_e)
+        for rgb, expected in ((IDLE_DIALOG_RGB, False), (self.config.dialog_rgb, True)):
+            matched, delta_e, _ = detector.detect(np.full((3, 3, 3), rgb[::-1], dtype=np.uint8))
+            if matched != expected:
+                raise ValueError(f"确认窗口{'弹出' if expected else '未弹出'}时的颜色 {rgb} 色差 {delta_e:.1f}，"
+                                 f"在阈值 {self.config.verify_delta_e} 下无法区分")
+
+    def _font_size(self) -> int:
+        left, top, right, bottom = self.regions["time"]
+        return max(10, int((bottom - top) * 0.85))
+
+    def reset(self, now: Optional[float] = None):
+        """从第一轮倒计时重新开始"""
+        with self._lock:
+            now = self.clock.now() if now is None else now
+            self.money = self.config.money
+            self.round_index = 0
+            self.zero_time = now + self.config.countdown
+            self.dialog_open = False
+            self.sold = False
+            self.clicks.clear()
+            self.purchases.clear()
+            self._pending.clear()
+            self._frame_key = None
+
+    # ---------- 输入 ----------
+
+    def click(self, x: Optional[int] = None, y: Optional[int] = None, clicks: int = 1, interval: float = 0.0,
+              button: str = "left"):
+        """模拟 pydirectinput.click：连击之间与真实输入一样阻塞 interval 秒"""
+        for i in range(clicks):
+            if i:
+                self.clock.sleep(interval)
+            sent = self.clock.now()
+            with self._lock:
+                self._pending.append((sent + self.config.input_latency, "click", (sent, x, y)))
+
+    def press(self, key: str):
+        """模拟 pydirectinput.press"""
+        sent = self.clock.now()
+        with self._lock:
+            self._pending.append((sent + self.config.input_latency, "press", (sent, key)))
+
+    def _hit(self, x: int, y: int) -> Optional[str]:
+        margin = self.config.hit_margin
+        for name in ("verify", "buy", "refresh"):
+            region = self.regions.get(name)
+            if region and region[0] - margin <= x <= region[2] + margin and region[1] - margin <= y <= region[3] + margin:
+                return name
+        return None
+
+    # ---------- 状态推进 ----------
+
+    def _handle(self, due: float, kind: str, args: tuple):
+        """处理一条生效的输入，返回需要延后执行的界面变化"""
+        cfg = self.config
+        if kind == "press":
+            if args[1] == "esc" and self.dialog_open:
+                return [(due, "close", ())]
+            return []
+        sent, x, y = args
+        target = self._hit(x, y)
+        self.clicks.append(ClickEvent(sent, due, x, y, target, self.round_index, self.zero_time))
+        if target == "buy" and self.zero_time <= due < self.zero_time + cfg.sale_window and not self.sold:
+            return [(due + cfg.dialog_delay, "open", ())]
+        if target == "verify" and self.dialog_open:
+            return [(due + cfg.confirm_delay, "confirm", ())]
+        if target == "refresh" and due >= self.zero_time + cfg.sale_window:
+            return [(due + cfg.refresh_delay, "next_round", ())]
+        return []
+
+    def _apply(self, due: float, kind: str):
+        cfg = self.config
+        if kind == "open" and not self.sold:
+            self.dialog_open = True
+        elif kind == "close":
+            self.dialog_open = False
+        elif kind == "confirm" and self.dialog_open:
+            self.dialog_open = False
+            self.sold = True
+            self.money -= cfg.price
+            self.purchases.append((self.round_index, due - self.zero_time))
+        elif kind == "next_round" and self.round_index + 1 < cfg.rounds:
+            self.round_index += 1
+            self.zero_time = max(due, self.zero_time + cfg.sale_window) + cfg.next_round_delay + cfg.countdown
+            self.dialog_open = False
+            self.sold = False
+
+    def advance(self, now: Optional[float] = None):
+        """处理所有在 now 之前生效的输入与界面变化"""
+        now = self.clock.now() if now is None else now
+        with self._lock:
+            while True:
+                ready = [item for item in self._pending if item[0] <= now]
+                if not ready:
+                    break
+                item = min(ready, key=lambda p: p[0])
+                self._pending.remove(item)
+                due, kind, args = item
+                if kind in ("click", "press"):
+                    self._pending.extend(self._handle(due, kind, args))
+                else:
+                    self._apply(due, kind)
+
+    # ---------- 渲染 ----------
+
+    def countdown_text(self, now: float) -> str:
+        """倒计时显示文本：显示值为剩余时间向上取整，归零后不显示"""
+        remaining = math.ceil(self.zero_time - now)
+        if remaining <= 0:
+            return ""
+        return f"{remaining // 60}分{remaining % 60}秒"
+
+    def _draw_text(self, frame: np.ndarray, region: Tuple[int, int, int, int], text: str):
+        left, top, right, bottom = region
+        patch = Image.new("RGB", (right - left, bottom - top), BACKGROUND_RGB)
+        if text:
+            ImageDraw.Draw(patch).text((2, 0), text, fill=TEXT_RGB, font=self.font)
+        frame[top:bottom, left:right] = np.asarray(patch)[:, :, ::-1]
+
+    def render(self, now: Optional[float] = None) -> np.ndarray:
+        """渲染当前时刻的画面（BGR）
+
+        界面内容不变时复用上一帧的像素；每个刷新周期返回一个新的视图对象，
+        与 dxcam 一样即使画面静止也持续出帧。
+        """
+        now = self.clock.now() if now is None else now
+        self.advance(now)
+        with self._lock:
+            key = (self.countdown_text(now), self.money, self.dialog_open)
+            index = int(now * self.config.fps)
+            if key == self._frame_key:
+                if index != self._frame_index:
+                    # 内容不变的新一帧在本刷新周期开始时上屏
+                    self._frame_index = index
+                    self._frame = self._frame[:]
+                    self.frame_time = index / self.config.fps
+                return self._frame
+            width, height = self.config.frame_size
+            frame = np.empty((height, width, 3), dtype=np.uint8)
+            frame[:] = BACKGROUND_RGB[::-1]
+            self._draw_text(frame, self.regions["time"], key[0])
+            self._draw_text(frame, self.regions["money"], f"{key[1]:,}")
+            left, top, right, bottom = self.regions["verify_check"]
+            frame[top:bottom, left:right] = (self.config.dialog_rgb if key[2] else IDLE_DIALOG_RGB)[::-1]
+            # 每次内容变化生成新数组，消费者手中的旧帧不会被改写
+            self._frame = frame
+            self._frame_key = key
+            self._frame_index = index
+            self.frame_time = now
+            return frame
+
+    # ---------- 统计 ----------
+
+    def report(self) -> Dict:
+        """按轮汇总：首次有效购买点击、最早一次购买点击与成交相对归零时刻的偏差（毫秒）"""
+        with self._lock:
+            rounds = []
+            for index in range(self.round_index + 1):
+                buys = [c for c in self.clicks if c.round_index == index and c.target == "buy"]
+                valid = [c for c in buys if 0 <= c.offset < self.config.sale_window]
+                purchase = next((offset for i, offset in self.purchases if i == index), None)
+                rounds.append({
+                    "round": index,
+                    "buy_clicks": len(buys),
+                    "early_clicks": sum(c.offset < 0 for c in buys),
+                    "first_buy_ms": buys[0].offset * 1000.0 if buys else None,
+                    "first_valid_buy_ms": valid[0].offset * 1000.0 if valid else None,
+                    "purchase_ms": purchase * 1000.0 if purchase is not None else None,
+                })
+            landed = [r["first_valid_buy_ms"] for r in rounds if r["first_valid_buy_ms"] is not None]
+            return {
+                "rounds": rounds,
+                "purchases": len(self.purchases),
+                "money": self.money,
+                "first_valid_buy_ms": {
+                    "mean": float(np.mean(landed)),
+                    "p50": float(np.percentile(landed, 50)),
+                    "p95": float(np.percentile(landed, 95)),
+                    "max": float(np.max(landed)),
+                } if landed else None,
+            }
+
+
+class SimulatorSource(FrameSource):
+    """把模拟器画面作为帧来源交给 WindowCapture"""
+
+    def __init__(self, simulator: GameSimulator):
+        self.simulator = simulator
+
+    def start(self):
+        self.simulator.reset()
+
+    def get_latest_frame(self) -> Optional[np.ndarray]:
+        return self.simulator.render()
+
+    def latest_timestamp(self) -> Optional[float]:
+        return self.simulator.frame_time
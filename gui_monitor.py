@@ -5,10 +5,20 @@
 
 from PyQt6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
                              QLabel, QPushButton, QGroupBox, QTextEdit,
-                             QSpinBox, QDoubleSpinBox, QCheckBox)
-from PyQt6.QtCore import Qt, pyqtSignal, QObject
+                             QSpinBox, QDoubleSpinBox, QCheckBox, QComboBox)
+from datetime import datetime
+
+from PyQt6.QtCore import Qt, pyqtSignal, QObject, QTimer
 from PyQt6.QtGui import QFont
 
+from color_detector import VERIFY_COLOR_PRESETS
+from log_model import LogBuffer, DiagnosticCounters
+
+# 日志最多保留的条数（缓冲与日志框相同）
+LOG_CAPACITY = 500
+# 日志、状态、倒计时的界面刷新帧率
+UI_REFRESH_FPS = 20
+
 
 class ScriptController(QObject):
     """脚本控制信号"""
@@ -28,6 +38,7 @@ class MonitorWindow(QMainWindow):
         # 状态变量
         self.is_running = False
         self.is_paused = False
+        self.engine_ready = False  # 模型在后台加载，预热完成前不能开始
         self.minutes = "--"
         self.seconds = "--"
         self.ocr_text = ""
@@ -43,8 +54,20 @@ class MonitorWindow(QMainWindow):
         self.ocr_interval = 0.95  # OCR识别间隔（time >= 5）（秒）
         self.continue_after_complete = True  # 任务完成后继续运行
         self.click_refresh_at_3s = True  # 3秒时点击刷新按钮
+        self.predict_deadline = True  # 按倒计时模型预测的时刻点击
+        self.verify_skin = "金色砖皮"  # 确认按钮颜色对应的皮肤
+
+        # 脚本线程只写这两个模型，界面按固定帧率批量刷新
+        self.log_buffer = LogBuffer(LOG_CAPACITY)
+        self.diagnostics = DiagnosticCounters()
+        self._diagnostics_version = 0
+        self._status_style = None
         
         self.init_ui()
+
+        self._flush_timer = QTimer(self)
+        self._flush_timer.timeout.connect(self.flush_ui)
+        self._flush_timer.start(1000 // UI_REFRESH_FPS)
         
     def init_ui(self):
         """初始化UI"""
@@ -129,8 +152,43 @@ class MonitorWindow(QMainWindow):
         self.timer_label.setStyleSheet("color: #00BCD4; padding: 10px;")
         timer_layout.addWidget(self.timer_label)
 
+        # 最近一次 OCR 结果与置信度
+        self.ocr_label = QLabel("OCR: --")
+        self.ocr_label.setFont(QFont("微软雅黑", 10))
+        self.ocr_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.ocr_label.setStyleSheet("color: #757575;")
+        timer_layout.addWidget(self.ocr_label)
+
         main_layout.addWidget(timer_group)
         
+        # ========== 延迟统计组 ===========
+        latency_group = QGroupBox("延迟统计 (ms)")
+        latency_group.setStyleSheet("""
+            QGroupBox {
+                font-size: 14px;
+                font-weight: bold;
+                border: 2px solid #607D8B;
+                border-radius: 5px;
+                margin-top: 0px;
+                padding-top: 10px;
+            }
+        """)
+        latency_layout = QVBoxLayout()
+        latency_group.setLayout(latency_layout)
+
+        self.latency_label = QLabel("暂无数据")
+        self.latency_label.setStyleSheet("""
+            QLabel {
+                color: #37474F;
+                font-family: Consolas, monospace;
+                font-size: 10px;
+                padding: 2px;
+            }
+        """)
+        latency_layout.addWidget(self.latency_label)
+
+        main_layout.addWidget(latency_group)
+        
         # ========== 脚本配置组 ==========
         config_group = QGroupBox("脚本配置")
         config_group.setStyleSheet("""
@@ -236,6 +294,21 @@ class MonitorWindow(QMainWindow):
         ocr_interval_layout.addStretch()
         config_layout.addLayout(ocr_interval_layout)
         
+        # 确认按钮皮肤（决定确认窗口检测的目标颜色）
+        skin_layout = QHBoxLayout()
+        skin_label = QLabel("确认按钮皮肤:")
+        skin_label.setFont(QFont("微软雅黑", 10))
+        skin_label.setFixedWidth(120)
+        self.skin_combo = QComboBox()
+        self.skin_combo.addItems(list(VERIFY_COLOR_PRESETS.keys()))
+        self.skin_combo.setCurrentText(self.verify_skin)
+        self.skin_combo.setFont(QFont("微软雅黑", 10))
+        self.skin_combo.currentTextChanged.connect(self.on_skin_changed)
+        skin_layout.addWidget(skin_label)
+        skin_layout.addWidget(self.skin_combo)
+        skin_layout.addStretch()
+        config_layout.addLayout(skin_layout)
+        
         # 任务完成后继续运行选项
         continue_layout = QHBoxLayout()
         self.continue_checkbox = QCheckBox("任务完成后继续运行")
@@ -274,6 +347,25 @@ class MonitorWindow(QMainWindow):
         refresh_layout.addStretch()
         config_layout.addLayout(refresh_layout)
         
+        # 预测点击时刻选项
+        predict_layout = QHBoxLayout()
+        self.predict_checkbox = QCheckBox("按预测时刻点击（相位锁定）")
+        self.predict_checkbox.setFont(QFont("微软雅黑", 10))
+        self.predict_checkbox.setChecked(self.predict_deadline)
+        self.predict_checkbox.stateChanged.connect(self.on_predict_changed)
+        self.predict_checkbox.setStyleSheet("""
+            QCheckBox {
+                padding: 5px;
+            }
+            QCheckBox::indicator {
+                width: 18px;
+                height: 18px;
+            }
+        """)
+        predict_layout.addWidget(self.predict_checkbox)
+        predict_layout.addStretch()
+        config_layout.addLayout(predict_layout)
+        
         main_layout.addWidget(config_group)
         
         # ========== 日志区域 ==========
@@ -303,15 +395,30 @@ class MonitorWindow(QMainWindow):
                 border: 1px solid #37474F;
             }
         """)
+        # 超出的最旧行由文档自动丢弃，会话再长内存也不增长
+        self.log_text.document().setMaximumBlockCount(LOG_CAPACITY)
         log_layout.addWidget(self.log_text)
+
+        # 高频诊断（校验颜色、OCR 结果等）只显示次数与最后一次的值
+        self.diagnostics_label = QLabel("")
+        self.diagnostics_label.setStyleSheet("""
+            QLabel {
+                color: #37474F;
+                font-family: Consolas, monospace;
+                font-size: 10px;
+                padding: 2px;
+            }
+        """)
+        log_layout.addWidget(self.diagnostics_label)
         
         main_layout.addWidget(log_group)
         
         # ========== 控制按钮区域 ==========
         button_layout = QHBoxLayout()
         
-        # 开始按钮
-        self.start_btn = QPushButton("▶ 开始")
+        # 开始按钮（引擎加载完成后解锁）
+        self.start_btn = QPushButton("⏳ 加载中")
+        self.start_btn.setEnabled(False)
         self.start_btn.setFont(QFont("微软雅黑", 11, QFont.Weight.Bold))
         self.start_btn.setStyleSheet("""
             QPushButton {
@@ -395,17 +502,20 @@ class MonitorWindow(QMainWindow):
         self.status = status
         self.status_label.setText(f"状态: {status}")
         
-        # 根据状态改变颜色
+        # 根据状态改变颜色（样式表解析较慢，颜色不变时不重设）
         if "运行" in status or "监控" in status:
-            self.status_label.setStyleSheet("color: #4CAF50; padding: 5px;")
+            style = "color: #4CAF50; padding: 5px;"
         elif "暂停" in status:
-            self.status_label.setStyleSheet("color: #FF9800; padding: 5px;")
+            style = "color: #FF9800; padding: 5px;"
         elif "完成" in status or "成功" in status:
-            self.status_label.setStyleSheet("color: #2196F3; padding: 5px;")
+            style = "color: #2196F3; padding: 5px;"
         elif "错误" in status or "失败" in status:
-            self.status_label.setStyleSheet("color: #F44336; padding: 5px;")
+            style = "color: #F44336; padding: 5px;"
         else:
-            self.status_label.setStyleSheet("color: #757575; padding: 5px;")
+            style = "color: #757575; padding: 5px;"
+        if style != self._status_style:
+            self._status_style = style
+            self.status_label.setStyleSheet(style)
     
     def update_timer(self, minutes, seconds):
         """更新倒计时"""
@@ -422,10 +532,22 @@ class MonitorWindow(QMainWindow):
         except:
             pass
     
+    def update_latency(self, text):
+        """更新延迟统计面板"""
+        self.latency_label.setText(text)
+
+    def set_engine_ready(self, ready):
+        """后台加载完成（或失败）时更新开始按钮"""
+        self.engine_ready = ready
+        self.start_btn.setText("▶ 开始" if ready else "⏳ 加载中")
+        self.start_btn.setEnabled(ready and not self.is_running)
+        self.update_status("就绪" if ready else "加载中...")
+    
     def update_ocr(self, text, confidence):
         """更新OCR信息"""
         self.ocr_text = text
         self.confidence = confidence
+        self.ocr_label.setText(f"OCR: {text or '（空）'}  置信度 {confidence:.2f}")
     
     def on_delay_changed(self, value):
         """购买点击延迟变更"""
@@ -452,6 +574,11 @@ class MonitorWindow(QMainWindow):
         self.ocr_interval = value
         self.add_log(f"⚙️ OCR识别间隔已设置为: {value}秒")
     
+    def on_skin_changed(self, value):
+        """确认按钮皮肤变更"""
+        self.verify_skin = value
+        self.add_log(f"⚙️ 确认按钮皮肤已设置为: {value}")
+    
     def on_continue_changed(self, state):
         """任务完成后继续运行选项变更"""
         self.continue_after_complete = (state == 2)  # Qt.CheckState.Checked = 2
@@ -464,6 +591,12 @@ class MonitorWindow(QMainWindow):
         status = "启用" if self.click_refresh_at_3s else "禁用"
         self.add_log(f"⚙️ 3秒时点击刷新: {status}")
     
+    def on_predict_changed(self, state):
+        """预测点击时刻选项变更"""
+        self.predict_deadline = (state == 2)  # Qt.CheckState.Checked = 2
+        status = "启用" if self.predict_deadline else "禁用"
+        self.add_log(f"⚙️ 按预测时刻点击: {status}")
+    
     def get_config(self):
         """获取当前配置"""
         return {
@@ -473,7 +606,9 @@ class MonitorWindow(QMainWindow):
             'verify_interval': self.verify_interval,
             'ocr_interval': self.ocr_interval,
             'continue_after_complete': self.continue_after_complete,
-            'click_refresh_at_3s': self.click_refresh_at_3s
+            'click_refresh_at_3s': self.click_refresh_at_3s,
+            'predict_deadline': self.predict_deadline,
+            'verify_skin': self.verify_skin
         }
     
     def increment_clicks(self):
@@ -481,14 +616,30 @@ class MonitorWindow(QMainWindow):
         self.click_count += 1
     
     def add_log(self, message):
-        """添加日志"""
-        from datetime import datetime
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        self.log_text.append(f"[{timestamp}] {message}")
-        # 自动滚动到底部
-        self.log_text.verticalScrollBar().setValue(
-            self.log_text.verticalScrollBar().maximum()
-        )
+        """添加日志（写入日志缓冲，任意线程可调用，下一次界面刷新时显示）"""
+        self.log_buffer.append(message)
+
+    def flush_ui(self):
+        """把上次刷新以来的日志、状态、倒计时和诊断计数一次性绘制到界面"""
+        entries, skipped, slots = self.log_buffer.drain()
+        if entries:
+            lines = [f"[{datetime.fromtimestamp(e.time).strftime('%H:%M:%S')}] {e.message}" for e in entries]
+            if skipped:
+                lines.insert(0, f"…（省略 {skipped} 条）")
+            self.log_text.append("\n".join(lines))
+            # 自动滚动到底部
+            self.log_text.verticalScrollBar().setValue(
+                self.log_text.verticalScrollBar().maximum()
+            )
+        if "status" in slots:
+            self.update_status(slots["status"])
+        if "timer" in slots:
+            self.update_timer(*slots["timer"])
+        if "ocr" in slots:
+            self.update_ocr(*slots["ocr"])
+        if self.diagnostics.version != self._diagnostics_version:
+            self._diagnostics_version = self.diagnostics.version
+            self.diagnostics_label.setText(self.diagnostics.format())
     
     def on_start_clicked(self):
         """开始按钮点击"""
@@ -522,7 +673,7 @@ class MonitorWindow(QMainWindow):
         """停止按钮点击"""
         self.is_running = False
         self.is_paused = False
-        self.start_btn.setEnabled(True)
+        self.start_btn.setEnabled(self.engine_ready)
         self.pause_btn.setEnabled(False)
         self.pause_btn.setText("⏸ 暂停")
         self.stop_btn.setEnabled(False)
@@ -533,7 +684,7 @@ class MonitorWindow(QMainWindow):
     def on_complete(self):
         """任务完成"""
         self.is_running = False
-        self.start_btn.setEnabled(True)
+        self.start_btn.setEnabled(self.engine_ready)
         self.pause_btn.setEnabled(False)
         self.stop_btn.setEnabled(False)
         self.update_status("✅ 任务完成！")
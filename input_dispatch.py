@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+# @Author: BugNotFound
+# @Date: 2026-10-17
+# @Description: 输入下发 - 统一的输入后端接口（SendInput 直发、pydirectinput、记录桩），并统计从决策到输入入队的耗时
+
+import sys
+import threading
+from collections import deque, namedtuple
+from typing import Optional
+
+from clock import Clock, REAL_CLOCK
+
+# 记录桩收到的一次输入：下发时刻、类型（click / press）、参数
+InputEvent = namedtuple("InputEvent", ["time", "kind", "args"])
+
+
+class InputBackend:
+    """输入后端接口
+
+    click / press 与 pydirectinput 同签名，pydirectinput 模块和模拟器也可直接当作后端使用。
+    返回时输入已进入系统输入队列（或被记录），不等待游戏处理。
+    move 只移动光标，供调用方在时间不敏感时提前把光标放到下一次点击的位置。
+    """
+
+    name = ""
+
+    def move(self, x: int, y: int):
+        """把光标移动到 (x, y)，不点击"""
+        raise NotImplementedError
+
+    def click(self, x: Optional[int] = None, y: Optional[int] = None, clicks: int = 1, interval: float = 0.0,
+              button: str = "left"):
+        """移动到 (x, y) 并点击 clicks 次，连击之间等待 interval 秒"""
+        raise NotImplementedError
+
+    def press(self, key: str):
+        """按下并松开一个键"""
+        raise NotImplementedError
+
+
+class SendInputBackend(InputBackend):
+    """直接调用 Win32 SendInput
+
+    按下、松开两个事件放在同一个数组里一次提交，系统保证它们连续进入输入队列，中间不会插入其他输入。
+    移动单独提交，之后等待 move_settle 秒再按下：与按下放在同一批时，按帧读取光标的游戏可能在光标
+    移到之前就处理了按下，点到旧位置。光标已在目标位置（调用方提前 move 过）时不再移动也不等待，
+    对时间敏感的点击应先 move 到位，点击时只剩一次按下松开的提交。
+    没有 pydirectinput 每次调用后的全局 PAUSE 等待。事件数组在构造时分配，每次只改写坐标。
+    按键使用扫描码，与 pydirectinput 一样能被 DirectInput 游戏识别。
+    """
+
+    name = "sendinput"
+
+    # 鼠标按键对应的 (按下, 松开) 标志
+    _BUTTON_FLAGS = {"left": (0x0002, 0x0004), "right": (0x0008, 0x0010), "middle": (0x0020, 0x0040)}
+    # 常用按键的扫描码
+    SCAN_CODES = {
+        "esc": 0x01, "escape": 0x01, "enter": 0x1C, "return": 0x1C, "space": 0x39, "tab": 0x0F,
+        "backspace": 0x0E, "f": 0x21, "e": 0x12, "r": 0x13,
+    }
+
+    def __init__(self, clock: Optional[Clock] = None, move_settle: float = 0.01):
+        """
+        Args:
+            clock: 连击间隔与移动后等待所用的时钟
+            move_settle: 点击前需要移动光标时，移动与按下之间等待的秒数（约一帧）
+        """
+        if sys.platform != "win32":
+            raise RuntimeError("SendInput 后端仅支持 Windows")
+        import ctypes
+        from ctypes import wintypes
+
+        class MOUSEINPUT(ctypes.Structure):
+            _fields_ = [("dx", wintypes.LONG), ("dy", wintypes.LONG), ("mouseData", wintypes.DWORD),
+                        ("dwFlags", wintypes.DWORD), ("time", wintypes.DWORD), ("dwExtraInfo", ctypes.c_size_t)]
+
+        class KEYBDINPUT(ctypes.Structure):
+            _fields_ = [("wVk", wintypes.WORD), ("wScan", wintypes.WORD), ("dwFlags", wintypes.DWORD),
+                        ("time", wintypes.DWORD), ("dwExtraInfo", ctypes.c_size_t)]
+
+        class HARDWAREINPUT(ctypes.Structure):
+            _fields_ = [("uMsg", wintypes.DWORD), ("wParamL", wintypes.WORD), ("wParamH", wintypes.WORD)]
+
+        class _INPUTUNION(ctypes.Union):
+            _fields_ = [("mi", MOUSEINPUT), ("ki", KEYBDINPUT), ("hi", HARDWAREINPUT)]
+
+        class INPUT(ctypes.Structure):
+            _anonymous_ = ("u",)
+            _fields_ = [("type", wintypes.DWORD), ("u", _INPUTUNION)]
+
+        self.clock = clock or REAL_CLOCK
+        self.move_settle = move_settle
+        user32 = ctypes.WinDLL("user32", use_last_error=True)
+        self._send = user32.SendInput
+        self._send.argtypes = (wintypes.UINT, ctypes.POINTER(INPUT), ctypes.c_int)
+        self._send.restype = wintypes.UINT
+        self._size = ctypes.sizeof(INPUT)
+        self._get_last_error = ctypes.get_last_error
+        # 绝对坐标按主屏尺寸归一化到 0~65535（与 pydirectinput 一致）
+        self.screen_width = user32.GetSystemMetrics(0)
+        self.screen_height = user32.GetSystemMetrics(1)
+        self._get_cursor_pos = user32.GetCursorPos
+        self._cursor = wintypes.POINT()
+
+        # [移动]
+        self._move = (INPUT * 1)()
+        self._move[0].type = 0  # INPUT_MOUSE
+        self._move[0].mi.dwFlags = 0x0001 | 0x8000  # MOVE | ABSOLUTE
+        # 每种按键的 [按下, 松开]
+        self._clicks = {}
+        for button, (down, up) in self._BUTTON_FLAGS.items():
+            click = (INPUT * 2)()
+            for event, flags in zip(click, (down, up)):
+                event.type = 0
+                event.mi.dwFlags = flags
+            self._clicks[button] = click
+        # [按下, 松开]
+        self._keys = (INPUT * 2)()
+        for event, flags in zip(self._keys, (0x0008, 0x0008 | 0x0002)):  # SCANCODE, SCANCODE | KEYUP
+            event.type = 1  # INPUT_KEYBOARD
+            event.ki.dwFlags = flags
+        self._lock = threading.Lock()
+
+    def _submit(self, events, count: int):
+        sent = self._send(count, events, self._size)
+        if sent != count:
+            raise OSError(f"SendInput 只提交了 {sent}/{count} 个事件 (错误码 {self._get_last_error()})")
+
+    def _at(self, x: int, y: int) -> bool:
+        """光标是否已在 (x, y)"""
+        return bool(self._get_cursor_pos(self._cursor)) and (self._cursor.x, self._cursor.y) == (x, y)
+
+    def _move_to(self, x: int, y: int):
+        self._move[0].mi.dx = x * 65536 // self.screen_width + 1
+        self._move[0].mi.dy = y * 65536 // self.screen_height + 1
+        self._submit(self._move, 1)
+
+    def move(self, x: int, y: int):
+        with self._lock:
+            self._move_to(x, y)
+
+    def click(self, x: Optional[int] = None, y: Optional[int] = None, clicks: int = 1, interval: float = 0.0,
+              button: str = "left"):
+        click = self._clicks[button]
+        with self._lock:
+            if x is not None and y is not None and not self._at(x, y):
+                self._move_to(x, y)
+                if self.move_settle > 0:
+                    self.clock.sleep(self.move_settle)
+            for i in range(clicks):
+                if i:
+                    self.clock.sleep(interval)
+                self._submit(click, 2)
+
+    def press(self, key: str):
+        scan = self.SCAN_CODES.get(key.lower())
+        if scan is None:
+            raise KeyError(f"SendInput 后端未配置按键 {key!r} 的扫描码")
+        with self._lock:
+            for event in self._keys:
+                event.ki.wScan = scan
+            self._submit(self._keys, 2)
+
+
+class PyDirectInputBackend(InputBackend):
+    """pydirectinput 后端（原实现）
+
+    pydirectinput 每次调用后会按全局 PAUSE（默认 0.1 秒）阻塞，移动与按下松开也是分开提交的。
+    pause 不为 None 时改写该全局值。
+    """
+
+    name = "pydirectinput"
+
+    def __init__(self, pause: Optional[float] = None):
+        """
+        Args:
+            pause: pydirectinput.PAUSE 的新值，None 表示保留库的默认值
+        """
+        import pydirectinput
+        self._module = pydirectinput
+        if pause is not None:
+            pydirectinput.PAUSE = pause
+
+    def move(self, x: int, y: int):
+        self._module.moveTo(x, y)
+
+    def click(self, x: Optional[int] = None, y: Optional[int] = None, clicks: int = 1, interval: float = 0.0,
+              button: str = "left"):
+        self._module.click(x=x, y=y, clicks=clicks, interval=interval, button=button)
+
+    def press(self, key: str):
+        self._module.press(key)
+
+
+class RecordingBackend(InputBackend):
+    """记录桩：不产生真实输入，只按下发时刻记录每次点击和按键，用于离线测试和基准"""
+
+    name = "recording"
+
+    def __init__(self, clock: Optional[Clock] = None, max_events: int = 10000):
+        """
+        Args:
+            clock: 记录时刻与连击间隔所用的时钟
+            max_events: 保留的最大事件数
+        """
+        self.clock = clock or REAL_CLOCK
+        self.events = deque(maxlen=max_events)
+
+    def move(self, x: int, y: int):
+        self.events.append(InputEvent(self.clock.now(), "move", (x, y)))
+
+    def click(self, x: Optional[int] = None, y: Optional[int] = None, clicks: int = 1, interval: float = 0.0,
+              button: str = "left"):
+        for i in range(clicks):
+            if i:
+                self.clock.sleep(interval)
+            self.events.append(InputEvent(self.clock.now(), "click", (x, y, button)))
+
+    def press(self, key: str):
+        self.events.append(InputEvent(self.clock.now(), "press", (key,)))
+
+
+def create_input_backend(kind: str = "sendinput", clock: Optional[Clock] = None) -> InputBackend:
+    """按名称创建输入后端
+
+    Args:
+        kind: sendinput（Win32 SendInput 直发）、pydirectinput 或 recording（记录桩）
+        clock: 连击间隔所用的时钟
+    """
+    if kind == "sendinput":
+        return SendInputBackend(clock=clock)
+    if kind == "pydirectinput":
+        return PyDirectInputBackend()
+    if kind == "recording":
+        return RecordingBackend(clock=clock)
+    raise ValueError(f"未知的输入后端: {kind}")
+
+
+class InputDispatcher:
+    """输入下发
+
+    包装任意输入后端（InputBackend、pydirectinput 模块或模拟器），签名不变，
+    每次点击记录从决策（调用时刻，或调用方给出的 decided_at）到后端返回、输入已入队的耗时，
+    记入延迟追踪的 click 阶段。连击只计第一次点击入队前的耗时，之后的间隔等待不计入。
+    """
+
+    def __init__(self, backend, clock: Optional[Clock] = None, tracer=None):
+        """
+        Args:
+            backend: 提供 click / press 的输入后端
+            clock: 计时用的时钟，需与 decided_at 同一时钟
+            tracer: 延迟追踪（LatencyTracer），None 表示不记录
+        """
+        self.backend = backend
+        self.clock = clock or REAL_CLOCK
+        self.tracer = tracer
+        # 最近一次点击从决策到入队的秒数，以及入队时刻
+        self.last_latency = 0.0
+        self.last_queued = 0.0
+
+    def click(self, x: Optional[int] = None, y: Optional[int] = None, clicks: int = 1, interval: float = 0.0,
+              button: str = "left", decided_at: Optional[float] = None):
+        decided_at = self.clock.now() if decided_at is None else decided_at
+        self.backend.click(x=x, y=y, clicks=1, interval=0.0, button=button)
+        queued = self.last_queued = self.clock.now()
+        self.last_latency = queued - decided_at
+        if self.tracer is not None:
+            self.tracer.record("click", decided_at, queued)
+        if clicks > 1:
+            self.clock.sleep(interval)
+            self.backend.click(x=x, y=y, clicks=clicks - 1, interval=interval, button=button)
+        return queued
+
+    def move(self, x: int, y: int):
+        """提前移动光标；后端没有 move（如模拟器、pydirectinput 模块本身）时什么都不做"""
+        move = getattr(self.backend, "move", None)
+        if move is not None:
+            move(x, y)
+
+    def press(self, key: str):
+        self.backend.press(key)
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+# @Author: BugNotFound
+# @Date: 2026-10-17
+# @Description: 热路径延迟追踪 - 分阶段计时、滚动 p50/p95/p99 统计、导出 Chrome trace-event JSON
+
+import json
+import os
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from clock import Clock, REAL_CLOCK
+
+
+class LatencyTracer:
+    """分阶段延迟追踪
+
+    每个阶段保留最近 window 个耗时用于计算分位数；完整的事件序列（有上限）用于导出会话 trace，
+    导出的文件可以直接拖进 chrome://tracing 或 https://ui.perfetto.dev 查看。
+    单次记录只有两次读时钟和一次加锁追加，可以常开。
+    """
+
+    def __init__(self, window: int = 512, max_events: int = 200000, clock: Optional[Clock] = None):
+        """
+        Args:
+            window: 每个阶段用于统计分位数的最近样本数
+            max_events: 导出 trace 时保留的最大事件数，超出后丢弃最早的事件
+            clock: 计时用的时钟，record 传入的时间需来自同一时钟
+        """
+        self.window = window
+        self.clock = clock or REAL_CLOCK
+        self._durations: Dict[str, deque] = {}
+        self._counts: Dict[str, int] = {}
+        self._events = deque(maxlen=max_events)
+        self._lock = threading.Lock()
+        self._origin = self.clock.now()
+
+    def record(self, stage: str, start: float, end: float):
+        """记录一段耗时（时钟时间）"""
+        with self._lock:
+            durations = self._durations.get(stage)
+            if durations is None:
+                durations = self._durations[stage] = deque(maxlen=self.window)
+                self._counts[stage] = 0
+            durations.append(end - start)
+            self._counts[stage] += 1
+            self._events.append((stage, start, end, threading.get_ident()))
+
+    @contextmanager
+    def span(self, stage: str):
+        """用 with 语句记录一个阶段的耗时"""
+        start = self.clock.now()
+        try:
+            yield
+        finally:
+            self.record(stage, start, self.clock.now())
+
+    def summary(self) -> Dict[str, Tuple[float, float, float, int]]:
+        """各阶段的 (p50, p95, p99, 总次数)，单位毫秒"""
+        with self._lock:
+            snapshot = {stage: (np.array(d), self._counts[stage]) for stage, d in self._durations.items() if d}
+        result = {}
+        for stage, (durations, count) in snapshot.items():
+            p50, p95, p99 = np.percentile(durations * 1000.0, [50, 95, 99])
+            result[stage] = (float(p50), float(p95), float(p99), count)
+        return result
+
+    def format_summary(self) -> str:
+        """格式化为等宽文本表格"""
+        lines = [f"{'阶段':<8}{'p50':>8}{'p95':>8}{'p99':>8}{'次数':>6}"]
+        for stage, (p50, p95, p99, count) in self.summary().items():
+            lines.append(f"{stage:<10}{p50:>8.2f}{p95:>8.2f}{p99:>8.2f}{count:>8}")
+        return "\n".join(lines)
+
+    def export_chrome_trace(self, path: str):
+        """导出 Chrome trace-event 格式的会话记录"""
+        with self._lock:
+            events = list(self._events)
+        pid = os.getpid()
+        trace = [{
+            "name": stage,
+            "ph": "X",
+            "ts": (start - self._origin) * 1e6,
+            "dur": (end - start) * 1e6,
+            "pid": pid,
+            "tid": tid,
+        } for stage, start, end, tid in events]
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, f)
+        print(f"✓ 延迟 trace 已导出到: {path}")
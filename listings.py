@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+# @Author: BugNotFound
+# @Date: 2026-10-17
+# @Description: 多商品监控 - 按区域名后缀分组的商品、各自的倒计时跟踪，以及购买时刻冲突时的点击排队
+
+import math
+from typing import Dict, List, Optional, Tuple
+
+from countdown import CountdownTracker
+
+# 区域名后缀分隔符：time / buy 为第 1 个商品，time#2 / buy#2 为第 2 个，依此类推
+LISTING_SEPARATOR = "#"
+DEFAULT_LISTING = "1"
+# 每个商品需要的区域；确认、刷新、三角币等区域所有商品共用
+LISTING_REGION_NAMES = ("time", "buy")
+
+Region = Tuple[int, int, int, int]
+
+
+def listing_groups(regions: Dict[str, Region]) -> Dict[str, Dict[str, Region]]:
+    """从扁平的区域表中按后缀分组出商品，缺少 time 或 buy 的组会被忽略
+
+    Returns:
+        商品名到 {"time": 区域, "buy": 区域} 的映射，按商品名排序
+    """
+    groups: Dict[str, Dict[str, Region]] = {}
+    for name, region in regions.items():
+        base, _, listing = name.partition(LISTING_SEPARATOR)
+        if base in LISTING_REGION_NAMES:
+            groups.setdefault(listing or DEFAULT_LISTING, {})[base] = tuple(region)
+    return {name: groups[name] for name in sorted(groups)
+            if all(base in groups[name] for base in LISTING_REGION_NAMES)}
+
+
+def listing_time_region_names(regions: Dict[str, Region]) -> List[str]:
+    """所有商品倒计时区域的名称（截图时需要包含在 ROI 包围盒内）"""
+    return [f"time{LISTING_SEPARATOR}{name}" if name != DEFAULT_LISTING else "time"
+            for name in listing_groups(regions)]
+
+
+class Listing:
+    """一个被监控的商品：倒计时区域、购买按钮区域和独立的倒计时跟踪"""
+
+    def __init__(self, name: str, time_region: Region, buy_region: Region):
+        self.name = name
+        self.time_region = time_region
+        self.buy_region = buy_region
+        self.tracker = CountdownTracker()
+        # 本轮是否已在 3 秒时点过刷新
+        self.refreshed = False
+        self.last_text = ""
+
+    @property
+    def countdown(self):
+        return self.tracker.estimator
+
+    def reset(self):
+        """倒计时被刷新或已购买后重新开始"""
+        self.tracker.reset()
+        self.refreshed = False
+
+    def __repr__(self):
+        return f"Listing({self.name})"
+
+
+class ClickScheduler:
+    """多商品购买时刻排队
+
+    一次购买流程（点击购买、确认、刷新、核对三角币）会占用鼠标 busy_time 秒，期间不能处理别的商品。
+    按截止时刻从早到晚安排，开始时刻与前一个流程重叠的往后顺延，顺延量记录在计划中。
+    顺延超过 max_lateness 的商品由调用方放弃（见 too_late）。max_lateness 不小于 busy_time，
+    保证与前一个商品同时到期的商品至少能顺延一个流程，而不是一冲突就被放弃。
+    """
+
+    def __init__(self, busy_time: float = 2.5, max_lateness: Optional[float] = None):
+        """
+        Args:
+            busy_time: 一次购买流程占用的秒数
+            max_lateness: 允许的最大顺延秒数，None 表示等于 busy_time；小于 busy_time 时按 busy_time 处理
+        """
+        self.busy_time = busy_time
+        self.max_lateness = busy_time if max_lateness is None else max(max_lateness, busy_time)
+        self.busy_until = -math.inf
+        self._deadlines: Dict[str, Tuple[float, Listing]] = {}
+
+    def schedule(self, listing: Listing, deadline: float):
+        """设置（或更新）商品的购买时刻"""
+        self._deadlines[listing.name] = (deadline, listing)
+
+    def cancel(self, listing: Listing):
+        self._deadlines.pop(listing.name, None)
+
+    def scheduled(self, listing: Listing) -> bool:
+        return listing.name in self._deadlines
+
+    def plan(self) -> List[Tuple[float, Listing, float]]:
+        """按截止时刻排队
+
+        Returns:
+            [(实际开始时刻, 商品, 截止时刻)]，实际开始时刻晚于截止时刻说明发生了冲突
+        """
+        plan = []
+        free_at = self.busy_until
+        for deadline, listing in sorted(self._deadlines.values(), key=lambda item: item[0]):
+            start = max(deadline, free_at)
+            plan.append((start, listing, deadline))
+            free_at = start + self.busy_time
+        return plan
+
+    def too_late(self, start: float, deadline: float) -> bool:
+        """顺延量是否超过 max_lateness"""
+        return start - deadline > self.max_lateness
+
+    def next(self) -> Optional[Tuple[float, Listing, float]]:
+        """下一个要执行的购买，没有时返回 None"""
+        plan = self.plan()
+        return plan[0] if plan else None
+
+    def complete(self, listing: Listing, finished_at: float):
+        """一次购买流程结束"""
+        self.cancel(listing)
+        self.busy_until = finished_at
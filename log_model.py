@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+# @Author: BugNotFound
+# @Date: 2026-10-17
+# @Description: 日志模型 - 有界环形日志、最新值状态槽与高频诊断计数，脚本线程只写内存，界面按固定帧率批量刷新
+
+import threading
+import time
+from collections import deque, namedtuple
+from typing import Callable, Dict, List, Optional, Tuple
+
+# 一条日志：墙钟时刻（time.time，仅用于显示）、内容
+LogEntry = namedtuple("LogEntry", ["time", "message"])
+
+
+class LogBuffer:
+    """有界环形日志 + 最新值槽
+
+    append / post 只加锁写内存，可在任意线程调用，不经过 Qt 事件队列；
+    界面定时 drain 取走上次刷新以来的新日志和各槽的最新值，一次性绘制。
+    刷新前写入超过 capacity 条时最旧的会被挤掉，drain 返回被挤掉的条数。
+    状态、倒计时等只关心最新值的内容用 post 写入槽位，多次写入只保留最后一次。
+    """
+
+    def __init__(self, capacity: int = 500, echo: Optional[Callable[[str], None]] = None):
+        """
+        Args:
+            capacity: 保留的最大日志条数
+            echo: 每条日志写入时同步调用的回调（无界面运行时打印用），None 表示不回调
+        """
+        self.capacity = capacity
+        self.echo = echo
+        self._entries = deque(maxlen=capacity)
+        self._appended = 0
+        self._drained = 0
+        self._slots: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def append(self, message: str):
+        """追加一条日志"""
+        with self._lock:
+            self._entries.append(LogEntry(time.time(), message))
+            self._appended += 1
+        if self.echo is not None:
+            self.echo(message)
+
+    def post(self, key: str, value):
+        """写入最新值槽（覆盖尚未刷新的旧值）"""
+        with self._lock:
+            self._slots[key] = value
+
+    def drain(self) -> Tuple[List[LogEntry], int, Dict[str, object]]:
+        """取走上次 drain 以来的新日志与槽位
+
+        Returns:
+            (新日志, 刷新前被挤掉的条数, 槽位最新值)
+        """
+        with self._lock:
+            pending = self._appended - self._drained
+            kept = min(pending, len(self._entries))
+            entries = list(self._entries)[len(self._entries) - kept:] if kept else []
+            self._drained = self._appended
+            slots, self._slots = self._slots, {}
+        return entries, pending - kept, slots
+
+    def entries(self) -> List[LogEntry]:
+        """当前保留的全部日志"""
+        with self._lock:
+            return list(self._entries)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DiagnosticCounters:
+    """高频诊断计数
+
+    校验颜色、OCR 结果这类每帧都可能产生的信息不逐条写日志，只累计次数并保留最后一次的值。
+    """
+
+    def __init__(self):
+        self._counts: Dict[str, int] = {}
+        self._last: Dict[str, object] = {}
+        self._lock = threading.Lock()
+        # 每次 count 递增，界面据此判断是否需要重绘
+        self.version = 0
+
+    def count(self, key: str, value=None):
+        """计数一次，value 不为 None 时记为最后一次的值"""
+        with self._lock:
+            self._counts[key] = self._counts.get(key, 0) + 1
+            if value is not None:
+                self._last[key] = value
+            self.version += 1
+
+    def snapshot(self) -> Dict[str, Tuple[int, object]]:
+        """各项的 (次数, 最后一次的值)"""
+        with self._lock:
+            return {key: (count, self._last.get(key)) for key, count in self._counts.items()}
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+            self._last.clear()
+            self.version += 1
+
+    def format(self) -> str:
+        """格式化为每项一行的文本"""
+        return "\n".join(f"{key}: {count}" + ("" if last is None else f"  {last}")
+                         for key, (count, last) in self.snapshot().items())
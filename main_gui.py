@@ -9,24 +9,28 @@ import sys
 import re
 import time
 import ctypes
+import threading
 
 from window_capture import *
 from region_selector import RegionSelector
 from gui_monitor import MonitorWindow
+from digit_recognizer import DigitTemplateRecognizer
+from ocr_engine import OcrBackend, OcrResultCache, create_ocr_backend
+from ocr_daemon import connect_ocr_daemon
+from countdown import CountdownTracker
+from listings import Listing, ClickScheduler, listing_groups, listing_time_region_names
+from color_detector import ColorStateDetector, VERIFY_COLOR_PRESETS
+from pipeline import CountdownPipeline
+from latency_trace import LatencyTracer
+from deadline import DeadlineScheduler
+from input_dispatch import InputDispatcher, create_input_backend
+from clock import REAL_CLOCK
+from log_model import LogBuffer, DiagnosticCounters
+from session_recorder import SessionRecorder
 
-import numpy
-from paddleocr import PaddleOCR
+import numpy as np
 from PyQt6.QtWidgets import QApplication
 from PyQt6.QtCore import QThread, pyqtSignal
-import pydirectinput
-from colormath.color_objects import sRGBColor, LabColor
-from colormath.color_diff import delta_e_cie2000
-from colormath.color_conversions import convert_color
-
-def patch_asscalar(a):
-    return a.item()
-
-setattr(numpy, "asscalar", patch_asscalar)
 
 def is_admin():
     """检查是否以管理员权限运行"""
@@ -57,12 +61,21 @@ def run_as_admin():
     return True
 
 
-def click_region_center(region: tuple, clicks=1, interval=0.1):
-    """点击区域的中心位置 - 使用多种方法尝试
-    
-    Args:
-        region: (left, top, right, bottom) 格式的区域坐标
-    """
+_input_sink = None
+_input_sink_lock = threading.Lock()
+
+
+def default_input_sink():
+    """真实输入后端（仅支持 Windows，首次使用时创建，之后复用同一个实例）"""
+    global _input_sink
+    with _input_sink_lock:
+        if _input_sink is None:
+            _input_sink = create_input_backend(INPUT_BACKEND)
+        return _input_sink
+
+
+def region_click_point(region: tuple) -> tuple:
+    """区域中心附近的点击位置 (x, y)"""
     left, top, right, bottom = region
     center_x = (left + right) // 2
     center_y = (top + bottom) // 2
@@ -71,77 +84,507 @@ def click_region_center(region: tuple, clicks=1, interval=0.1):
     # 在20个像素的范围内随机偏移，防止被检测
     center_x += int((os.urandom(1)[0] / 255 - 0.5) * 10)
     center_y += int((os.urandom(1)[0] / 255 - 0.5) * 10)
+    return center_x, center_y
 
-    pydirectinput.click(x=center_x, y=center_y, clicks=clicks, interval=interval, button=pydirectinput.LEFT)
+
+def click_region_center(region: tuple, clicks=1, interval=0.1, sink=None, point=None, **kwargs):
+    """点击区域的中心位置 - 使用多种方法尝试
+    
+    Args:
+        region: (left, top, right, bottom) 格式的区域坐标
+        sink: 输入后端，需提供与 pydirectinput 相同签名的 click，None 表示默认的真实输入后端
+        point: 点击位置，None 表示由 region_click_point 生成；传入提前 move 过的位置时点击不再移动光标
+        kwargs: 原样传给 sink.click 的额外参数（如 InputDispatcher 的 decided_at）
+    """
+    center_x, center_y = point or region_click_point(region)
+    (sink or default_input_sink()).click(x=center_x, y=center_y, clicks=clicks, interval=interval, button="left",
+                                         **kwargs)
 
 def extract_and_merge_digits(s: str) -> str:
     """识别字符串中的所有数字并合并为一个新字符串"""
     return ''.join(re.findall(r'\d', s))
     
 
+# OCR 后端：固定区域已紧贴文字，默认跳过文字检测只跑识别模型（paddle_rec）；
+# paddle 为完整的检测+识别流水线；onnx 为 ONNX Runtime CPU 纯识别，适合没有可用 CUDA 的机器
+OCR_BACKEND = "paddle_rec"
+OCR_DEVICE = "gpu:0"
+# onnx 后端的推理线程数
+OCR_THREADS = 4
+# 识别工作进程数：大于 0 时模型在子进程中推理，ROI 经共享内存传递，界面线程不再与推理争用 GIL
+OCR_WORKERS = 0
+# 启动时优先连接常驻的 OCR 服务（ocr_daemon.py），连不上再在本进程加载模型；默认关闭，需要时手动开启
+OCR_DAEMON = False
+
+COUNTDOWN_RE = re.compile(r'(\d+)\s*分\s*(\d+)\s*秒')
+
+# 输入后端：sendinput 直接调用 SendInput，按下、松开一次提交；pydirectinput 为原实现，每次调用后固定阻塞 PAUSE 秒
+INPUT_BACKEND = "sendinput"
+
+# 需要读取像素的区域，ROI 截图模式只截取这些区域（联合包围盒，或包围盒过大时排成的紧凑帧）
+ROI_REGION_NAMES = ("time", "money", "verify_check")
+
+
 class ScriptThread(QThread):
     """脚本运行线程"""
     
-    status_updated = pyqtSignal(str)
-    timer_updated = pyqtSignal(str, str)
-    ocr_updated = pyqtSignal(str, float)
     click_performed = pyqtSignal()
     task_completed = pyqtSignal()
+    latency_updated = pyqtSignal(str)
     
-    def __init__(self, selector: RegionSelector, win_cap: WindowCapture, ocr, config):
+    def __init__(self, selector: RegionSelector, win_cap: WindowCapture, ocr: OcrBackend, config,
+                 digit_recognizer: DigitTemplateRecognizer = None, input_sink=None, clock=None,
+                 log: LogBuffer = None, diagnostics: DiagnosticCounters = None):
         super().__init__()
         self.selector = selector
         self.win_cap = win_cap
         self.ocr = ocr
+        self.digit_recognizer = digit_recognizer
+        # 状态与日志只写入内存中的日志模型，由界面按固定帧率批量刷新，不在热路径上逐条发信号
+        self.log = log if log is not None else LogBuffer()
+        self.diagnostics = diagnostics if diagnostics is not None else DiagnosticCounters()
+        # 所有计时与等待都经过 clock，离线模拟时可换成虚拟时钟（需关闭流水线）
+        self.clock = clock or REAL_CLOCK
+        # 热路径各阶段耗时
+        self.tracer = LatencyTracer(clock=self.clock)
+        # 输入后端，默认 SendInput；离线测试时传入模拟器。经 InputDispatcher 下发，记录决策到输入入队的耗时
+        self.input = InputDispatcher(input_sink or default_input_sink(), clock=self.clock, tracer=self.tracer)
+        # 同一份 ROI 像素只识别一次
+        self.ocr_cache = OcrResultCache()
+        # 由倒计时读数推算归零时刻，逐帧检测秒跳沿给时钟模型提供帧级精度的相位约束
+        self.tracker = CountdownTracker()
+        self.countdown = self.tracker.estimator
+        self.tick_detector = self.tracker.edge_detector
+        self.last_capture_time = 0.0
+        self.last_frame_id = 0
+        self.last_edge = None
+        # OCR 引擎、结果缓存和模板学习可能被流水线识别线程与本线程同时使用
+        self.ocr_lock = threading.Lock()
+        self.pipeline = None
+        # 购买点击按绝对时刻精确下发（粗睡眠 + 末段自旋），并记录下发误差
+        self.deadlines = DeadlineScheduler(clock=self.clock, tracer=self.tracer)
+        self._last_latency_emit = 0.0
+        # 会话录制：只记录 ROI 裁剪图、识别结果、色差与点击时刻，run() 中按 record_session 创建
+        self.recorder = None
+        self.region_names = {}
         self.config = config
+        # 确认按钮颜色随皮肤不同，目标色在这里一次性换算
+        self.color_detector = ColorStateDetector(
+            target_rgb=VERIFY_COLOR_PRESETS.get(config.get('verify_skin'), VERIFY_COLOR_PRESETS["金色砖皮"]),
+            threshold=config.get('verify_delta_e', 80.0)
+        )
         self.is_running = True
         self.is_paused = False
     
     def frame_cut(self, frame, region):
-        """裁剪图像区域"""
-        left, top, right, bottom = region
-        return frame[top:bottom, left:right]
+        """裁剪图像区域（屏幕坐标，ROI 模式下自动换算到截图帧坐标）"""
+        return self.win_cap.crop(frame, region)
 
     def verify_window(self) -> bool:
         """检查确认按钮区域的颜色是否变化"""
-        frame = self.win_cap.capture()
-        while frame is None or frame.size == 0: frame = self.win_cap.capture()
-        region = self.selector.get_region("verify_check")
-        # 获取区域中心颜色
-        color_tmp = frame[((region[1] + region[3]) // 2), ((region[0] + region[2]) // 2)]
-        center_color = convert_color(
-            sRGBColor(color_tmp[2], color_tmp[1], color_tmp[0]),  # BGR to sRGB
-            LabColor
-        )
-        # 预设的确认按钮中心颜色 (BGR)
-        target_color = convert_color(
-            sRGBColor(175, 109, 65),  # BGR：适用于金色砖皮
-            LabColor
-        )
-        # 计算颜色差异
-        delta_e = delta_e_cie2000(center_color, target_color)
+        # 等待一帧比已处理过的更新、且在上次点击入队之后上屏的画面，避免拿点击前的旧帧做判断
+        try:
+            frame = self.next_frame()
+            while self.last_capture_time < self.input.last_queued:
+                frame = self.next_frame()
+        except FrameTimeoutError as e:
+            self.diagnostics.count("校验失败", str(e))
+            return False
+        check_region = self.selector.get_region("verify_check")
+        region = self.win_cap.to_frame_coords(check_region)
+        # 取区域中心一小块像素，与预设的确认按钮颜色比较
+        patch = self.color_detector.center_patch(frame, region)
+        matched, delta_e, color = self.color_detector.detect(patch)
         # 色差小说明显示了确认窗口
-        self.status_updated.emit(f"颜色：{color_tmp[2], color_tmp[1], color_tmp[0]}")
-        self.status_updated.emit(f"色差: {delta_e}")
-        if delta_e < 80:
-            return True
-        return False
+        self.diagnostics.count("校验", f"颜色 {color} 色差 {delta_e}")
+        if self.recorder is not None:
+            self.record_roi("verify_check", check_region, self.frame_cut(frame, check_region))
+            self.recorder.value("delta_e", self.last_frame_id, self.last_capture_time, delta_e)
+        return matched
+
+    def ocr_roi(self, roi):
+        """对已裁剪的图像做 OCR（经过内容缓存）"""
+        with self.ocr_lock:
+            result = self.ocr_cache.get_or_compute(roi, self.ocr.recognize)
+        self.diagnostics.count("OCR", f"{result.text} ({result.score:.2f})")
+        self.log.post("ocr", (result.text, result.score))
+        return result.text
+
+    def next_frame(self, timeout=None):
+        """等待并返回一帧尚未处理过、且帧龄不超过 max_frame_age 的画面，其上屏时刻记入 last_capture_time
+
+        Args:
+            timeout: 最长等待秒数，None 表示配置项 frame_timeout
+
+        Raises:
+            FrameTimeoutError: 超时仍没有新画面（StaleFrameError：新画面都已过期）
+        """
+        with self.tracer.span("capture"):
+            captured = self.win_cap.wait_for_frame(newer_than=self.last_frame_id,
+                                                   timeout=self.config.get('frame_timeout', 1.0) if timeout is None else timeout,
+                                                   max_age=self.config.get('max_frame_age', 0.1))
+        self.last_frame_id = captured.frame_id
+        self.last_capture_time = captured.timestamp
+        self.tracer.record("frame_age", captured.timestamp, self.clock.now())
+        return captured.image
+
+    def region_name(self, region):
+        """区域坐标对应的名称（会话录制用），未知区域为 region"""
+        return self.region_names.get(tuple(region), "region")
+
+    def record_roi(self, name, region, roi):
+        """把当前帧裁剪的区域写入会话录制"""
+        if self.recorder is not None:
+            self.recorder.roi(name, region, self.last_frame_id, self.last_capture_time, roi)
+
+    def record_texts(self, texts, frame_id=None):
+        """把交给决策的识别结果写入会话录制（空读数不记录）"""
+        if self.recorder is not None:
+            for name, text in texts.items():
+                if text:
+                    self.recorder.text(name, self.last_frame_id if frame_id is None else frame_id,
+                                       self.last_capture_time, text)
+
+    def grab_roi(self, region):
+        """截取一帧新画面并裁剪区域，记录上屏时刻；等待超时时返回 None"""
+        try:
+            frame = self.next_frame()
+        except FrameTimeoutError:
+            return None
+        with self.tracer.span("crop"):
+            roi = self.frame_cut(frame, region)
+        self.record_roi(self.region_name(region), region, roi)
+        return roi
+
+    def ocr_rois(self, rois):
+        """批量识别多个已裁剪的区域：缓存命中的直接取结果，其余合并为一次模型调用
+
+        Returns:
+            区域名称到文本的映射
+        """
+        results, missing = {}, {}
+        with self.ocr_lock:
+            for name, roi in rois.items():
+                key = self.ocr_cache.key(roi)
+                cached = self.ocr_cache.get(key)
+                if cached is None:
+                    missing[name] = key
+                else:
+                    results[name] = cached
+            if missing:
+                batch = self.ocr.recognize_batch({name: rois[name] for name in missing})
+                for name, key in missing.items():
+                    self.ocr_cache.put(key, batch[name])
+                    results[name] = batch[name]
+        for result in results.values():
+            self.diagnostics.count("OCR", f"{result.text} ({result.score:.2f})")
+            self.log.post("ocr", (result.text, result.score))
+        return {name: result.text for name, result in results.items()}
+
+    def ocr_regions(self, regions):
+        """从同一帧裁剪多个区域并批量识别，保证各读数来自同一时刻
+
+        Args:
+            regions: 区域名称到屏幕坐标的映射
+
+        Returns:
+            区域名称到文本的映射，等待新帧超时时均为空字符串
+        """
+        try:
+            frame = self.next_frame()
+        except FrameTimeoutError:
+            return {name: "" for name in regions}
+        with self.tracer.span("crop"):
+            rois = {name: self.frame_cut(frame, region) for name, region in regions.items()}
+        for name, roi in rois.items():
+            self.record_roi(name, regions[name], roi)
+        with self.tracer.span("ocr"):
+            texts = self.ocr_rois(rois)
+        self.record_texts(texts)
+        return texts
 
     def ocr_region(self, region):
         """OCR 识别"""
-        frame = self.win_cap.capture()
-        # while frame is None or frame.size == 0: frame = self.win_cap.capture()
-        if frame is None or frame.size == 0: return ""
-        roi = self.frame_cut(frame, region)
-        res = self.ocr.ocr(roi)
-        if not res or not res[0]['rec_texts']:
+        name = self.region_name(region)
+        return self.ocr_regions({name: region})[name]
+
+    def recognize_countdown_rois(self, rois):
+        """识别多个倒计时：优先使用字形模板，置信度不足的合并为一次 OCR 批量识别，并用其结果补充模板
+
+        Returns:
+            区域名称到文本的映射
+        """
+        with self.tracer.span("ocr"):
+            if self.digit_recognizer is None:
+                return self.ocr_rois(rois)
+            texts = {name: self.digit_recognizer.recognize(roi) for name, roi in rois.items()}
+            missing = {name: rois[name] for name, text in texts.items() if text is None}
+            if not missing:
+                return texts
+            texts.update(self.ocr_rois(missing))
+        with self.ocr_lock:
+            for name, roi in missing.items():
+                self.digit_recognizer.learn(roi, texts[name])
+        return texts
+
+    def recognize_countdown_roi(self, roi):
+        """识别单个倒计时"""
+        return self.recognize_countdown_rois({"time": roi})["time"]
+
+    def ocr_countdown(self, region):
+        """截图并识别倒计时
+
+        同时把该帧送入秒跳沿检测，上一次读数之后检测到的跳变沿（含 track_ticks 期间逐帧检测到的）记录在 last_edge 中
+        """
+        roi = self.grab_roi(region)
+        if roi is None:
+            self.last_edge = None
+            return ""
+        self.tick_detector.update(roi, self.last_capture_time)
+        self.last_edge = self.tick_detector.edge_since(self.tracker.last_observed_time)
+        return self.recognize_countdown_roi(roi)
+
+    def track_ticks(self, duration, regions):
+        """串行模式下代替休眠：duration 秒内逐帧裁剪倒计时区域送入秒跳沿检测（不做 OCR），
+        两次读数之间的跳变沿仍精确到帧间隔
+
+        Args:
+            duration: 持续秒数
+            regions: 区域名称到 (屏幕坐标, TickEdgeDetector) 的映射
+        """
+        end = self.clock.now() + duration
+        while self.is_running and not self.is_paused:
+            remaining = end - self.clock.now()
+            if remaining <= 0:
+                break
+            try:
+                frame = self.next_frame(timeout=remaining)
+            except FrameTimeoutError:
+                break
+            for name, (region, detector) in regions.items():
+                roi = self.frame_cut(frame, region)
+                self.record_roi(name, region, roi)
+                detector.update(roi, self.last_capture_time)
+
+    def read_countdown(self, time_region):
+        """读取一次倒计时文本，并记录对应帧的上屏时刻与秒跳沿
+
+        流水线模式下直接取识别级的最新读数，否则在本线程截图识别
+        """
+        if self.pipeline is None:
+            text = self.ocr_countdown(time_region)
+            self.record_texts({"time": text})
+            return text
+        reading = self.pipeline.next_reading(timeout=self.config.get('frame_timeout', 1.0))
+        if reading is None:
+            self.last_edge = None
             return ""
-        return res[0]['rec_texts'][0]
+        self.last_capture_time = reading.capture_time
+        self.last_edge = reading.edge
+        self.record_texts({"time": reading.text}, frame_id=reading.frame_id)
+        return reading.text
+
+    def click(self, region, **kwargs):
+        """点击区域中心，从调用到输入入队的耗时由 InputDispatcher 记入 click 阶段
+
+        录制会话时记为 "click:区域名" 事件：时刻为输入入队时刻，数值为决策时刻，帧编号为决策所用的画面
+        """
+        decided_at = self.clock.now()
+        click_region_center(region, sink=self.input, decided_at=decided_at, **kwargs)
+        if self.recorder is not None:
+            self.recorder.value(f"click:{self.region_name(region)}", self.last_frame_id, self.input.last_queued,
+                                decided_at)
+
+    def report(self, message):
+        """更新状态并写入日志"""
+        self.log.append(message)
+        self.log.post("status", message)
+
+    def emit_latency(self, force=False):
+        """每秒最多一次把延迟统计推送到界面"""
+        now = self.clock.now()
+        if force or now - self._last_latency_emit >= 1.0:
+            self._last_latency_emit = now
+            self.latency_updated.emit(self.tracer.format_summary())
+
+    def throttle(self, interval, time_region):
+        """控制倒计时读取频率：串行模式在间隔内逐帧检测秒跳沿，流水线模式调整识别级的最小间隔"""
+        if self.pipeline is None:
+            self.track_ticks(interval, {"time": (time_region, self.tick_detector)})
+        else:
+            self.pipeline.min_interval = interval
+
+    def observe_countdown(self, remaining):
+        """用本次读数（及本帧检测到的秒跳沿）更新倒计时时钟模型"""
+        self.tracker.observe(remaining, self.last_capture_time, self.last_edge)
+
+    def wait_for_deadline(self, time_region):
+        """计算预测的购买时刻（显示跳到 1 秒的时刻 + 购买点击延迟）
+
+        离目标还远时继续逐帧读倒计时来校正模型（秒跳到 1 时的跳变沿会把相位误差压到一帧以内），
+        进入 deadline_guard 以内后不再读取，返回目标时刻，最后一段由 buy_cycle 精确等待后下发点击。
+        deadline_guard 需大于一次 OCR 的耗时。
+        """
+        delay = self.config['buy_click_delay']
+        guard = self.config.get('deadline_guard', 0.1)
+        target = self.countdown.flip_time(1) + delay
+        while self.is_running and self.clock.now() < target - guard:
+            match = COUNTDOWN_RE.search(self.read_countdown(time_region))
+            if match:
+                self.observe_countdown(int(match.group(1)) * 60 + int(match.group(2)))
+                target = self.countdown.flip_time(1) + delay
+        return target
+
+    def buy_cycle(self, buy_region, verify_region, refresh_region, money_region, money, deadline=None) -> bool:
+        """点击购买并确认，返回是否继续监控
+
+        Args:
+            deadline: 购买点击的下发时刻（时钟时间），None 表示立即点击
+        """
+        # 点击购买按钮，同时记录从截到决策所用画面到点击下发的总延迟
+        if deadline is None:
+            self.click(buy_region, interval=0)
+        else:
+            # 等待期间先把光标移到位，截止时刻只提交按下和松开
+            point = region_click_point(buy_region)
+            self.input.move(*point)
+            self.deadlines.dispatch(deadline, self.click, buy_region, interval=0, point=point, label="buy")
+        self.tracer.record("frame2click", self.last_capture_time, self.clock.now())
+        # 校验点击是否成功（可能造成延迟）
+        buy_count = 0
+        while not self.verify_window() and buy_count < 5:
+            buy_count += 1
+            if buy_count <= 2:
+                self.deadlines.sleep(self.config['buy_interval'])
+                self.click(buy_region, interval=0)
+        self.clock.sleep(self.config['buy_to_verify_delay'])
+        # 点击确认按钮
+        self.click(verify_region, interval=self.config['verify_interval'])
+        self.report("点击确认按钮...")
+        # 校验点到了确认
+        verify_counter = 0
+        while self.verify_window():
+            verify_counter += 1
+            if verify_counter > 2:
+                self.input.click(1, 1, interval=0.1)
+            self.click(verify_region, interval=self.config['verify_interval'])
+        
+        self.report("等待刷新...")
+        self.clock.sleep(1.5)
+        if self.verify_window(): self.input.press('esc')
+        self.click(refresh_region)
+        # 检查三角币是否变化
+        now_money = self.ocr_region(money_region)
+        now_money = extract_and_merge_digits(now_money)
+        self.report(f"当前三角币: {now_money}")
+        self.report(f"OCR 缓存: {self.ocr_cache.stats()}")
+        self.config['continue_after_complete'] &= (now_money == money)
+        return self.config['continue_after_complete']
+
+    def run_listings(self, listings, verify_region, refresh_region, money_region, money):
+        """多商品监控
+
+        所有商品共用一路截图：每帧裁剪全部倒计时区域，字形模板逐个匹配，回退的 OCR 合并为一次批量调用，
+        因此每多监控一个商品只增加一次裁剪和模板匹配的开销。各商品独立跟踪倒计时，
+        购买时刻交给 ClickScheduler 排队，冲突时按截止时刻先后依次购买。多商品模式不使用流水线。
+        """
+        scheduler = ClickScheduler(busy_time=self.config.get('buy_cycle_time', 2.5),
+                                   max_lateness=self.config.get('max_click_lateness'))
+        delay = self.config['buy_click_delay']
+        guard = self.config.get('deadline_guard', 0.1)
+        max_error = self.config.get('max_phase_error', 0.15)
+        self.report(f"监控 {len(listings)} 个商品: {', '.join(l.name for l in listings)}")
+        self.click(refresh_region)
+        while self.is_running:
+            # 暂停时等待
+            while self.is_paused: self.clock.sleep(0.2); continue
+            try:
+                frame = self.next_frame()
+            except FrameTimeoutError:
+                continue
+            capture_time = self.last_capture_time
+            with self.tracer.span("crop"):
+                rois = {listing.name: self.frame_cut(frame, listing.time_region) for listing in listings}
+            for listing in listings:
+                self.record_roi(listing.name, listing.time_region, rois[listing.name])
+            for listing in listings:
+                listing.tracker.edge_detector.update(rois[listing.name], capture_time)
+            edges = {listing.name: listing.tracker.edge_detector.edge_since(listing.tracker.last_observed_time)
+                     for listing in listings}
+            texts = self.recognize_countdown_rois(rois)
+            self.record_texts(texts)
+            self.emit_latency()
+
+            soonest = None
+            refresh = False
+            with self.tracer.span("decide"):
+                for listing in listings:
+                    text = listing.last_text = texts[listing.name]
+                    if "天" in text or "小时" in text:
+                        listing.reset()
+                        scheduler.cancel(listing)
+                        continue
+                    match = COUNTDOWN_RE.search(text)
+                    if not match:
+                        continue
+                    minutes, seconds = int(match.group(1)), int(match.group(2))
+                    remaining = minutes * 60 + seconds
+                    listing.tracker.observe(remaining, capture_time, edges[listing.name])
+                    if soonest is None or remaining < soonest[0]:
+                        soonest = (remaining, minutes, seconds)
+                    if remaining == 3 and self.config['click_refresh_at_3s'] and not listing.refreshed:
+                        listing.refreshed = True
+                        refresh = True
+                    # 相位已锁定时按预测时刻排队（每帧用更新后的模型修正），否则读到 0:01 时按购买延迟排队
+                    if (remaining <= 2 and self.config.get('predict_deadline', True)
+                            and listing.countdown.uncertainty <= max_error):
+                        scheduler.schedule(listing, listing.countdown.flip_time(1) + delay)
+                    elif remaining == 1 and not scheduler.scheduled(listing):
+                        scheduler.schedule(listing, self.clock.now() + delay)
+            if soonest is not None:
+                self.log.post("timer", (str(soonest[1]), str(soonest[2])))
+            if refresh:
+                self.report("🔄 点击刷新...")
+                self.click(refresh_region)
+
+            upcoming = scheduler.next()
+            if upcoming is not None:
+                start, listing, deadline = upcoming
+                if scheduler.too_late(start, deadline):
+                    self.report(f"商品 {listing.name} 被其他商品的购买占用，已错过")
+                    scheduler.cancel(listing)
+                    listing.reset()
+                    continue
+                if start - self.clock.now() > guard:
+                    continue
+                if start > deadline:
+                    self.report(f"商品 {listing.name} 与其他商品购买时刻冲突，顺延 {(start - deadline) * 1000:.0f}ms")
+                self.report(f"购买商品 {listing.name}（预测误差 ±{listing.countdown.uncertainty * 1000:.0f}ms）...")
+                continue_monitoring = self.buy_cycle(listing.buy_region, verify_region, refresh_region, money_region, money,
+                                                     deadline=start)
+                scheduler.complete(listing, self.clock.now())
+                listing.reset()
+                if not continue_monitoring:
+                    self.report("任务完成！")
+                    self.task_completed.emit()
+                    break
+                self.report("继续监控中...")
+                continue
+
+            # 所有商品都离归零较远时降低读取频率，间隔内仍逐帧检测秒跳沿
+            if not any(l.tracker.last_remaining is not None and l.tracker.last_remaining <= 5 for l in listings):
+                self.track_ticks(self.config['ocr_interval'],
+                                 {l.name: (l.time_region, l.tracker.edge_detector) for l in listings})
 
     def run(self):
         """运行脚本"""
         try:
-            self.status_updated.emit("初始化中...")
+            # 诊断计数与界面共用，每次开始时清零，不累计上一次运行的次数
+            self.diagnostics.reset()
+            self.report("初始化中...")
+            if self.config.get('record_session', False):
+                self.region_names = {tuple(region): name for name, region in self.selector.get_all_regions().items()}
+                self.recorder = SessionRecorder.create()
             
             time_region = self.selector.get_region("time")
             buy_region = self.selector.get_region("buy")
@@ -149,81 +592,107 @@ class ScriptThread(QThread):
             refresh_region = self.selector.get_region("refresh")
             money_region = self.selector.get_region("money")
 
-            money = self.ocr_region(money_region)
-            money = extract_and_merge_digits(money)
-            self.status_updated.emit(f"初始三角币: {money}")
-            pattern = re.compile(r'(\d+)\s*分\s*(\d+)\s*秒')
-            
-            self.status_updated.emit("监控中...")
+            # 三角币与倒计时取自同一帧，一次批量识别
+            texts = self.ocr_regions({"money": money_region, "time": time_region})
+            money = extract_and_merge_digits(texts["money"])
+            self.report(f"初始三角币: {money}")
+            match = COUNTDOWN_RE.search(texts["time"])
+            if match:
+                self.log.post("timer", (match.group(1), match.group(2)))
+                self.observe_countdown(int(match.group(1)) * 60 + int(match.group(2)))
+
+            # 区域文件中配置了多组 time#N / buy#N 时进入多商品监控
+            groups = listing_groups(self.selector.get_all_regions())
+            if len(groups) > 1:
+                listings = [Listing(name, group["time"], group["buy"]) for name, group in groups.items()]
+                self.run_listings(listings, verify_region, refresh_region, money_region, money)
+                return
+
+            if self.config.get('pipeline', True):
+                # 截图、识别与本线程的决策并发执行
+                self.pipeline = CountdownPipeline(self.win_cap, time_region, [self.recognize_countdown_roi],
+                                                  edge_detector=self.tick_detector, tracer=self.tracer,
+                                                  frame_timeout=self.config.get('frame_timeout', 1.0),
+                                                  max_frame_age=self.config.get('max_frame_age', 0.1),
+                                                  recorder=self.recorder, clock=self.clock)
+                self.pipeline.start()
+            self.report("监控中...")
             refreshed = False  # 标记是否刚刚点击过刷新
-            click_region_center(refresh_region)
+            self.click(refresh_region)
             while self.is_running:
                 # 暂停时等待
-                while self.is_paused: time.sleep(0.2); continue
+                while self.is_paused: self.clock.sleep(0.2); continue
                 # 截图并OCR识别时间
-                res = self.ocr_region(time_region)
-                if "天" in res or "小时" in res: click_region_center(refresh_region); continue
-                match = pattern.search(res)
+                res = self.read_countdown(time_region)
+                self.emit_latency()
+                if "天" in res or "小时" in res:
+                    self.tracker.reset()
+                    self.click(refresh_region)
+                    continue
+                with self.tracer.span("parse"):
+                    match = COUNTDOWN_RE.search(res)
                 if match:
                     minutes = int(match.group(1))
                     seconds = int(match.group(2))
                     # 更新时间显示
-                    self.timer_updated.emit(str(minutes), str(seconds))
+                    self.log.post("timer", (str(minutes), str(seconds)))
+                    with self.tracer.span("decide"):
+                        self.observe_countdown(minutes * 60 + seconds)
                     # 剩余时间到 0:03 时点击刷新（如果启用）
                     if minutes == 0 and seconds == 3 and self.config['click_refresh_at_3s'] and not refreshed:
-                        self.status_updated.emit("🔄 点击刷新...")
-                        click_region_center(refresh_region)
+                        self.report("🔄 点击刷新...")
+                        self.click(refresh_region)
                         refreshed = True
-                    # 剩余时间到 0:01 时执行点击
-                    if minutes == 0 and seconds == 1:
-                        self.status_updated.emit("准备点击...")
-                        time.sleep(self.config['buy_click_delay'])
-                        # 点击购买按钮
-                        click_region_center(buy_region, interval=0)
-                        # 校验点击是否成功（可能造成延迟）
-                        buy_count = 0
-                        while not self.verify_window() and buy_count < 5:
-                            buy_count += 1
-                            if buy_count <= 2:
-                                time.sleep(self.config['buy_interval'])
-                                click_region_center(buy_region, interval=0)
-                        time.sleep(self.config['buy_to_verify_delay'])
-                        # 点击确认按钮
-                        click_region_center(verify_region, interval=self.config['verify_interval'])
-                        self.status_updated.emit("点击确认按钮...")
-                        # 校验点到了确认
-                        verify_counter = 0
-                        while self.verify_window():
-                            verify_counter += 1
-                            if verify_counter > 2:
-                                pydirectinput.click(1, 1, interval=0.1)
-                            click_region_center(verify_region, interval=self.config['verify_interval'])
-                        
-                        self.status_updated.emit("等待刷新...")
-                        time.sleep(1.5)
-                        if self.verify_window(): pydirectinput.press('esc')
-                        click_region_center(refresh_region)
-                        # 检查三角币是否变化
-                        now_money = self.ocr_region(money_region)
-                        now_money = extract_and_merge_digits(now_money)
-                        self.status_updated.emit(f"当前三角币: {now_money}")
-                        self.config['continue_after_complete'] &= (now_money == money)
+                    deadline = None
+                    # 相位已锁定时按预测时刻点击，否则在读到 0:01 时执行点击
+                    if (minutes == 0 and seconds <= 2 and self.config.get('predict_deadline', True)
+                            and self.countdown.uncertainty <= self.config.get('max_phase_error', 0.15)):
+                        self.report(f"准备点击（预测误差 ±{self.countdown.uncertainty * 1000:.0f}ms）...")
+                        deadline = self.wait_for_deadline(time_region)
+                    elif minutes == 0 and seconds == 1:
+                        self.report("准备点击...")
+                        deadline = self.clock.now() + self.config['buy_click_delay']
+                    if deadline is not None:
+                        if self.pipeline is not None:
+                            self.pipeline.pause()
+                        continue_monitoring = self.buy_cycle(buy_region, verify_region, refresh_region, money_region, money,
+                                                             deadline=deadline)
+                        if self.pipeline is not None:
+                            self.pipeline.resume()
                         # 根据配置决定是否继续
-                        if not self.config['continue_after_complete']:
-                            self.status_updated.emit("任务完成！")
+                        if not continue_monitoring:
+                            self.report("任务完成！")
                             self.task_completed.emit()
                             break
                         else:
                             refreshed = False
-                            self.status_updated.emit("继续监控中...")
+                            self.tracker.reset()
+                            self.report("继续监控中...")
                     else:
                         if minutes > 0 or seconds > 5:
-                            time.sleep(self.config['ocr_interval'])
+                            self.throttle(self.config['ocr_interval'], time_region)
+                        else:
+                            self.throttle(0, time_region)
                 else:
-                    time.sleep(self.config['ocr_interval'])
+                    self.throttle(self.config['ocr_interval'], time_region)
         except Exception as e:
-            self.status_updated.emit(f"错误: {str(e)}")
+            self.report(f"错误: {str(e)}")
             print(f"脚本运行错误: {e}")
+        finally:
+            if self.pipeline is not None:
+                self.pipeline.stop()
+                self.pipeline = None
+            self.emit_latency(force=True)
+            if self.config.get('trace_export', True):
+                self.tracer.export_chrome_trace(time.strftime("traces/session_%Y%m%d_%H%M%S.json"))
+            # 识别线程上只更新内存中的模板，落盘放在会话结束后
+            if self.digit_recognizer is not None and self.digit_recognizer.flush():
+                self.log.append(f"倒计时模板已保存到: {self.digit_recognizer.cache_path}")
+            if self.recorder is not None:
+                self.recorder.close()
+                self.log.append(f"会话录制: {self.recorder.directory}（{self.recorder.records} 条记录，"
+                                f"未变化 {self.recorder.repeats} 张，丢弃 {self.recorder.dropped} 条）")
+                self.recorder = None
     
     def pause(self):
         self.is_paused = True
@@ -235,23 +704,71 @@ class ScriptThread(QThread):
         self.is_running = False
 
 
+class EngineLoader(QThread):
+    """后台加载线程：导入重量级模块、初始化截图与 OCR 模型并预热，期间窗口保持响应"""
+
+    progress = pyqtSignal(str)
+    loaded = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+    def step(self, message, func):
+        """执行一个加载步骤并报告耗时"""
+        self.progress.emit(f"{message}...")
+        start = time.perf_counter()
+        result = func()
+        self.progress.emit(f"✓ {message}（{time.perf_counter() - start:.1f}秒）")
+        return result
+
+    @staticmethod
+    def warmup(ocr: OcrBackend, selector):
+        """按 time / money 区域的实际尺寸各跑一次空白图推理
+
+        首次推理会触发显存分配、算子选择等延迟初始化，放在这里做掉，避免落在倒计时的关键时刻
+        """
+        for name in ("time", "money"):
+            region = selector.get_region(name)
+            if region is None:
+                continue
+            left, top, right, bottom = region
+            ocr.recognize(np.zeros((bottom - top, right - left, 3), dtype=np.uint8))
+
+    def run(self):
+        try:
+            start = time.perf_counter()
+
+            selector = self.step("加载区域配置", lambda: RegionSelector.from_file("regions_2k.json"))
+            # 多商品时各商品的倒计时区域也要在截图范围内
+            names = dict.fromkeys([*ROI_REGION_NAMES, *listing_time_region_names(selector.get_all_regions())])
+            roi_regions = {name: selector.get_region(name) for name in names if selector.get_region(name)}
+            win_cap = self.step("初始化截图", lambda: WindowCapture(max_buffer_len=2, roi_regions=roi_regions))
+            input_sink = self.step(f"加载输入模块（{INPUT_BACKEND}）", default_input_sink)
+            ocr = self.step("连接 OCR 服务", connect_ocr_daemon) if OCR_DAEMON else None
+            if ocr is None:
+                ocr = self.step(f"加载 OCR 模型（{OCR_BACKEND}）",
+                                lambda: create_ocr_backend(OCR_BACKEND, device=OCR_DEVICE, threads=OCR_THREADS,
+                                                           workers=OCR_WORKERS))
+            else:
+                self.progress.emit(f"✓ 已连接 OCR 服务（进程 {ocr.pid}，{ocr.name}）")
+            # 倒计时字形模板，首次运行时由 PaddleOCR 结果自举，会话结束时缓存
+            digit_recognizer = DigitTemplateRecognizer(log=self.progress.emit)
+            self.step("预热推理", lambda: self.warmup(ocr, selector))
+            self.progress.emit(f"引擎就绪，总耗时 {time.perf_counter() - start:.1f}秒")
+            self.loaded.emit({
+                "selector": selector,
+                "win_cap": win_cap,
+                "ocr": ocr,
+                "digit_recognizer": digit_recognizer,
+                "input": input_sink,
+            })
+        except Exception as e:
+            print(f"引擎加载失败: {e}")
+            self.failed.emit(str(e))
+
+
 def main():
     """主函数"""
     app = QApplication(sys.argv)
-    selector = RegionSelector()
-    selector.load_regions_from_file("regions_2k.json")
-    win_cap = WindowCapture(max_buffer_len=2)
-    
-    # 初始化 OCR
-    ocr = PaddleOCR(
-        use_doc_orientation_classify=False,
-        use_doc_unwarping=False,
-        use_textline_orientation=False,
-        text_detection_model_dir="models/PP-OCRv5_server_det_infer",
-        text_recognition_model_dir="models/PP-OCRv5_server_rec_infer",
-        # use_tensorrt=True,
-        device='gpu:0'
-    )
+    # 先显示窗口，模型在后台加载
     window = MonitorWindow()
     window.show()
     # 移动到屏幕右下角
@@ -260,9 +777,24 @@ def main():
     x = screen.x() + 10
     y = screen.y() + screen.height() - win_h - 30
     window.move(x, y)
-    window.add_log("程序已启动")
-    window.add_log("点击 [开始] 按钮启动监控")
+    window.add_log("程序已启动，正在后台加载引擎...")
     script_thread = None
+    engine = {}
+
+    def on_loaded(result):
+        engine.update(result)
+        window.set_engine_ready(True)
+        window.add_log("点击 [开始] 按钮启动监控")
+
+    def on_failed(message):
+        window.add_log(f"❌ 引擎加载失败: {message}")
+        window.update_status("加载失败")
+
+    loader = EngineLoader()
+    loader.progress.connect(lambda s: window.add_log(s))
+    loader.loaded.connect(on_loaded)
+    loader.failed.connect(on_failed)
+    loader.start()
     
     def on_start():
         nonlocal script_thread
@@ -272,11 +804,11 @@ def main():
         config = window.get_config()
         window.add_log(f"配置: 购买延迟={config['buy_click_delay']}秒")
         
-        script_thread = ScriptThread(selector, win_cap, ocr, config)
+        script_thread = ScriptThread(engine["selector"], engine["win_cap"], engine["ocr"], config,
+                                     engine["digit_recognizer"], input_sink=engine["input"],
+                                     log=window.log_buffer, diagnostics=window.diagnostics)
         
-        script_thread.status_updated.connect(lambda s: window.update_status(s))
-        script_thread.status_updated.connect(lambda s: window.add_log(s))
-        script_thread.timer_updated.connect(lambda m, s: window.update_timer(m, s))
+        script_thread.latency_updated.connect(lambda text: window.update_latency(text))
         script_thread.task_completed.connect(lambda: window.on_complete())
         
         script_thread.start()
@@ -303,7 +835,11 @@ def main():
         if script_thread and script_thread.isRunning():
             script_thread.stop()
             script_thread.wait()
-        win_cap.stop()
+        loader.wait()
+        if "win_cap" in engine:
+            engine["win_cap"].stop()
+        if "ocr" in engine:
+            engine["ocr"].close()
     
     app.aboutToQuit.connect(cleanup)
     
@@ -0,0 +1,318 @@
+# -*- coding: utf-8 -*-
+# @Author: BugNotFound
+# @Date: 2026-10-17
+# @Description: 常驻 OCR 推理服务 - 模型只加载一次并保持预热，脚本经本地命名管道 / Unix 套接字连接后立即可用
+#
+# 用法:
+#   python ocr_daemon.py --backend paddle_rec --device gpu:0      启动服务（另开一个终端常驻）
+#   python ocr_daemon.py --stop                                   停止服务
+#
+# main_gui.py 中 OCR_DAEMON = True 时启动先尝试连接该服务，连不上再在本进程加载模型。
+#
+# 安全：连接双方用每个用户随机生成、仅本人可读的密钥互相认证（客户端也会校验服务端，抢占地址的进程无法冒充），
+# 报文只有 JSON 与原始像素字节，不经过 pickle，任一方都不会反序列化对方发来的对象。
+
+import argparse
+import json
+import os
+import secrets
+import stat
+import sys
+import tempfile
+import threading
+from multiprocessing.connection import Client, Listener
+from multiprocessing import AuthenticationError
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from ocr_engine import OcrBackend, create_ocr_backend
+
+# 单次请求的 ROI 数与单个 ROI 的字节数上限，防止异常请求占满内存
+MAX_BATCH = 64
+MAX_ROI_BYTES = 16 << 20
+MAX_HEADER_BYTES = 64 << 10
+
+
+def user_dir() -> str:
+    """当前用户私有的运行目录（不存在时创建），存放密钥文件与 Unix 套接字
+
+    Raises:
+        PermissionError: 目录不属于当前用户或其他用户可访问
+    """
+    if sys.platform == "win32":
+        # LOCALAPPDATA 默认只有本用户可访问
+        path = os.path.join(os.environ.get("LOCALAPPDATA") or os.path.expanduser("~"), "DeltaForceScript")
+        os.makedirs(path, exist_ok=True)
+        return path
+    runtime = os.environ.get("XDG_RUNTIME_DIR")
+    path = (os.path.join(runtime, "deltaforce_script") if runtime
+            else os.path.join(tempfile.gettempdir(), f"deltaforce_script-{os.getuid()}"))
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise PermissionError(f"运行目录不属于当前用户或权限过宽: {path}")
+    return path
+
+
+def default_address() -> str:
+    """Windows 用带用户名的命名管道，其他平台用私有目录下的 Unix 套接字"""
+    if sys.platform == "win32":
+        user = os.environ.get("USERNAME", "default")
+        return rf"\\.\pipe\DeltaForceScriptOCR-{user}"
+    return os.path.join(user_dir(), "ocr.sock")
+
+
+def load_authkey(create: bool = False) -> Optional[bytes]:
+    """读取本用户的服务密钥
+
+    Args:
+        create: 密钥文件不存在时随机生成（仅本人可读写）
+
+    Returns:
+        密钥；不存在且 create 为 False 时返回 None
+    """
+    path = os.path.join(user_dir(), "ocr_daemon.key")
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        if not create:
+            return None
+    key = secrets.token_bytes(32)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(key)
+    return key
+
+
+def _send_json(conn, message: dict):
+    conn.send_bytes(json.dumps(message, ensure_ascii=False).encode("utf-8"))
+
+
+def _recv_json(conn) -> dict:
+    message = json.loads(conn.recv_bytes(MAX_HEADER_BYTES).decode("utf-8"))
+    if not isinstance(message, dict):
+        raise ValueError("报文不是 JSON 对象")
+    return message
+
+
+def _send_rois(conn, rois: List[np.ndarray]):
+    """批量请求：JSON 头给出各 ROI 的形状，随后每个 ROI 一帧原始字节"""
+    rois = [np.ascontiguousarray(roi, dtype=np.uint8) for roi in rois]
+    _send_json(conn, {"command": "batch", "dtype": "uint8", "shapes": [list(roi.shape) for roi in rois]})
+    for roi in rois:
+        conn.send_bytes(memoryview(roi).cast("B"))
+
+
+def _recv_rois(conn, header: dict) -> List[np.ndarray]:
+    """按请求头校验形状并读取原始字节"""
+    shapes = header.get("shapes")
+    if header.get("dtype") != "uint8" or not isinstance(shapes, list) or len(shapes) > MAX_BATCH:
+        raise ValueError("批量请求格式错误")
+    rois = []
+    for shape in shapes:
+        if (not isinstance(shape, list) or not 2 <= len(shape) <= 3
+                or not all(isinstance(n, int) and 0 < n for n in shape)):
+            raise ValueError(f"ROI 形状错误: {shape}")
+        size = int(np.prod(shape))
+        if size > MAX_ROI_BYTES:
+            raise ValueError(f"ROI 过大: {shape}")
+        data = conn.recv_bytes(size)
+        if len(data) != size:
+            raise ValueError(f"ROI 字节数 {len(data)} 与形状 {shape} 不符")
+        rois.append(np.frombuffer(data, dtype=np.uint8).reshape(shape))
+    return rois
+
+
+class OcrDaemon:
+    """OCR 推理服务端
+
+    每个连接一个线程，请求与应答都是 JSON（批量请求的 ROI 以原始字节随后发送）：
+    - {"command": "ping"} -> {"status": "ok", "name": 后端名称, "pid": 进程号}
+    - {"command": "batch", "dtype": "uint8", "shapes": [...]} + ROI 字节 -> {"status": "ok", "results": [[文本, 置信度], ...]}
+    - {"command": "shutdown"} -> {"status": "ok"}，随后服务退出
+    出错时返回 {"status": "error", "message": 描述}；报文格式错误时断开连接。推理经同一把锁串行。
+    """
+
+    def __init__(self, ocr: OcrBackend, address: Optional[str] = None, authkey: Optional[bytes] = None):
+        """
+        Args:
+            ocr: 识别后端
+            address: 监听地址，None 表示 default_address()
+            authkey: 认证密钥，None 表示本用户的密钥文件（不存在时生成）
+        """
+        self.ocr = ocr
+        self.address = address or default_address()
+        self.authkey = authkey or load_authkey(create=True)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._listener: Optional[Listener] = None
+
+    def serve_forever(self):
+        """监听并处理请求，直到收到 shutdown
+
+        Raises:
+            FileExistsError: 监听地址上已有不是套接字的文件
+        """
+        if sys.platform != "win32" and os.path.lexists(self.address):
+            # 只清理上次异常退出遗留的套接字，不删除其他文件
+            if not stat.S_ISSOCK(os.lstat(self.address).st_mode):
+                raise FileExistsError(f"监听地址上已有其他文件: {self.address}")
+            os.unlink(self.address)
+        self._listener = Listener(self.address, authkey=self.authkey)
+        print(f"✓ OCR 服务已启动: {self.address}（{self.ocr.name}）")
+        try:
+            while not self._stop.is_set():
+                try:
+                    conn = self._listener.accept()
+                except (OSError, EOFError, AuthenticationError) as e:
+                    if self._stop.is_set():
+                        break
+                    print(f"✗ 拒绝连接: {e}")
+                    continue
+                threading.Thread(target=self._serve, args=(conn,), name="OcrDaemonClient", daemon=True).start()
+        finally:
+            self._listener.close()
+            print("OCR 服务已停止")
+
+    def _serve(self, conn):
+        with conn:
+            while True:
+                try:
+                    request = _recv_json(conn)
+                    command = request.get("command")
+                    rois = _recv_rois(conn, request) if command == "batch" else None
+                except (EOFError, OSError):
+                    return
+                except (ValueError, UnicodeDecodeError) as e:
+                    # 报文已无法对齐，直接断开
+                    print(f"✗ 断开格式错误的连接: {e}")
+                    return
+                try:
+                    if command == "ping":
+                        reply = {"status": "ok", "name": self.ocr.name, "pid": os.getpid()}
+                    elif command == "batch":
+                        with self._lock:
+                            results = self.ocr.recognize_batch(dict(enumerate(rois)))
+                        reply = {"status": "ok",
+                                 "results": [[str(r.text), float(r.score)] for r in results.values()]}
+                    elif command == "shutdown":
+                        _send_json(conn, {"status": "ok"})
+                        self.shutdown()
+                        return
+                    else:
+                        reply = {"status": "error", "message": f"未知命令: {command}"}
+                except Exception as e:
+                    reply = {"status": "error", "message": f"{type(e).__name__}: {e}"}
+                _send_json(conn, reply)
+
+    def shutdown(self):
+        """停止接受新连接（用一个空连接唤醒阻塞的 accept）"""
+        self._stop.set()
+        try:
+            Client(self.address, authkey=self.authkey).close()
+        except (OSError, EOFError, AuthenticationError):
+            pass
+
+
+class DaemonOCR(OcrBackend):
+    """OCR 服务的客户端，实现与进程内后端相同的接口
+
+    单次与批量识别都是一次请求往返；连接在多个线程间共享，请求经锁串行。
+    服务中途退出时识别抛出 RuntimeError。
+    """
+
+    def __init__(self, address: Optional[str] = None, authkey: Optional[bytes] = None):
+        """
+        Args:
+            address: 服务地址，None 表示 default_address()
+            authkey: 认证密钥，None 表示本用户的密钥文件
+
+        Raises:
+            OSError: 服务不存在或拒绝连接
+            AuthenticationError: 对端不持有本用户的密钥
+        """
+        self.address = address or default_address()
+        authkey = authkey or load_authkey()
+        if authkey is None:
+            raise FileNotFoundError("没有 OCR 服务密钥，服务未启动过")
+        self._conn = Client(self.address, authkey=authkey)
+        self._lock = threading.Lock()
+        reply = self._request({"command": "ping"})
+        self.pid = int(reply["pid"])
+        self.name = f"daemon:{reply['name']}"
+
+    def _request(self, message: dict, rois: Optional[List[np.ndarray]] = None) -> dict:
+        with self._lock:
+            try:
+                if rois is None:
+                    _send_json(self._conn, message)
+                else:
+                    _send_rois(self._conn, rois)
+                reply = _recv_json(self._conn)
+            except (EOFError, OSError, ValueError) as e:
+                raise RuntimeError(f"OCR 服务连接中断: {e}") from e
+        if reply.get("status") != "ok":
+            raise RuntimeError(f"OCR 服务出错: {reply.get('message')}")
+        return reply
+
+    def _recognize_batch(self, rois: List[np.ndarray]) -> List[Tuple[str, float]]:
+        results = self._request({"command": "batch"}, rois)["results"]
+        return [(str(text), float(score)) for text, score in results]
+
+    def _recognize(self, roi: np.ndarray) -> Tuple[str, float]:
+        return self._recognize_batch([roi])[0]
+
+    def stop_server(self):
+        """请求服务退出并断开连接"""
+        self._request({"command": "shutdown"})
+        self.close()
+
+    def close(self):
+        """断开连接（服务继续运行）"""
+        self._conn.close()
+
+
+def connect_ocr_daemon(address: Optional[str] = None, authkey: Optional[bytes] = None) -> Optional[DaemonOCR]:
+    """连接常驻 OCR 服务，服务不存在或认证失败时返回 None"""
+    try:
+        return DaemonOCR(address, authkey)
+    except (OSError, EOFError, AuthenticationError, RuntimeError, ValueError, KeyError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="常驻 OCR 推理服务")
+    parser.add_argument("--backend", default="paddle_rec", choices=["paddle", "paddle_rec", "onnx"])
+    parser.add_argument("--device", default="gpu:0")
+    parser.add_argument("--threads", type=int, default=4, help="onnx 后端的推理线程数")
+    parser.add_argument("--workers", type=int, default=0, help="识别工作进程数，0 表示在服务进程内推理")
+    parser.add_argument("--address", help="监听地址，默认为本用户私有的命名管道 / 套接字")
+    parser.add_argument("--stop", action="store_true", help="停止正在运行的服务")
+    args = parser.parse_args()
+
+    existing = connect_ocr_daemon(args.address)
+    if args.stop:
+        if existing is None:
+            print("✗ 没有正在运行的 OCR 服务")
+            return
+        existing.stop_server()
+        print("✓ 已停止 OCR 服务")
+        return
+    if existing is not None:
+        print(f"✗ OCR 服务已在运行（进程 {existing.pid}，{existing.name}）")
+        existing.close()
+        return
+
+    ocr = create_ocr_backend(args.backend, device=args.device, threads=args.threads, workers=args.workers)
+    # 预热：首次推理的显存分配、算子选择在这里做掉
+    ocr.recognize(np.zeros((48, 320, 3), dtype=np.uint8))
+    try:
+        OcrDaemon(ocr, args.address).serve_forever()
+    finally:
+        ocr.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,334 @@
+# -*- coding: utf-8 -*-
+# @Author: BugNotFound
+# @Date: 2026-10-17
+# @Description: OCR 引擎 - 统一的识别后端接口（Paddle 完整流水线、Paddle 纯识别、ONNX Runtime CPU）、按 ROI 像素内容寻址的结果缓存
+
+import hashlib
+import os
+import time
+from collections import OrderedDict, namedtuple
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+# 一次识别的结果：文本、置信度、推理耗时（秒）
+OcrResult = namedtuple("OcrResult", ["text", "score", "elapsed"])
+
+EMPTY_RESULT = OcrResult("", 0.0, 0.0)
+
+
+class OcrBackend:
+    """识别后端接口
+
+    输入为已裁剪的 BGR 文字区域，输出 OcrResult。ScriptThread 只依赖这个接口，
+    更换引擎不需要改动热路径。子类实现 _recognize，支持批量推理的子类再实现 _recognize_batch，
+    计时由基类统一完成。
+    """
+
+    name = ""
+
+    def _recognize(self, roi: np.ndarray) -> Tuple[str, float]:
+        """子类实现：识别单个 ROI，返回 (文本, 置信度)"""
+        raise NotImplementedError
+
+    def _recognize_batch(self, rois: List[np.ndarray]) -> List[Tuple[str, float]]:
+        """子类可覆盖：一次推理识别多个 ROI，默认逐个识别"""
+        return [self._recognize(roi) for roi in rois]
+
+    def recognize(self, roi: np.ndarray) -> OcrResult:
+        """识别单个 ROI，无结果时文本为空、置信度为 0"""
+        if roi is None or roi.size == 0:
+            return EMPTY_RESULT
+        start = time.perf_counter()
+        text, score = self._recognize(roi)
+        return OcrResult(text, score, time.perf_counter() - start)
+
+    def recognize_batch(self, rois: Dict[str, np.ndarray]) -> Dict[str, OcrResult]:
+        """一次调用识别多个命名 ROI
+
+        Args:
+            rois: 区域名称到裁剪图的映射，通常来自同一帧
+
+        Returns:
+            区域名称到结果的映射；各结果的 elapsed 均为整批的推理耗时
+        """
+        names = [name for name, roi in rois.items() if roi is not None and roi.size]
+        results = {name: EMPTY_RESULT for name in rois}
+        if not names:
+            return results
+        start = time.perf_counter()
+        outputs = self._recognize_batch([rois[name] for name in names])
+        elapsed = time.perf_counter() - start
+        for name, (text, score) in zip(names, outputs):
+            results[name] = OcrResult(text, score, elapsed)
+        return results
+
+    def close(self):
+        """释放后端持有的进程、共享内存等资源"""
+
+
+class _LineResizer:
+    """把文字行保持宽高比缩放到识别模型的输入高度，按输出宽度缓存预分配缓冲"""
+
+    def __init__(self, input_height: int = 48):
+        self.input_height = input_height
+        self._buffers: Dict[int, np.ndarray] = {}
+
+    def __call__(self, roi: np.ndarray) -> np.ndarray:
+        h, w = roi.shape[:2]
+        if h == self.input_height:
+            return roi
+        new_w = max(1, round(w * self.input_height / h))
+        buf = self._buffers.get(new_w)
+        if buf is None:
+            buf = self._buffers[new_w] = np.empty((self.input_height, new_w, 3), dtype=np.uint8)
+        cv2.resize(roi, (new_w, self.input_height), dst=buf, interpolation=cv2.INTER_LINEAR)
+        return buf
+
+
+class PaddlePipelineOCR(OcrBackend):
+    """PaddleOCR 完整流水线（文字检测 + 识别），区域框得较松时使用"""
+
+    name = "paddle"
+
+    def __init__(self, det_model_dir: str = "models/PP-OCRv5_server_det_infer",
+                 rec_model_dir: str = "models/PP-OCRv5_server_rec_infer", device: str = "gpu:0"):
+        """
+        Args:
+            det_model_dir: 检测模型目录
+            rec_model_dir: 识别模型目录
+            device: 推理设备，如 'gpu:0' 或 'cpu'
+        """
+        from paddleocr import PaddleOCR
+        self.ocr = PaddleOCR(
+            use_doc_orientation_classify=False,
+            use_doc_unwarping=False,
+            use_textline_orientation=False,
+            text_detection_model_dir=det_model_dir,
+            text_recognition_model_dir=rec_model_dir,
+            # use_tensorrt=True,
+            device=device
+        )
+
+    def _recognize(self, roi: np.ndarray) -> Tuple[str, float]:
+        res = self.ocr.ocr(roi)
+        if not res or not res[0]['rec_texts']:
+            return "", 0.0
+        return res[0]['rec_texts'][0], float(res[0]['rec_scores'][0])
+
+    def _recognize_batch(self, rois: List[np.ndarray]) -> List[Tuple[str, float]]:
+        outputs = []
+        for res in self.ocr.predict(rois):
+            if res and res['rec_texts']:
+                outputs.append((res['rec_texts'][0], float(res['rec_scores'][0])))
+            else:
+                outputs.append(("", 0.0))
+        return outputs
+
+
+class RecognitionOnlyOCR(OcrBackend):
+    """纯识别 OCR
+
+    regions_2k.json 中的 time / money 区域已经紧贴文字，不需要再跑检测模型，
+    直接把裁剪图缩放到识别模型的输入高度后送入 PP-OCRv5 识别模型。
+    每个 ROI 尺寸固定，缩放结果写入按输出宽度缓存的预分配缓冲，避免每次分配内存。
+    """
+
+    name = "paddle_rec"
+
+    def __init__(self, model_dir: str = "models/PP-OCRv5_server_rec_infer", model_name: str = "PP-OCRv5_server_rec",
+                 device: str = "gpu:0", input_height: int = 48):
+        """
+        Args:
+            model_dir: 识别模型目录
+            model_name: 识别模型名称，需与模型目录一致
+            device: 推理设备，如 'gpu:0' 或 'cpu'
+            input_height: 识别模型输入高度（PP-OCRv5 为 48）
+        """
+        from paddleocr import TextRecognition
+        self.model = TextRecognition(model_name=model_name, model_dir=model_dir, device=device)
+        self.input_height = input_height
+        self._prepare = _LineResizer(input_height)
+
+    def _recognize(self, roi: np.ndarray) -> Tuple[str, float]:
+        for res in self.model.predict(input=self._prepare(roi), batch_size=1):
+            return res['rec_text'], float(res['rec_score'])
+        return "", 0.0
+
+    def _recognize_batch(self, rois: List[np.ndarray]) -> List[Tuple[str, float]]:
+        # 同宽的 ROI 会共用缩放缓冲，批量时需各自拷贝
+        lines = [self._prepare(roi).copy() for roi in rois]
+        return [(res['rec_text'], float(res['rec_score']))
+                for res in self.model.predict(input=lines, batch_size=len(lines))]
+
+
+def load_character_dict(model_dir: str) -> List[str]:
+    """从 Paddle 导出模型的 inference.yml 读取识别字典（PostProcess.character_dict）"""
+    import yaml
+    with open(os.path.join(model_dir, "inference.yml"), 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f)
+    return [str(c) for c in config["PostProcess"]["character_dict"]]
+
+
+class OnnxRecognitionOCR(OcrBackend):
+    """ONNX Runtime CPU 纯识别
+
+    使用 paddle2onnx 导出的 PP-OCRv5 识别模型，不依赖 paddlepaddle 与 CUDA。
+    预处理与 Paddle 一致（缩放到 48 像素高，归一化到 [-1, 1]），输出按 CTC 贪心解码。
+    """
+
+    name = "onnx"
+
+    def __init__(self, model_path: str = "models/PP-OCRv5_server_rec_onnx/inference.onnx",
+                 dict_dir: Optional[str] = None, threads: int = 4, input_height: int = 48):
+        """
+        Args:
+            model_path: ONNX 模型文件
+            dict_dir: 含 inference.yml 的目录（读取字典），None 表示与模型文件同目录
+            threads: 单次推理的线程数（intra-op），通常取物理核心数，与其他负载争用时调小
+            input_height: 识别模型输入高度（PP-OCRv5 为 48）
+        """
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+        self.threads = threads
+        self.input_height = input_height
+        self._prepare = _LineResizer(input_height)
+        self._tensors: Dict[Tuple[int, int], np.ndarray] = {}
+        # 下标 0 为 CTC 空白；PaddleOCR 默认在字典末尾追加空格，按输出类别数判断
+        self.characters = ["", *load_character_dict(dict_dir or os.path.dirname(model_path))]
+        self._space_checked = False
+
+    def _to_tensor(self, lines: List[np.ndarray]) -> np.ndarray:
+        """HWC uint8 -> NCHW float32，(x / 255 - 0.5) / 0.5
+
+        批量时按最宽的一行对齐，较窄的行右侧补 0（与 Paddle 的批量预处理一致）
+        """
+        width = max(line.shape[1] for line in lines)
+        tensor = self._tensors.get((len(lines), width))
+        if tensor is None:
+            tensor = self._tensors[(len(lines), width)] = np.empty((len(lines), 3, self.input_height, width),
+                                                                   dtype=np.float32)
+        for i, line in enumerate(lines):
+            w = line.shape[1]
+            np.multiply(line.transpose(2, 0, 1), 1.0 / 127.5, out=tensor[i, :, :, :w], casting='unsafe')
+            tensor[i, :, :, :w] -= 1.0
+            tensor[i, :, :, w:] = 0.0
+        return tensor
+
+    def _decode(self, probs: np.ndarray) -> Tuple[str, float]:
+        """CTC 贪心解码：逐帧取最大类别，合并重复并去掉空白"""
+        if not self._space_checked:
+            if probs.shape[-1] == len(self.characters) + 1:
+                self.characters.append(" ")
+            self._space_checked = True
+        indices = probs.argmax(axis=-1)
+        scores = probs.max(axis=-1)
+        keep = indices != 0
+        keep[1:] &= indices[1:] != indices[:-1]
+        if not keep.any():
+            return "", 0.0
+        return ''.join(self.characters[i] for i in indices[keep]), float(scores[keep].mean())
+
+    def _recognize(self, roi: np.ndarray) -> Tuple[str, float]:
+        probs = self.session.run(None, {self.input_name: self._to_tensor([self._prepare(roi)])})[0]
+        return self._decode(probs[0])
+
+    def _recognize_batch(self, rois: List[np.ndarray]) -> List[Tuple[str, float]]:
+        # 同宽的 ROI 会共用缩放缓冲，批量时需各自拷贝
+        lines = [self._prepare(roi).copy() for roi in rois]
+        probs = self.session.run(None, {self.input_name: self._to_tensor(lines)})[0]
+        return [self._decode(p) for p in probs]
+
+
+def create_ocr_backend(kind: str = "paddle_rec", device: str = "gpu:0", threads: int = 4,
+                       workers: int = 0) -> OcrBackend:
+    """按名称创建识别后端
+
+    Args:
+        kind: paddle（检测+识别）、paddle_rec（纯识别）或 onnx（ONNX Runtime CPU 纯识别）
+        device: Paddle 后端的推理设备
+        threads: ONNX 后端的推理线程数（多进程时为每个进程的线程数）
+        workers: 识别工作进程数，0 表示在本进程内推理
+    """
+    if workers > 0:
+        from ocr_workers import ProcessPoolOCR
+        return ProcessPoolOCR(kind, device=device, threads=threads, workers=workers)
+    if kind == "paddle":
+        return PaddlePipelineOCR(device=device)
+    if kind == "paddle_rec":
+        return RecognitionOnlyOCR(device=device)
+    if kind == "onnx":
+        return OnnxRecognitionOCR(threads=threads)
+    raise ValueError(f"未知的 OCR 后端: {kind}")
+
+
+class OcrResultCache:
+    """按 ROI 像素内容寻址的 OCR 结果 LRU 缓存
+
+    两次秒跳之间 time 区域像素完全相同，money 区域几乎不变，
+    命中时只需计算一次哈希（几微秒），不必再调用模型。
+    """
+
+    def __init__(self, max_entries: int = 256, fingerprint_step: int = 1, quantize_bits: int = 0):
+        """
+        Args:
+            max_entries: 最大缓存条目数，超出后淘汰最久未使用的条目
+            fingerprint_step: 降采样步长，1 表示对全部像素做哈希
+            quantize_bits: 哈希前丢弃每个像素值的低位数，用于容忍细微噪声；0 表示逐位精确匹配
+        """
+        self.max_entries = max_entries
+        self.fingerprint_step = fingerprint_step
+        self.quantize_bits = quantize_bits
+        self._entries: "OrderedDict[Hashable, object]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, roi: np.ndarray) -> Hashable:
+        """计算 ROI 的内容指纹"""
+        if self.fingerprint_step > 1:
+            roi = roi[::self.fingerprint_step, ::self.fingerprint_step]
+        if self.quantize_bits:
+            roi = roi >> self.quantize_bits
+        digest = hashlib.blake2b(np.ascontiguousarray(roi), digest_size=16).digest()
+        return roi.shape, digest
+
+    def get(self, key: Hashable):
+        """按指纹查询，未命中返回 None（计入统计）"""
+        if key in self._entries:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, key: Hashable, value):
+        self._entries[key] = value
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get_or_compute(self, roi: np.ndarray, compute: Callable[[np.ndarray], object]):
+        """命中时返回缓存结果，否则调用 compute(roi) 并缓存"""
+        key = self.key(roi)
+        value = self.get(key)
+        if value is None:
+            value = compute(roi)
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        self._entries.clear()
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> str:
+        return f"命中 {self.hits} / 未命中 {self.misses} (命中率 {self.hit_rate:.1%}, 条目 {len(self._entries)})"
@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+# @Author: BugNotFound
+# @Date: 2026-10-17
+# @Description: 多进程识别 - 共享内存 ROI 环形缓冲 + 识别工作进程池，推理不再与界面、截图争用同一个 GIL
+
+import multiprocessing
+import queue
+import sys
+import threading
+import time
+from multiprocessing import shared_memory
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from ocr_engine import OcrBackend, create_ocr_backend
+
+
+class SharedRoiRing:
+    """共享内存中的定长 ROI 槽位
+
+    写入方把裁剪图复制进空闲槽位，只把槽位号和尺寸发给工作进程；
+    工作进程按槽位号直接在共享内存上构造 ndarray 视图，像素不经过序列化。
+    槽位的分配与回收由写入方负责，工作进程只读。
+    """
+
+    def __init__(self, slots: int, slot_bytes: int, name: Optional[str] = None):
+        """
+        Args:
+            slots: 槽位数
+            slot_bytes: 每个槽位的字节数，需不小于最大 ROI 的 h * w * 3
+            name: 已有共享内存块的名称（工作进程附加时传入），None 表示新建
+        """
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self.owner = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=slots * slot_bytes)
+        elif sys.version_info >= (3, 13):
+            self.shm = shared_memory.SharedMemory(name=name, track=False)
+        else:
+            # 3.13 之前附加方也会登记到 resource_tracker：工作进程有自己的 tracker 时退出会报泄漏并再 unlink 一次，
+            # 与创建者共用 tracker 时事后注销又会把创建者的登记一并删掉，只能在附加期间跳过登记
+            from multiprocessing import resource_tracker
+            register = resource_tracker.register
+            resource_tracker.register = lambda name, rtype: None
+            try:
+                self.shm = shared_memory.SharedMemory(name=name)
+            finally:
+                resource_tracker.register = register
+        self.name = self.shm.name
+
+    def view(self, slot: int, shape: Tuple[int, ...]) -> np.ndarray:
+        """槽位上指定形状的 uint8 视图（不复制）"""
+        return np.ndarray(shape, dtype=np.uint8, buffer=self.shm.buf, offset=slot * self.slot_bytes)
+
+    def write(self, slot: int, roi: np.ndarray) -> Tuple[int, ...]:
+        """把 ROI 复制进槽位，返回其形状"""
+        if roi.nbytes > self.slot_bytes:
+            raise ValueError(f"ROI {roi.shape} 超过槽位大小 {self.slot_bytes} 字节")
+        np.copyto(self.view(slot, roi.shape), roi)
+        return roi.shape
+
+    def close(self):
+        """断开映射，创建者同时释放共享内存"""
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def _worker_main(ring_name: str, slots: int, slot_bytes: int, kind: str, device: str, threads: int, tasks, results):
+    """识别工作进程：各自加载一份模型，每个任务是一组 (槽位号, 形状)，整组一次批量推理，结果经结果队列返回"""
+    ring = SharedRoiRing(slots, slot_bytes, name=ring_name)
+    try:
+        ocr = create_ocr_backend(kind, device=device, threads=threads)
+    except Exception as e:
+        results.put(("failed", f"{type(e).__name__}: {e}"))
+        ring.close()
+        return
+    results.put(("ready", None))
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        slots = [slot for slot, _ in task]
+        try:
+            outputs = ocr._recognize_batch([ring.view(slot, shape) for slot, shape in task])
+            results.put((slots, [(text, score, None) for text, score in outputs]))
+        except Exception as e:
+            results.put((slots, [("", 0.0, f"{type(e).__name__}: {e}")] * len(slots)))
+    ring.close()
+
+
+class ProcessPoolOCR(OcrBackend):
+    """多进程识别后端
+
+    workers 个子进程各自加载 kind 指定的识别后端，ROI 经 SharedRoiRing 传递，任务与结果走队列。
+    单次识别阻塞等待结果；批量识别把 ROI 切成不超过 workers 份，每个工作进程对分到的一份做一次批量推理，
+    多商品的倒计时既能并行又保留后端的批量推理。
+    GPU 后端每个进程各占一份显存；CPU 后端的 threads 为每个进程的推理线程数，workers * threads 不宜超过核心数。
+    等待期间定期检查工作进程是否存活，有进程退出（显存不足、崩溃等）或超时时抛出 RuntimeError，不会无限阻塞。
+    """
+
+    # 等待期间检查工作进程存活的间隔（秒）
+    POLL_INTERVAL = 0.5
+
+    def __init__(self, kind: str = "onnx", device: str = "gpu:0", threads: int = 2, workers: int = 2,
+                 slot_bytes: int = 1 << 20, slots: Optional[int] = None, startup_timeout: float = 300.0,
+                 result_timeout: float = 30.0):
+        """
+        Args:
+            kind: 工作进程内的识别后端，同 create_ocr_backend
+            device: Paddle 后端的推理设备
+            threads: ONNX 后端每个进程的推理线程数
+            workers: 工作进程数
+            slot_bytes: 每个 ROI 槽位的字节数
+            slots: 槽位数，None 表示工作进程数的 2 倍
+            startup_timeout: 等待所有工作进程加载完模型的最长秒数
+            result_timeout: 等待单个识别结果的最长秒数
+
+        Raises:
+            RuntimeError: 工作进程启动失败、退出或超时
+        """
+        self.name = f"{kind}x{workers}"
+        self.workers = workers
+        self.result_timeout = result_timeout
+        self.ring = SharedRoiRing(slots or workers * 2, slot_bytes)
+        self._free = list(range(self.ring.slots))
+        self._free_cond = threading.Condition()
+        self._done = [threading.Event() for _ in range(self.ring.slots)]
+        self._results: List[Optional[tuple]] = [None] * self.ring.slots
+
+        # spawn 在各平台行为一致，子进程不会继承父进程中已初始化的 CUDA / 截图句柄
+        ctx = multiprocessing.get_context("spawn")
+        self._tasks = ctx.SimpleQueue()
+        # 结果队列需要带超时的 get，用 Queue 而不是 SimpleQueue
+        self._result_queue = ctx.Queue()
+        self._processes = [
+            ctx.Process(target=_worker_main, name=f"OcrWorker-{i}", daemon=True,
+                        args=(self.ring.name, self.ring.slots, slot_bytes, kind, device, threads,
+                              self._tasks, self._result_queue))
+            for i in range(workers)
+        ]
+        for process in self._processes:
+            process.start()
+        # 等所有工作进程加载完模型再返回，冷启动计入构造耗时
+        try:
+            self._wait_ready(workers, startup_timeout)
+        except RuntimeError:
+            self.close()
+            raise
+        self._collector = threading.Thread(target=self._collect_loop, name="OcrWorkerResults", daemon=True)
+        self._collector.start()
+
+    def _wait_ready(self, workers: int, timeout: float):
+        deadline = time.monotonic() + timeout
+        ready = 0
+        while ready < workers:
+            try:
+                status, message = self._result_queue.get(timeout=self.POLL_INTERVAL)
+            except queue.Empty:
+                self._check_workers()
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"识别工作进程 {timeout:.0f} 秒内未完成启动")
+                continue
+            if status == "failed":
+                raise RuntimeError(f"识别工作进程启动失败: {message}")
+            ready += 1
+
+    def _check_workers(self):
+        """有工作进程已退出时抛出 RuntimeError"""
+        for process in self._processes:
+            if not process.is_alive():
+                raise RuntimeError(f"识别工作进程 {process.name} 已退出（exitcode={process.exitcode}）")
+
+    def _collect_loop(self):
+        while True:
+            item = self._result_queue.get()
+            if item is None:
+                break
+            slots, results = item
+            for slot, result in zip(slots, results):
+                self._results[slot] = result
+                self._done[slot].set()
+
+    def _release(self, slots: List[int]):
+        with self._free_cond:
+            self._free.extend(slots)
+            self._free_cond.notify_all()
+
+    def _submit(self, rois: List[np.ndarray]) -> List[int]:
+        """一次占用 len(rois) 个空闲槽位写入 ROI，作为一个任务派发给某个工作进程批量识别；槽位不足时等待"""
+        count = len(rois)
+        with self._free_cond:
+            while not self._free_cond.wait_for(lambda: len(self._free) >= count, timeout=self.POLL_INTERVAL):
+                self._check_workers()
+            slots = [self._free.pop() for _ in range(count)]
+        task = []
+        try:
+            for slot, roi in zip(slots, rois):
+                self._done[slot].clear()
+                task.append((slot, self.ring.write(slot, np.ascontiguousarray(roi))))
+        except ValueError:
+            self._release(slots)
+            raise
+        self._tasks.put(task)
+        return slots
+
+    def _wait(self, slot: int) -> Tuple[str, float]:
+        """等待槽位的识别结果并归还槽位
+
+        Raises:
+            RuntimeError: 工作进程已退出或等待超时（槽位随进程池一起作废，不再归还）
+        """
+        deadline = time.monotonic() + self.result_timeout
+        while not self._done[slot].wait(self.POLL_INTERVAL):
+            self._check_workers()
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"识别结果等待超过 {self.result_timeout:.0f} 秒")
+        text, score, error = self._results[slot]
+        self._release([slot])
+        if error is not None:
+            raise RuntimeError(f"识别工作进程出错: {error}")
+        return text, score
+
+    def _recognize(self, roi: np.ndarray) -> Tuple[str, float]:
+        return self._wait(self._submit([roi])[0])
+
+    def _recognize_batch(self, rois: List[np.ndarray]) -> List[Tuple[str, float]]:
+        results = []
+        # 每批不超过槽位数，否则提交会等待尚未取回的结果
+        for start in range(0, len(rois), self.ring.slots):
+            chunk = rois[start:start + self.ring.slots]
+            # 切成不超过 workers 份连续的子列表，每份一个任务
+            parts = min(self.workers, len(chunk))
+            bounds = [len(chunk) * i // parts for i in range(parts + 1)]
+            slots = []
+            for lo, hi in zip(bounds, bounds[1:]):
+                slots.extend(self._submit(chunk[lo:hi]))
+            results.extend(self._wait(slot) for slot in slots)
+        return results
+
+    def close(self):
+        for _ in self._processes:
+            self._tasks.put(None)
+        for process in self._processes:
+            process.join(timeout=5.0)
+            if process.is_alive():
+                process.terminate()
+        self._result_queue.put(None)
+        # 等结果线程读到结束标记再返回，避免解释器退出时它仍阻塞在队列上
+        collector = getattr(self, "_collector", None)
+        if collector is not None:
+            collector.join(timeout=1.0)
+        self.ring.close()
@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+# @Author: BugNotFound
+# @Date: 2026-10-17
+# @Description: 分级流水线 - 截图、识别、决策三级并发，级间用只保留最新数据的有界队列连接
+
+import threading
+from collections import deque, namedtuple
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+from clock import Clock, REAL_CLOCK
+from window_capture import WindowCapture, FrameTimeoutError
+
+# 一次倒计时读数：帧编号、截图时刻、识别文本，以及上一条读数之后、截至该帧检测到的最近一次秒跳沿
+CountdownReading = namedtuple("CountdownReading", ["frame_id", "capture_time", "text", "edge"])
+
+
+class LatestQueue:
+    """有界队列，满时丢弃最旧的元素
+
+    put 永不阻塞，消费者总能拿到最新的数据；dropped 记录被挤掉的元素数。
+    """
+
+    def __init__(self, maxsize: int = 1):
+        self._items = deque(maxlen=maxsize)
+        self._cond = threading.Condition()
+        self.dropped = 0
+
+    def put(self, item):
+        with self._cond:
+            if len(self._items) == self._items.maxlen:
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify()
+
+    def get(self, timeout: Optional[float] = None):
+        """取出最旧的元素，超时返回 None"""
+        with self._cond:
+            if not self._items and not self._cond.wait_for(lambda: self._items, timeout):
+                return None
+            return self._items.popleft()
+
+    def clear(self):
+        with self._cond:
+            self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+
+class CountdownPipeline:
+    """倒计时识别流水线
+
+    - 截图级：逐帧等待新画面，裁出倒计时区域交给秒跳沿检测（每一帧都检测），再放入 ROI 队列
+    - 识别级：每个识别函数一个工作线程，从 ROI 队列取最新的裁剪图识别，结果放入读数队列
+    - 决策级：调用方（ScriptThread）用 next_reading() 取最新读数
+
+    级间队列只保留最新数据，决策看到的读数最多落后一级的耗时，而不是各级耗时之和。
+    识别函数各自持有引擎时可以并行；共享同一个引擎时需由调用方自行加锁。
+    截图级或识别级抛出异常时记入 error 并停止所有级，决策级下一次 next_reading 时重新抛出。
+    """
+
+    def __init__(self, win_cap: WindowCapture, region: Tuple[int, int, int, int],
+                 recognizers: List[Callable[[np.ndarray], str]], edge_detector=None,
+                 queue_size: int = 1, frame_timeout: float = 1.0, max_frame_age: Optional[float] = None, tracer=None,
+                 recorder=None, clock: Optional[Clock] = None):
+        """
+        Args:
+            win_cap: 截图对象
+            region: 倒计时区域（屏幕坐标）
+            recognizers: 识别函数列表，输入裁剪图返回文本，每个函数对应一个工作线程
+            edge_detector: 秒跳沿检测器（TickEdgeDetector），None 表示不检测
+            queue_size: 级间队列长度
+            frame_timeout: 截图级等待新画面的超时秒数
+            max_frame_age: 截图级跳过帧龄超过该秒数的旧帧，None 表示不限
+            tracer: 延迟追踪（LatencyTracer），记录截图级的等待、帧龄与裁剪耗时
+            recorder: 会话录制（SessionRecorder），截图级的每张倒计时裁剪图以 "time" 写入，None 表示不录制
+            clock: 截图时刻与限速使用的时钟，需与决策级一致
+        """
+        self.win_cap = win_cap
+        self.region = region
+        self.recognizers = recognizers
+        self.edge_detector = edge_detector
+        self.frame_timeout = frame_timeout
+        self.max_frame_age = max_frame_age
+        self.tracer = tracer
+        self.recorder = recorder
+        self.clock = clock or REAL_CLOCK
+        self.roi_queue = LatestQueue(queue_size)
+        self.reading_queue = LatestQueue(queue_size)
+        # 识别级两次识别的最小间隔，远离截止时间时由决策级调大以节省算力
+        self.min_interval = 0.0
+        self._running = threading.Event()
+        self._paused = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._last_frame_id = 0
+        self._last_reading_id = 0
+        self._last_reading_time = float("-inf")
+        self._reading_lock = threading.Lock()
+        # 第一个使某一级退出的异常
+        self.error: Optional[BaseException] = None
+
+    def start(self):
+        self.error = None
+        self._last_reading_time = float("-inf")
+        self._running.set()
+        self._threads = [threading.Thread(target=self._capture_loop, name="PipelineCapture", daemon=True)]
+        for i, recognize in enumerate(self.recognizers):
+            self._threads.append(threading.Thread(target=self._recognize_loop, args=(recognize,),
+                                                  name=f"PipelineRecognize-{i}", daemon=True))
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        self._running.clear()
+        for thread in self._threads:
+            thread.join(timeout=2.0)
+        self._threads = []
+
+    def pause(self):
+        """暂停识别级（截图级继续跟踪秒跳沿）"""
+        self._paused.set()
+
+    def resume(self):
+        self._paused.clear()
+        self.roi_queue.clear()
+        self.reading_queue.clear()
+
+    def _fail(self, error: BaseException):
+        """记录异常、停止所有级，并唤醒等待读数的决策级"""
+        with self._reading_lock:
+            if self.error is None:
+                self.error = error
+        self._running.clear()
+        self.reading_queue.put(None)
+
+    def _capture_loop(self):
+        try:
+            self._capture_frames()
+        except Exception as e:
+            self._fail(e)
+
+    def _recognize_loop(self, recognize: Callable[[np.ndarray], str]):
+        try:
+            self._recognize_rois(recognize)
+        except Exception as e:
+            self._fail(e)
+
+    def _capture_frames(self):
+        while self._running.is_set():
+            wait_start = self.clock.now()
+            try:
+                captured = self.win_cap.wait_for_frame(newer_than=self._last_frame_id, timeout=self.frame_timeout,
+                                                       max_age=self.max_frame_age)
+            except FrameTimeoutError:
+                continue
+            self._last_frame_id = captured.frame_id
+            # 时钟模型与秒跳沿都以画面上屏时刻为准，而不是本线程拿到帧的时刻
+            capture_time = captured.timestamp
+            received = self.clock.now()
+            roi = self.win_cap.crop(captured.image, self.region).copy()
+            if self.tracer is not None:
+                self.tracer.record("capture", wait_start, received)
+                self.tracer.record("frame_age", capture_time, received)
+                self.tracer.record("crop", received, self.clock.now())
+            if self.recorder is not None:
+                self.recorder.roi("time", self.region, self._last_frame_id, capture_time, roi)
+            if self.edge_detector is not None:
+                self.edge_detector.update(roi, capture_time)
+            if not self._paused.is_set():
+                edge = self.edge_detector.last_edge if self.edge_detector is not None else None
+                self.roi_queue.put((self._last_frame_id, capture_time, roi, edge))
+
+    def _recognize_rois(self, recognize: Callable[[np.ndarray], str]):
+        last_start = 0.0
+        while self._running.is_set():
+            item = self.roi_queue.get(timeout=0.1)
+            if item is None:
+                continue
+            frame_id, capture_time, roi, edge = item
+            wait = self.min_interval - (self.clock.now() - last_start)
+            if wait > 0:
+                # 限速期间新帧仍会到达，醒来后换成最新的一帧
+                self.clock.sleep(wait)
+                newer = self.roi_queue.get(timeout=0)
+                if newer is not None:
+                    frame_id, capture_time, roi, edge = newer
+            last_start = self.clock.now()
+            text = recognize(roi)
+            with self._reading_lock:
+                # 多个工作线程可能乱序完成，丢弃比已发布读数更旧的结果
+                if frame_id <= self._last_reading_id:
+                    continue
+                self._last_reading_id = frame_id
+                # 上一条读数已经带过（或早于它）的跳变沿不再交给决策级
+                if edge is not None and edge[1] <= self._last_reading_time:
+                    edge = None
+                self._last_reading_time = capture_time
+            self.reading_queue.put(CountdownReading(frame_id, capture_time, text, edge))
+
+    def next_reading(self, timeout: Optional[float] = None) -> Optional[CountdownReading]:
+        """等待下一条读数，超时返回 None
+
+        Raises:
+            Exception: 截图级或识别级出错退出时重新抛出其异常
+        """
+        if self.error is not None:
+            raise self.error
+        reading = self.reading_queue.get(timeout=timeout)
+        if reading is None and self.error is not None:
+            raise self.error
+        return reading
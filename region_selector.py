@@ -7,11 +7,6 @@ import cv2
 import numpy as np
 from typing import Tuple, Optional, Dict
 from PIL import Image, ImageDraw, ImageFont
-import dxcam
-from dxcam.dxcam import Output, Device
-from dxcam.util.io import (
-    enum_dxgi_adapters,
-)
 
 
 class RegionSelector:
@@ -31,7 +26,29 @@ class RegionSelector:
         self.output_idx = 0
         self.device_idx = 0
         self.regions: Dict[str, Tuple[int, int, int, int]] = {}
+        # 屏幕信息与字体只在交互框选时需要，首次框选时再初始化，只读写区域文件时不依赖 dxcam
+        self.screen_width: Optional[int] = None
+        self.screen_height: Optional[int] = None
 
+        # 鼠标状态
+        self.drawing = False
+        self.start_point = None
+        self.current_point = None
+
+    @classmethod
+    def from_file(cls, filepath: str) -> "RegionSelector":
+        """从区域文件创建选择器（不需要 dxcam，可在非 Windows 环境下使用）"""
+        selector = cls()
+        selector.load_regions_from_file(filepath)
+        return selector
+
+    def _prepare_selection(self):
+        """枚举屏幕并加载字体（交互框选前调用一次）"""
+        if self.screen_width is not None:
+            return
+        # dxcam 只在 Windows 上可用，且导入较慢，用到时再导入
+        from dxcam.dxcam import Output, Device
+        from dxcam.util.io import enum_dxgi_adapters
         p_adapters = enum_dxgi_adapters()
         self.devices, self.outputs = [], []
         for p_adapter in p_adapters:
@@ -51,11 +68,6 @@ class RegionSelector:
         self.screen_height = output_info.resolution[1]
         print(f"屏幕 {self.output_idx} 分辨率: {self.screen_width}x{self.screen_height}")
 
-        # 鼠标状态
-        self.drawing = False
-        self.start_point = None
-        self.current_point = None
-        
         # 尝试加载中文字体
         try:
             # Windows 系统字体路径
@@ -141,7 +153,9 @@ class RegionSelector:
         Returns:
             (left, top, right, bottom) 格式的坐标元组
         """
+        self._prepare_selection()
         # 截取当前屏幕作为背景
+        import dxcam
         camera = dxcam.create(device_idx=self.device_idx, output_idx=self.output_idx, output_color="BGR")
         screenshot = camera.grab()
         if screenshot is None:
@@ -0,0 +1,466 @@
+# -*- coding: utf-8 -*-
+# @Author: BugNotFound
+# @Date: 2026-10-17
+# @Description: 会话录制 - 只记录 ROI 裁剪图、截图时刻、OCR 结果、色差与点击时刻的分块追加式二进制文件，以及按原始时序回放
+#
+# 用法:
+#   python session_recorder.py dump sessions/session_20261017_203000            打印时间线
+#   python session_recorder.py dump sessions/session_20261017_203000 --kinds text value
+#
+# 文件格式（小端）：会话目录下的 chunk_000000.bin, chunk_000001.bin, ...
+#   块头 16 字节：MAGIC(8) + 块创建时的墙钟时刻 f64
+#   记录：32 字节定长记录头 + 载荷（补齐到 8 字节）
+#     记录头 = 类型 u8、名称编号 u8、ROI 高度 u16、载荷字节数 u32、帧编号 i64、时刻 f64、数值 f64
+#   每个块开头重新声明全部名称，且每个名称在块内的第一张 ROI 总是完整像素，单个块可以独立解析和回放；
+#   块写满后新开一块，超过块数上限时删除最旧的块；新建会话时删除最旧的会话，使 sessions/ 总占用不超过上限。
+
+import argparse
+import json
+import mmap
+import os
+import shutil
+import struct
+import threading
+import time
+from collections import deque, namedtuple
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from clock import Clock
+from frame_source import PlaybackItem, PlaybackSource
+
+MAGIC = b"DFSREC01"
+CHUNK_HEADER = struct.Struct("<8sd")
+RECORD_HEADER = struct.Struct("<BBHIqdd")
+# OCR 文本载荷的定长字节数（UTF-8，超出截断）
+TEXT_BYTES = 32
+# 名称编号为 u8，超出的名称不录制
+MAX_NAMES = 255
+SESSIONS_DIR = "sessions"
+
+# 记录类型
+KIND_NAME = 0      # 名称声明：载荷为 JSON {"name": 名称, "region": 屏幕坐标或 null}
+KIND_ROI = 1       # ROI 裁剪图：载荷为 h * w * 3 的 BGR 像素，时刻为该帧上屏时刻
+KIND_ROI_REPEAT = 2  # 与该名称在本块中上一张 ROI 像素完全相同，无载荷
+KIND_TEXT = 3      # 识别结果：载荷为定长文本
+KIND_VALUE = 4     # 数值事件：色差、点击（时刻为入队时刻，数值为决策时刻）等
+
+KIND_NAMES = {KIND_ROI: "roi", KIND_ROI_REPEAT: "roi", KIND_TEXT: "text", KIND_VALUE: "value"}
+
+# 回放时的一条记录；data 为 ROI 图像（ROI_REPEAT 为 None）或 OCR 文本
+SessionRecord = namedtuple("SessionRecord", ["kind", "name", "frame_id", "time", "value", "data"])
+
+
+def _padded(size: int) -> int:
+    return (size + 7) & ~7
+
+
+def _directory_bytes(directory: str) -> int:
+    total = 0
+    for entry in os.scandir(directory):
+        if entry.is_file(follow_symlinks=False):
+            total += entry.stat(follow_symlinks=False).st_size
+    return total
+
+
+def prune_sessions(root: str, max_bytes: int) -> List[str]:
+    """按名称（即创建时刻）从旧到新删除 root 下的会话目录，直到总占用不超过 max_bytes
+
+    Returns:
+        被删除的目录
+    """
+    if not os.path.isdir(root):
+        return []
+    sessions = sorted(os.path.join(root, n) for n in os.listdir(root)
+                      if n.startswith("session_") and os.path.isdir(os.path.join(root, n)))
+    sizes = {path: _directory_bytes(path) for path in sessions}
+    total = sum(sizes.values())
+    removed = []
+    for path in sessions:
+        if total <= max_bytes:
+            break
+        shutil.rmtree(path, ignore_errors=True)
+        total -= sizes[path]
+        removed.append(path)
+    return removed
+
+
+def new_session_directory(root: str = SESSIONS_DIR) -> str:
+    """在 root 下新建一个不与已有会话重名的目录（同一秒内多次启动时追加进程号和序号）"""
+    base = os.path.join(root, time.strftime("session_%Y%m%d_%H%M%S") + f"_{os.getpid()}")
+    path, n = base, 1
+    while True:
+        try:
+            os.makedirs(path)
+            return path
+        except FileExistsError:
+            path = f"{base}_{n}"
+            n += 1
+
+
+class SessionRecorder:
+    """会话录制
+
+    roi / text / value 在调用线程只做比较、必要时复制一份像素并入队，文件写入由后台线程完成，不在热路径上。
+    同一名称的 ROI 像素与上一张完全相同时只写 32 字节的重复标记（倒计时每秒才变一次）；
+    新开的块中每个名称的第一张 ROI 补写完整像素，删除旧块后剩下的块仍能独立回放。
+    单个会话的磁盘占用以 chunk_bytes * max_chunks 为上限，create() 另外限制所有会话的总占用。
+    写入线程跟不上、名称超过 MAX_NAMES 个或单条记录大于 chunk_bytes 时丢弃该记录并计数。
+    """
+
+    def __init__(self, directory: str, chunk_bytes: int = 32 << 20, max_chunks: int = 16, max_pending: int = 4096):
+        """
+        Args:
+            directory: 会话目录（不存在时创建）
+            chunk_bytes: 单个块文件的大小上限
+            max_chunks: 保留的块数上限，超出时删除最旧的块
+            max_pending: 待写入队列的长度上限
+        """
+        self.directory = directory
+        self.chunk_bytes = chunk_bytes
+        self.max_chunks = max_chunks
+        self.max_pending = max_pending
+        os.makedirs(directory, exist_ok=True)
+        self.records = 0
+        self.repeats = 0
+        self.dropped = 0
+        self.bytes_written = 0
+        self._names: Dict[str, int] = {}
+        self._name_payloads: List[bytes] = []
+        self._last_roi: Dict[str, np.ndarray] = {}
+        self._pending = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._chunks: List[str] = []
+        self._chunk_index = 0
+        # 当前块中已写过完整像素的名称编号（写入线程使用）
+        self._keyframes = set()
+        self._file = None
+        self._chunk_size = 0
+        self._writer = threading.Thread(target=self._write_loop, name="SessionRecorder", daemon=True)
+        self._writer.start()
+
+    @classmethod
+    def create(cls, root: str = SESSIONS_DIR, total_bytes: int = 1 << 30, **kwargs) -> "SessionRecorder":
+        """在 root 下新建会话并开始录制
+
+        先删除最旧的会话，为本次会话的上限（chunk_bytes * max_chunks）腾出空间，root 下的总占用不超过 total_bytes。
+
+        Args:
+            root: 会话根目录
+            total_bytes: 所有会话的总占用上限
+            kwargs: 传给构造函数的 chunk_bytes / max_chunks / max_pending
+        """
+        chunk_bytes = kwargs.get("chunk_bytes", 32 << 20)
+        max_chunks = kwargs.get("max_chunks", 16)
+        if chunk_bytes * max_chunks > total_bytes:
+            raise ValueError(f"单个会话的上限 {chunk_bytes * max_chunks} 字节超过总上限 {total_bytes} 字节")
+        prune_sessions(root, total_bytes - chunk_bytes * max_chunks)
+        return cls(new_session_directory(root), **kwargs)
+
+    # ---------- 调用方线程 ----------
+
+    def _name_index(self, name: str, region=None) -> Optional[int]:
+        """名称编号，名称已满 MAX_NAMES 个时返回 None（调用方丢弃该记录）"""
+        index = self._names.get(name)
+        if index is None:
+            if len(self._names) >= MAX_NAMES:
+                return None
+            index = self._names[name] = len(self._names)
+            payload = json.dumps({"name": name, "region": list(region) if region else None},
+                                 ensure_ascii=False).encode("utf-8")
+            self._name_payloads.append(payload)
+            self._enqueue((KIND_NAME, index, 0, 0, 0.0, 0.0, payload))
+        return index
+
+    def _enqueue(self, record) -> bool:
+        """放入待写入队列，队列已满时丢弃并返回 False"""
+        with self._cond:
+            if len(self._pending) >= self.max_pending:
+                self.dropped += 1
+                return False
+            self._pending.append(record)
+            self._cond.notify()
+            return True
+
+    def roi(self, name: str, region, frame_id: int, timestamp: float, image: np.ndarray):
+        """记录一张 ROI 裁剪图
+
+        Args:
+            name: 区域名
+            region: 区域的屏幕坐标 (left, top, right, bottom)，回放时按此放回画面
+            frame_id: 帧编号
+            timestamp: 该帧的上屏时刻
+            image: BGR 裁剪图
+        """
+        with self._cond:
+            index = self._name_index(name, region)
+            if index is None:
+                self.dropped += 1
+                return
+            last = self._last_roi.get(name)
+            if last is not None and last.shape == image.shape and np.array_equal(last, image):
+                # 带上像素的引用（不复制），写入线程在新块中需要补写关键帧时使用
+                if self._enqueue((KIND_ROI_REPEAT, index, last.shape[0], frame_id, timestamp, 0.0, last)):
+                    self.repeats += 1
+                return
+            copy = np.ascontiguousarray(image).copy()
+            # 只有入队成功才作为后续比较的基准，否则之后的重复标记会指向一张从未写出的图像
+            if self._enqueue((KIND_ROI, index, copy.shape[0], frame_id, timestamp, 0.0, copy)):
+                self._last_roi[name] = copy
+
+    def text(self, name: str, frame_id: int, timestamp: float, text: str):
+        """记录一次识别结果（时刻为所识别画面的上屏时刻）"""
+        with self._cond:
+            index = self._name_index(name)
+            if index is None:
+                self.dropped += 1
+                return
+            self._enqueue((KIND_TEXT, index, 0, frame_id, timestamp, 0.0, text))
+
+    def value(self, name: str, frame_id: int, timestamp: float, value: float):
+        """记录一个数值事件"""
+        with self._cond:
+            index = self._name_index(name)
+            if index is None:
+                self.dropped += 1
+                return
+            self._enqueue((KIND_VALUE, index, 0, frame_id, timestamp, value, None))
+
+    def close(self):
+        """写完队列中的记录并关闭文件"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._writer.join()
+
+    # ---------- 写入线程 ----------
+
+    def _open_chunk(self):
+        if self._file is not None:
+            self._file.close()
+        path = os.path.join(self.directory, f"chunk_{self._chunk_index:06d}.bin")
+        self._chunk_index += 1
+        self._chunks.append(path)
+        while len(self._chunks) > self.max_chunks:
+            os.remove(self._chunks.pop(0))
+        self._file = open(path, "wb")
+        self._file.write(CHUNK_HEADER.pack(MAGIC, time.time()))
+        self._chunk_size = CHUNK_HEADER.size
+        self._keyframes.clear()
+        # 每个块重新声明名称，块可以独立解析（队列中尚未写出的新名称之后会再声明一次，不影响解析）
+        with self._cond:
+            payloads = list(self._name_payloads)
+        for index, payload in enumerate(payloads):
+            self._write_record(KIND_NAME, index, 0, 0, 0.0, 0.0, payload)
+
+    def _record_size(self, kind, index, payload) -> int:
+        """记录在当前块中写出的字节数（重复标记在块内没有关键帧时按完整像素计）"""
+        if kind == KIND_TEXT:
+            size = TEXT_BYTES
+        elif kind == KIND_ROI_REPEAT and index in self._keyframes:
+            size = 0
+        elif isinstance(payload, np.ndarray):
+            size = payload.nbytes
+        else:
+            size = len(payload or b"")
+        return RECORD_HEADER.size + _padded(size)
+
+    def _write_record(self, kind, index, height, frame_id, timestamp, value, payload):
+        if kind == KIND_TEXT:
+            data = payload.encode("utf-8")[:TEXT_BYTES].ljust(TEXT_BYTES, b"\0")
+        elif payload is None:
+            data = b""
+        elif isinstance(payload, np.ndarray):
+            data = memoryview(payload).cast("B")
+        else:
+            data = payload
+        size = len(data)
+        self._file.write(RECORD_HEADER.pack(kind, index, height, size, frame_id, timestamp, value))
+        self._file.write(data)
+        padding = _padded(size) - size
+        if padding:
+            self._file.write(b"\0" * padding)
+        written = RECORD_HEADER.size + size + padding
+        self._chunk_size += written
+        self.bytes_written += written
+        self.records += 1
+
+    def _write_loop(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending or self._closed)
+                if not self._pending and self._closed:
+                    break
+                batch = list(self._pending)
+                self._pending.clear()
+            for kind, index, height, frame_id, timestamp, value, payload in batch:
+                if self._file is None or self._chunk_size + self._record_size(kind, index, payload) > self.chunk_bytes:
+                    self._open_chunk()
+                    # 换块后块内没有关键帧，重复标记要补写完整像素，按新块重新计算；空块也放不下的记录丢弃
+                    if self._chunk_size + self._record_size(kind, index, payload) > self.chunk_bytes:
+                        with self._cond:
+                            self.dropped += 1
+                        continue
+                if kind == KIND_ROI_REPEAT:
+                    if index in self._keyframes:
+                        payload = None
+                    else:
+                        # 本块中还没有该名称的完整像素，补写一张关键帧
+                        kind = KIND_ROI
+                if kind == KIND_ROI:
+                    self._keyframes.add(index)
+                self._write_record(kind, index, height, frame_id, timestamp, value, payload)
+            self._file.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class SessionReader:
+    """读取会话录制，按写入顺序逐条返回记录
+
+    块文件以 mmap 方式读取；返回的 ROI 图像是映射内存上的只读视图，不复制像素。
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.chunks = sorted(os.path.join(directory, n) for n in os.listdir(directory)
+                             if n.startswith("chunk_") and n.endswith(".bin"))
+        if not self.chunks:
+            raise ValueError(f"目录中没有会话录制: {directory}")
+        # 名称到屏幕坐标（仅 ROI 名称有坐标）
+        self.regions: Dict[str, Optional[Tuple[int, int, int, int]]] = {}
+
+    def records(self) -> Iterator[SessionRecord]:
+        for path in self.chunks:
+            with open(path, "rb") as f:
+                if os.fstat(f.fileno()).st_size < CHUNK_HEADER.size:
+                    continue
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, _ = CHUNK_HEADER.unpack_from(mm, 0)
+            if magic != MAGIC:
+                raise ValueError(f"不是会话录制文件: {path}")
+            # 不显式关闭映射：ROI 视图还引用着它，最后一个视图释放后随之释放
+            yield from self._chunk_records(mm)
+
+    def _chunk_records(self, mm) -> Iterator[SessionRecord]:
+        names: Dict[int, str] = {}
+        offset = CHUNK_HEADER.size
+        end = len(mm)
+        while offset + RECORD_HEADER.size <= end:
+            kind, index, height, size, frame_id, timestamp, value = RECORD_HEADER.unpack_from(mm, offset)
+            start = offset + RECORD_HEADER.size
+            if start + size > end:
+                # 异常退出时最后一条可能没写完
+                break
+            offset = start + _padded(size)
+            if kind == KIND_NAME:
+                info = json.loads(bytes(mm[start:start + size]).decode("utf-8"))
+                names[index] = info["name"]
+                self.regions[info["name"]] = tuple(info["region"]) if info["region"] else None
+                continue
+            name = names.get(index, str(index))
+            data = None
+            if kind == KIND_ROI:
+                data = np.frombuffer(mm, dtype=np.uint8, count=size, offset=start).reshape(height, -1, 3)
+            elif kind == KIND_TEXT:
+                data = bytes(mm[start:start + size]).rstrip(b"\0").decode("utf-8", errors="ignore")
+            yield SessionRecord(kind, name, frame_id, timestamp, value, data)
+
+
+class RecordingSource(PlaybackSource):
+    """把会话录制按原始时序回放为帧来源
+
+    每个帧编号的 ROI 放回其屏幕坐标，拼成与录制时相同坐标系的画面（未录制的像素为黑色），
+    时间戳为录制时的上屏时刻，交给 WindowCapture 后 ScriptThread 看到的区域像素与时序与录制时一致。
+    """
+
+    def __init__(self, directory: str, frame_size: Optional[Tuple[int, int]] = None, realtime: bool = True,
+                 loop: bool = False, clock: Optional[Clock] = None):
+        """
+        Args:
+            directory: 会话目录
+            frame_size: 画面尺寸 (宽, 高)，None 表示按已出现区域的最大范围（配合 ROI 模式的 WindowCapture 时
+                应传入录制时的屏幕尺寸，保证包围盒内的区域都在画面内）
+            realtime: 是否按原始时序播放
+            loop: 播放结束后是否从头循环
+            clock: 按时序播放时使用的时钟
+        """
+        super().__init__(realtime=realtime, loop=loop, clock=clock)
+        self.reader = SessionReader(directory)
+        width, height = frame_size or (0, 0)
+        self._canvas = np.zeros((height, width, 3), dtype=np.uint8)
+
+    def _fit_canvas(self, region: Tuple[int, int, int, int]):
+        """画面不足以容纳区域时扩大"""
+        height, width = self._canvas.shape[:2]
+        if region[3] > height or region[2] > width:
+            grown = np.zeros((max(height, region[3]), max(width, region[2]), 3), dtype=np.uint8)
+            grown[:height, :width] = self._canvas
+            self._canvas = grown
+
+    def _render(self, snapshot: Dict[str, np.ndarray]) -> np.ndarray:
+        """把各区域的 ROI 放回画面；只在该帧确实被取用时调用，返回新的视图对象"""
+        for name, roi in snapshot.items():
+            left, top = self.reader.regions[name][:2]
+            self._canvas[top:top + roi.shape[0], left:left + roi.shape[1]] = roi
+        return self._canvas[:]
+
+    def _items(self) -> Iterator[PlaybackItem]:
+        current: Dict[str, np.ndarray] = {}
+        frame_id, frame_time, last_time = None, 0.0, -np.inf
+        for record in self.reader.records():
+            region = self.reader.regions.get(record.name)
+            if record.kind not in (KIND_ROI, KIND_ROI_REPEAT) or region is None:
+                continue
+            if record.kind == KIND_ROI_REPEAT and record.name not in current:
+                # 找不到原图的重复标记（不应出现）直接跳过
+                continue
+            # 同一帧编号的 ROI 合成一帧；多个线程交错录制导致时刻倒退的帧丢弃
+            if frame_id is not None and record.frame_id != frame_id and frame_time >= last_time:
+                last_time = frame_time
+                yield frame_time, (lambda snapshot=dict(current): self._render(snapshot))
+            frame_id, frame_time = record.frame_id, record.time
+            if record.kind == KIND_ROI:
+                # 复制一份（ROI 很小），避免整块映射一直被引用
+                current[record.name] = record.data.copy()
+                self._fit_canvas(region)
+        if frame_id is not None and frame_time >= last_time:
+            yield frame_time, (lambda snapshot=dict(current): self._render(snapshot))
+
+
+def dump(directory: str, kinds: List[str]):
+    """按时间顺序打印录制的记录"""
+    reader = SessionReader(directory)
+    origin = None
+    for record in reader.records():
+        kind = KIND_NAMES[record.kind]
+        if kind not in kinds:
+            continue
+        origin = record.time if origin is None else origin
+        prefix = f"{record.time - origin:10.3f}s #{record.frame_id:<8} {kind:<5} {record.name:<12}"
+        if record.kind == KIND_ROI:
+            print(f"{prefix} {record.data.shape[1]}x{record.data.shape[0]}")
+        elif record.kind == KIND_ROI_REPEAT:
+            print(f"{prefix} (未变化)")
+        elif record.kind == KIND_TEXT:
+            print(f"{prefix} {record.data!r}")
+        else:
+            print(f"{prefix} {record.value:.6f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="会话录制工具")
+    sub = parser.add_subparsers(dest="command", required=True)
+    dump_parser = sub.add_parser("dump", help="打印时间线")
+    dump_parser.add_argument("directory")
+    dump_parser.add_argument("--kinds", nargs="+", default=["roi", "text", "value"], choices=["roi", "text", "value"])
+    args = parser.parse_args()
+    if args.command == "dump":
+        dump(args.directory, args.kinds)
+
+
+if __name__ == "__main__":
+    main()
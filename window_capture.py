@@ -5,13 +5,20 @@
 # @FilePath: /DeltaForceScript/window_capture.py
 # @Description: 窗口截图工具 - 包含Windows Graphics Capture API支持
 
-import dxcam
-import win32gui
+import threading
+from collections import namedtuple
+
 import cv2
 import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+from clock import Clock, REAL_CLOCK
+from frame_source import FrameSource
 
 def enum_windows_with_title():
     """枚举所有窗口并显示标题"""
+    import win32gui
+
     def enum_callback(hwnd, results):
         if win32gui.IsWindowVisible(hwnd):
             window_title = win32gui.GetWindowText(hwnd)
@@ -23,37 +30,296 @@ def enum_windows_with_title():
     win32gui.EnumWindows(enum_callback, windows)
     return windows
 
+class FrameTimeoutError(TimeoutError):
+    """等待新帧超时"""
+
+
+class StaleFrameError(FrameTimeoutError):
+    """等待期间到达的帧都超过了允许的最大延迟"""
+
+
+# 一帧画面：帧编号（从 1 递增）、图像、上屏时刻（时钟时间）
+CapturedFrame = namedtuple("CapturedFrame", ["frame_id", "image", "timestamp"])
+
+
+class RoiLayout:
+    """ROI 布局
+
+    根据 RegionSelector 给出的区域集合计算联合包围盒，以及各区域在包围盒内的相对坐标。
+    区域分散在屏幕各处时包围盒接近整屏，此时改为紧凑模式：各区域自上而下依次排进一张小图，
+    capture() 返回这张紧凑帧，区域坐标按所在 ROI 换算到它在紧凑帧中的位置。
+    """
+
+    def __init__(self, regions: Dict[str, Tuple[int, int, int, int]], pack_ratio: Optional[float] = 4.0):
+        """
+        Args:
+            regions: 区域名称到 (left, top, right, bottom) 屏幕坐标的映射
+            pack_ratio: 包围盒面积超过各区域面积之和的这个倍数时使用紧凑模式，None 表示始终使用包围盒
+        """
+        if not regions:
+            raise ValueError("ROI 区域集合为空")
+        self.regions = dict(regions)
+        self.bbox = (
+            min(r[0] for r in self.regions.values()),
+            min(r[1] for r in self.regions.values()),
+            max(r[2] for r in self.regions.values()),
+            max(r[3] for r in self.regions.values()),
+        )
+        ox, oy = self.bbox[0], self.bbox[1]
+        self.local = {name: (l - ox, t - oy, r - ox, b - oy) for name, (l, t, r, b) in self.regions.items()}
+
+        roi_area = sum((r - l) * (b - t) for l, t, r, b in self.regions.values())
+        bbox_area = (self.bbox[2] - self.bbox[0]) * (self.bbox[3] - self.bbox[1])
+        self.packed = pack_ratio is not None and bbox_area > pack_ratio * roi_area
+        # 紧凑帧中各区域的位置：宽度左对齐、高度依次累加
+        self.slots: Dict[str, Tuple[int, int, int, int]] = {}
+        y = 0
+        for name, (l, t, r, b) in self.regions.items():
+            self.slots[name] = (0, y, r - l, y + b - t)
+            y += b - t
+
+    @property
+    def shape(self) -> Tuple[int, int, int]:
+        """capture() 返回帧的形状 (h, w, 3)：紧凑模式为紧凑帧，否则为包围盒"""
+        if self.packed:
+            return (max(s[3] for s in self.slots.values()), max(s[2] for s in self.slots.values()), 3)
+        return (self.bbox[3] - self.bbox[1], self.bbox[2] - self.bbox[0], 3)
+
+    def to_packed(self, region: Tuple[int, int, int, int]) -> Tuple[int, int, int, int]:
+        """把屏幕坐标区域换算到紧凑帧坐标，区域须落在某个 ROI 之内"""
+        left, top, right, bottom = region
+        for name, (l, t, r, b) in self.regions.items():
+            if l <= left and t <= top and right <= r and bottom <= b:
+                sl, st = self.slots[name][:2]
+                return (left - l + sl, top - t + st, right - l + sl, bottom - t + st)
+        raise ValueError(f"区域 {region} 不在任何 ROI 之内")
+
+    def pack(self, img: np.ndarray, out: np.ndarray, origin: Tuple[int, int] = (0, 0)) -> np.ndarray:
+        """把 img（左上角位于屏幕坐标 origin）中的各区域复制进紧凑帧 out"""
+        ox, oy = origin
+        for name, (l, t, r, b) in self.regions.items():
+            sl, st, sr, sb = self.slots[name]
+            np.copyto(out[st:sb, sl:sr], img[t - oy:b - oy, l - ox:r - ox])
+        return out
+
+
+class DxcamSource(FrameSource):
+    """dxcam 实时截图（仅 Windows）"""
+
+    def __init__(self, device_idx: int = 0, output_idx: int = 0, target_fps: int = 500, max_buffer_len: int = 8,
+                 region: Optional[Tuple[int, int, int, int]] = None):
+        """
+        Args:
+            region: 只截取的屏幕区域，None 表示整屏
+        """
+        import dxcam
+        print(dxcam.device_info())
+        print(dxcam.output_info())
+        self.target_fps = target_fps
+        self.region = region
+        self.camera = dxcam.create(device_idx=device_idx, output_idx=output_idx, region=region,
+                                   output_color="BGR", max_buffer_len=max_buffer_len)
+
+    def start(self):
+        self.camera.start(region=self.region, target_fps=self.target_fps, video_mode=True)
+
+    def get_latest_frame(self) -> Optional[np.ndarray]:
+        return self.camera.get_latest_frame()
+
+    def stop(self):
+        self.camera.stop()
+
+
 class WindowCapture():
-    def __init__(self, device_idx: int = 0, output_idx: int = 0, target_fps: int = 500, max_buffer_len: int = 8):
+    def __init__(self, device_idx: int = 0, output_idx: int = 0, target_fps: int = 500, max_buffer_len: int = 8,
+                 source: Optional[FrameSource] = None, roi_regions: Optional[Dict[str, Tuple[int, int, int, int]]] = None,
+                 threaded: Optional[bool] = None, poll_interval: float = 0.001, clock: Optional[Clock] = None,
+                 pack_ratio: Optional[float] = 4.0):
         """初始化窗口捕获
         
         Args:
             device_idx: 设备索引
             output_idx: 输出屏幕索引（多屏幕时指定）
             target_fps: 目标帧率
+            source: 帧来源，None 时使用 dxcam 实时截图；传入回放来源可在非 Windows 环境下运行
+            roi_regions: ROI 模式下需要读取像素的区域集合，None 表示整屏模式。
+                ROI 模式只截取这些区域的联合包围盒，capture() 返回的帧以包围盒左上角为原点，
+                用 crop() 按屏幕坐标裁剪；包围盒过大时 capture() 改为返回各区域排成的紧凑帧
+            threaded: 是否用后台线程持续取帧并通知等待者，None 表示 dxcam 时启用、回放来源时不启用。
+                不启用时在调用方线程中按需取帧，回放可以与虚拟时间等单线程驱动方式配合
+            poll_interval: 来源暂无新帧时的轮询间隔（秒）；dxcam 取帧本身会阻塞到新帧到达
+            clock: 计算等待超时用的时钟，None 表示实盘时钟；虚拟时钟需配合 threaded=False
+            pack_ratio: 包围盒面积超过各区域面积之和的这个倍数时改用紧凑帧，None 表示始终返回包围盒
         """
-        print(dxcam.device_info())
-        print(dxcam.output_info())
         self.device_idx = device_idx
         self.output_idx = output_idx
-        self.camera = dxcam.create(device_idx=device_idx, output_idx=output_idx, output_color="BGR", max_buffer_len=max_buffer_len)
-        self.camera.start(target_fps=target_fps, video_mode=True)
+        self.roi_layout = RoiLayout(roi_regions, pack_ratio) if roi_regions else None
+        self.origin = self.roi_layout.bbox[:2] if self.roi_layout else (0, 0)
+        # dxcam 直接按包围盒截图；回放来源给出整帧，需要自行裁剪
+        self._source_cropped = source is None
+        if source is None:
+            source = DxcamSource(device_idx=device_idx, output_idx=output_idx, target_fps=target_fps, max_buffer_len=max_buffer_len,
+                                 region=self.roi_layout.bbox if self.roi_layout else None)
+        self.source = source
+
+        # 帧编号从 1 开始递增，等待者据此判断是否拿到了比已处理帧更新的画面
+        self.poll_interval = poll_interval
+        self.clock = clock or REAL_CLOCK
+        self._cond = threading.Condition()
+        self._frame_id = 0
+        self._latest: Optional[np.ndarray] = None
+        self._latest_time = 0.0
+        # 因超过最大延迟被 wait_for_frame 跳过的帧数
+        self.stale_frames = 0
+        self._last_raw: Optional[np.ndarray] = None
+        self._stop_event = threading.Event()
+        self.threaded = self._source_cropped if threaded is None else threaded
+
+        # ROI 模式的预分配环形缓冲，返回的数组在被 max_buffer_len 次后续截图覆盖前保持有效。
+        # dxcam 已按包围盒截图时只有紧凑模式需要复制；后台线程取帧时每帧另行分配（见 _crop_to_roi）
+        self._ring_len = max(1, max_buffer_len)
+        self._ring_idx = 0
+        self._ring: List[np.ndarray] = []
+        if (self.roi_layout and not self.threaded
+                and (self.roi_layout.packed or not self._source_cropped)):
+            self._ring = [np.empty(self.roi_layout.shape, dtype=np.uint8) for _ in range(self._ring_len)]
+        self.source.start()
+        self._pump: Optional[threading.Thread] = None
+        if self.threaded:
+            self._pump = threading.Thread(target=self._pump_loop, name="WindowCapturePump", daemon=True)
+            self._pump.start()
+
+    def _crop_to_roi(self, img: np.ndarray) -> np.ndarray:
+        """ROI 模式下把来源给出的帧裁剪到包围盒，紧凑模式下把各区域复制进紧凑帧"""
+        layout = self.roi_layout
+        if layout is None or (self._source_cropped and not layout.packed):
+            return img
+        if self.threaded:
+            # 后台线程写入时消费者可能仍持有环形缓冲中的旧帧，这里改为独立拷贝
+            buf = np.empty(layout.shape, dtype=np.uint8)
+        else:
+            self._ring_idx = (self._ring_idx + 1) % self._ring_len
+            buf = self._ring[self._ring_idx]
+        # dxcam 给出的帧以包围盒左上角为原点，回放来源给出整帧
+        origin = layout.bbox[:2] if self._source_cropped else (0, 0)
+        if layout.packed:
+            return layout.pack(img, buf, origin)
+        l, t, r, b = layout.bbox
+        np.copyto(buf, img[t:b, l:r])
+        return buf
+
+    def _poll_source(self) -> bool:
+        """从来源取一次帧，有新帧时发布并通知等待者"""
+        raw = self.source.get_latest_frame()
+        if raw is None or raw.size == 0 or raw is self._last_raw:
+            return False
+        self._last_raw = raw
+        # 来源知道上屏时刻时直接采用（回放、模拟器），dxcam 取帧阻塞到新帧到达，取到的时刻即上屏时刻
+        timestamp = self.source.latest_timestamp()
+        if timestamp is None:
+            timestamp = self.clock.now()
+        img = self._crop_to_roi(raw)
+        with self._cond:
+            self._latest = img
+            self._latest_time = timestamp
+            self._frame_id += 1
+            self._cond.notify_all()
+        return True
+
+    def _pump_loop(self):
+        while not self._stop_event.is_set():
+            if not self._poll_source():
+                self._stop_event.wait(self.poll_interval)
+
+    @property
+    def latest_frame_id(self) -> int:
+        """最新一帧的编号，尚无画面时为 0"""
+        return self._frame_id
+
+    @property
+    def latest_frame_time(self) -> float:
+        """最新一帧的上屏时刻"""
+        return self._latest_time
 
     def capture(self) -> np.ndarray:
-        img = self.camera.get_latest_frame()
-        return img
+        """获取最新一帧（不等待新帧），尚无画面时返回 None"""
+        if not self.threaded:
+            # 多个线程可能同时按需取帧，回放来源本身不是线程安全的
+            with self._cond:
+                self._poll_source()
+        return self._latest
+
+    def wait_for_frame(self, newer_than: int = 0, timeout: Optional[float] = 1.0,
+                       max_age: Optional[float] = None) -> CapturedFrame:
+        """阻塞等待一帧编号大于 newer_than 的画面
+
+        Args:
+            newer_than: 调用方已处理过的最新帧编号，0 表示任意一帧
+            timeout: 最长等待秒数，None 表示一直等待
+            max_age: 允许的最大帧龄（当前时刻减上屏时刻，秒），更旧的帧被跳过并继续等待下一帧；None 表示不限
+
+        Returns:
+            CapturedFrame(帧编号, 图像, 上屏时刻)
+
+        Raises:
+            FrameTimeoutError: 超时仍没有新帧
+            StaleFrameError: 超时前到达的新帧都超过了 max_age
+        """
+        deadline = None if timeout is None else self.clock.now() + timeout
+        stale = False
+        with self._cond:
+            while True:
+                if self._frame_id > newer_than:
+                    if max_age is None or self.clock.now() - self._latest_time <= max_age:
+                        break
+                    # 过期的帧不交给调用方，改为等待比它更新的一帧
+                    newer_than = self._frame_id
+                    self.stale_frames += 1
+                    stale = True
+                if not self.threaded and self._poll_source():
+                    continue
+                wait = self.poll_interval if not self.threaded else None
+                if deadline is not None:
+                    remaining = deadline - self.clock.now()
+                    if remaining <= 0:
+                        if stale:
+                            raise StaleFrameError(f"{timeout}秒内的新画面均超过最大帧龄 {max_age}秒，"
+                                                  f"最新帧编号 {self._frame_id}")
+                        raise FrameTimeoutError(f"等待新画面超时（{timeout}秒），最新帧编号 {self._frame_id}")
+                    wait = remaining if wait is None else min(wait, remaining)
+                self.clock.wait(self._cond, wait)
+            return CapturedFrame(self._frame_id, self._latest, self._latest_time)
+
+    def to_frame_coords(self, region: Tuple[int, int, int, int]) -> Tuple[int, int, int, int]:
+        """把屏幕坐标区域换算为 capture() 返回帧中的坐标"""
+        if self.roi_layout and self.roi_layout.packed:
+            return self.roi_layout.to_packed(region)
+        ox, oy = self.origin
+        left, top, right, bottom = region
+        if self.roi_layout:
+            bl, bt, br, bb = self.roi_layout.bbox
+            if left < bl or top < bt or right > br or bottom > bb:
+                raise ValueError(f"区域 {region} 超出 ROI 包围盒 {self.roi_layout.bbox}")
+        return (left - ox, top - oy, right - ox, bottom - oy)
+
+    def crop(self, frame: np.ndarray, region: Tuple[int, int, int, int]) -> np.ndarray:
+        """按屏幕坐标裁剪 capture() 返回的帧"""
+        left, top, right, bottom = self.to_frame_coords(region)
+        return frame[top:bottom, left:right]
 
     def stop(self):
-        self.camera.stop()
+        self._stop_event.set()
+        self.source.stop()
+        if self._pump is not None:
+            self._pump.join(timeout=1.0)
     
 if __name__ == "__main__":
     wc = WindowCapture()
     from region_selector import RegionSelector
-    selector = RegionSelector()
-    selector.load_regions_from_file("regions_2k.json")
-    frame = wc.capture()
+    selector = RegionSelector.from_file("regions_2k.json")
+    frame = wc.wait_for_frame(timeout=5.0).image
     region = selector.get_region("verify_check")
-    frame = frame[region[1]:region[3], region[0]:region[2]]
+    frame = wc.crop(frame, region)
     # 打印中心色块颜色
     center_color = frame[frame.shape[0] // 2, frame.shape[1] // 2]
     print("Center color (BGR):", center_color)